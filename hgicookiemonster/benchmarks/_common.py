@@ -0,0 +1,92 @@
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple
+
+DEFAULT_MINIMUM_TIME = 1.0
+DEFAULT_REGRESSION_TOLERANCE = 0.1
+
+BenchmarkResult = NamedTuple("BenchmarkResult", [("name", str), ("operations", int), ("seconds", float)])
+BenchmarkComparison = NamedTuple("BenchmarkComparison",
+                                 [("name", str), ("baseline", float), ("current", float), ("regressed", bool)])
+
+
+def measure(name: str, operation: Callable[[], Any], minimum_time: float=DEFAULT_MINIMUM_TIME) -> BenchmarkResult:
+    """
+    Measures how long the given operation takes by repeating it for at least the given time.
+    :param name: the name of the benchmark
+    :param operation: the (argument-less) operation to measure
+    :param minimum_time: the minimum time (in seconds) to repeat the operation for
+    :return: the result of the benchmark
+    """
+    operations = 0
+    started_at = time.perf_counter()
+    elapsed = 0.0
+    batch_size = 1
+    while elapsed < minimum_time:
+        for _ in range(batch_size):
+            operation()
+        operations += batch_size
+        elapsed = time.perf_counter() - started_at
+        # Check the time less often as the operation is found to be quick
+        batch_size = min(batch_size * 2, 1000)
+    return BenchmarkResult(name, operations, elapsed)
+
+
+def write_nowhere(message: str, on_written: Callable[[], None]=None) -> bool:
+    """
+    Stands in for the rule output writer, immediately treating the message as written without writing it anywhere.
+    :param message: the message
+    :param on_written: optional callback for when the message has been written
+    :return: that the message was written
+    """
+    if on_written is not None:
+        on_written()
+    return True
+
+
+def get_operations_per_second(result: BenchmarkResult) -> float:
+    """
+    Gets the rate at which the operation of the given benchmark result was done.
+    :param result: the benchmark result
+    :return: operations per second
+    """
+    return result.operations / result.seconds
+
+
+def save_baseline(results: Iterable[BenchmarkResult], location: str):
+    """
+    Saves the given benchmark results as a baseline that later results can be compared to.
+    :param results: the benchmark results
+    :param location: the location of the baseline file to write
+    """
+    baseline = {result.name: get_operations_per_second(result) for result in results}
+    with open(location, "w") as file:
+        json.dump(baseline, file, indent=4, sort_keys=True)
+
+
+def load_baseline(location: str) -> Dict[str, float]:
+    """
+    Loads a baseline that was saved with `save_baseline`.
+    :param location: the location of the baseline file
+    :return: map where the key is the name of the benchmark and the value is its operations per second
+    """
+    with open(location, "r") as file:
+        return json.load(file)
+
+
+def compare_to_baseline(results: Iterable[BenchmarkResult], baseline: Dict[str, float],
+                        tolerance: float=DEFAULT_REGRESSION_TOLERANCE) -> List[BenchmarkComparison]:
+    """
+    Compares the given benchmark results to a baseline. Benchmarks that are not in the baseline are not compared.
+    :param results: the benchmark results
+    :param baseline: the baseline, as loaded by `load_baseline`
+    :param tolerance: the fraction by which operations per second can drop before being considered a regression
+    :return: the comparison of each benchmark that is in the baseline
+    """
+    comparisons = []
+    for result in results:
+        if result.name in baseline:
+            current = get_operations_per_second(result)
+            regressed = current < baseline[result.name] * (1 - tolerance)
+            comparisons.append(BenchmarkComparison(result.name, baseline[result.name], current, regressed))
+    return comparisons
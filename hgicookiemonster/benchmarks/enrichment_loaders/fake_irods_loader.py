@@ -0,0 +1,34 @@
+import os
+import random
+import time
+from datetime import datetime
+
+from cookiemonster.common.models import Cookie, Enrichment
+from cookiemonster.processor.models import EnrichmentLoader
+from hgicommon.data_source import register
+
+from hgicookiemonster.benchmarks.synthetic import generate_irods_metadata
+from hgicookiemonster.context import HgiContext
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT
+from hgicookiemonster.tests._common import create_data_object_as_metadata
+
+# Environment variable holding the time (in seconds) that loading from the fake iRODS takes
+FAKE_IRODS_LATENCY_ENVIRONMENT_VARIABLE = "HGICOOKIEMONSTER_FAKE_IRODS_LATENCY"
+
+_random = random.Random(0)
+
+
+def _can_enrich(cookie: Cookie, context: HgiContext) -> bool:
+    """Enrich from (fake) iRODS if not enriched from there before."""
+    return IRODS_ENRICHMENT not in [enrichment.source for enrichment in cookie.enrichments]
+
+
+def _load(cookie: Cookie, context: HgiContext) -> Enrichment:
+    """Load synthetic data object after the (fake) iRODS latency."""
+    time.sleep(float(os.environ.get(FAKE_IRODS_LATENCY_ENVIRONMENT_VARIABLE, 0)))
+    return Enrichment(IRODS_ENRICHMENT, datetime.now(),
+                      create_data_object_as_metadata(metadata=generate_irods_metadata(_random)))
+
+
+_enrichment_loader = EnrichmentLoader(_can_enrich, _load, IRODS_ENRICHMENT, priority=0)
+register(_enrichment_loader)
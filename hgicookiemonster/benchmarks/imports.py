@@ -0,0 +1,191 @@
+"""
+Benchmarks of how long it takes to start Cookie Monster and to (re)load its rules. Usage:
+
+    python -m hgicookiemonster.benchmarks.imports [--repeats 5] [--save-baseline baseline.json]
+                                                  [--compare baseline.json]
+
+Each import is timed in a new Python process, so that nothing has already been imported. Rules are loaded from their
+files, as `RuleSource` does when it starts and whenever a rule file changes. Exits with a non-zero status if loading the
+rules imports any of the modules that rules must not depend on (e.g. the runtime in `hgicookiemonster.run`) or if a
+benchmark has regressed relative to the given baseline.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, NamedTuple, Sequence
+
+from hgicookiemonster.benchmarks._common import BenchmarkResult, save_baseline, load_baseline, compare_to_baseline, \
+    DEFAULT_REGRESSION_TOLERANCE
+
+DEFAULT_REPEATS = 5
+DEFAULT_RELOADS = 20
+COLD_START_MODULES = ("hgicookiemonster.run", "hgicookiemonster.context")
+RULE_FILE_SUFFIX = "_rule.py"
+
+# Modules that are slow to import and which loading rules should therefore not cause to be imported
+FORBIDDEN_ON_RULE_LOAD = ("hgicookiemonster.run", "pika", "slackclient", "cookiemonster.elmo",
+                          "cookiemonster.logging.influxdb")
+
+_PACKAGE_PARENT_LOCATION = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+_RULES_LOCATION = os.path.join(_PACKAGE_PARENT_LOCATION, "hgicookiemonster", "rules")
+
+_MEASURE_IMPORT = """
+import json, sys, time
+started_at = time.perf_counter()
+import %s
+print(json.dumps({"seconds": time.perf_counter() - started_at, "modules": sorted(sys.modules)}))
+"""
+
+_MEASURE_RULE_LOADING = """
+import json, sys, time
+from hgicookiemonster.benchmarks.imports import load_rule_files
+started_at = time.perf_counter()
+load_rule_files(%(rules_location)r)
+cold_seconds = time.perf_counter() - started_at
+modules = sorted(sys.modules)
+started_at = time.perf_counter()
+for _ in range(%(reloads)d):
+    load_rule_files(%(rules_location)r)
+print(json.dumps({"cold_seconds": cold_seconds, "reload_seconds": time.perf_counter() - started_at,
+                  "modules": modules}))
+"""
+
+ImportMeasurement = NamedTuple("ImportMeasurement", [("seconds", float), ("modules", List[str])])
+RuleLoadingMeasurement = NamedTuple("RuleLoadingMeasurement", [
+    ("cold_seconds", float), ("reload_seconds", float), ("reloads", int), ("modules", List[str])])
+ImportBenchmarkResults = NamedTuple("ImportBenchmarkResults", [("results", List[BenchmarkResult]),
+                                                               ("forbidden", List[str])])
+
+
+def load_rule_files(rules_location: str=_RULES_LOCATION) -> int:
+    """
+    Loads the rule files in the given directory in the same way that `RuleSource` does, i.e. as new modules each time.
+    :param rules_location: the directory containing the rule files
+    :return: the number of rule files loaded
+    """
+    loaded = 0
+    for file_name in sorted(os.listdir(rules_location)):
+        if file_name.endswith(RULE_FILE_SUFFIX):
+            location = os.path.join(rules_location, file_name)
+            spec = importlib.util.spec_from_file_location("_benchmarked_%s" % file_name[:-len(".py")], location)
+            spec.loader.exec_module(importlib.util.module_from_spec(spec))
+            loaded += 1
+    return loaded
+
+
+def measure_import(module_name: str) -> ImportMeasurement:
+    """
+    Measures how long it takes to import the given module in a new Python process.
+    :param module_name: the name of the module to import
+    :return: the time taken and the modules that were imported as a result
+    """
+    return ImportMeasurement(**_run_in_new_process(_MEASURE_IMPORT % module_name))
+
+
+def measure_rule_loading(rules_location: str=_RULES_LOCATION, reloads: int=DEFAULT_RELOADS) -> RuleLoadingMeasurement:
+    """
+    Measures how long it takes to load the rules in a new Python process and then to reload them.
+    :param rules_location: the directory containing the rule files
+    :param reloads: the number of times to reload the rules
+    :return: the time taken to first load and to reload the rules and the modules imported by first loading them
+    """
+    measurement = _run_in_new_process(_MEASURE_RULE_LOADING % {"rules_location": rules_location, "reloads": reloads})
+    return RuleLoadingMeasurement(reloads=reloads, **measurement)
+
+
+def get_forbidden_modules(modules: Sequence[str], forbidden: Sequence[str]=FORBIDDEN_ON_RULE_LOAD) -> List[str]:
+    """
+    Gets the modules in the given collection that are, or are within, one of the forbidden modules.
+    :param modules: the names of the modules
+    :param forbidden: the names of the forbidden modules (or packages)
+    :return: the names of the forbidden modules
+    """
+    return sorted(module for module in modules
+                  if any(module == name or module.startswith("%s." % name) for name in forbidden))
+
+
+def benchmark_imports(repeats: int=DEFAULT_REPEATS, reloads: int=DEFAULT_RELOADS) -> ImportBenchmarkResults:
+    """
+    Benchmarks starting Cookie Monster and loading its rules.
+    :param repeats: the number of new processes to measure each benchmark in
+    :param reloads: the number of times the rules are reloaded in each process
+    :return: the benchmark results (named "import.<module>", "rules.load" and "rules.reload") and the modules that
+    were imported by loading the rules which should not have been
+    """
+    results = []
+    for module_name in COLD_START_MODULES:
+        seconds = sum(measure_import(module_name).seconds for _ in range(repeats))
+        results.append(BenchmarkResult("import.%s" % module_name, repeats, seconds))
+
+    cold_seconds = 0.0
+    reload_seconds = 0.0
+    forbidden = set()
+    for _ in range(repeats):
+        measurement = measure_rule_loading(reloads=reloads)
+        cold_seconds += measurement.cold_seconds
+        reload_seconds += measurement.reload_seconds
+        forbidden.update(get_forbidden_modules(measurement.modules))
+    results.append(BenchmarkResult("rules.load", repeats, cold_seconds))
+    results.append(BenchmarkResult("rules.reload", repeats * reloads, reload_seconds))
+
+    return ImportBenchmarkResults(results, sorted(forbidden))
+
+
+def _run_in_new_process(code: str) -> Dict:
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [_PACKAGE_PARENT_LOCATION] + ([environment["PYTHONPATH"]] if "PYTHONPATH" in environment else []))
+    output = subprocess.check_output([sys.executable, "-c", code], env=environment, universal_newlines=True)
+    # Only the last line is the measurement; modules may write to stdout when imported
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark starting Cookie Monster and (re)loading its rules")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help="number of new processes to measure each benchmark in")
+    parser.add_argument("--reloads", type=int, default=DEFAULT_RELOADS,
+                        help="number of times to reload the rules in each process")
+    parser.add_argument("--save-baseline", help="location to save the results to as a baseline")
+    parser.add_argument("--compare", help="location of a baseline to compare the results to")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_REGRESSION_TOLERANCE,
+                        help="fraction by which operations per second can drop before being considered a regression")
+    arguments = parser.parse_args(arguments)
+
+    started_at = time.perf_counter()
+    results, forbidden = benchmark_imports(arguments.repeats, arguments.reloads)
+
+    print("%-50s %15s" % ("benchmark", "ms/op"))
+    for result in results:
+        print("%-50s %15.1f" % (result.name, result.seconds / result.operations * 1e3))
+    print("(took %.1fs)" % (time.perf_counter() - started_at))
+
+    failed = False
+    if len(forbidden) > 0:
+        print()
+        print("Loading the rules imported modules that rules must not depend on: %s"
+              % ", ".join(forbidden))
+        failed = True
+
+    if arguments.save_baseline is not None:
+        save_baseline(results, arguments.save_baseline)
+
+    if arguments.compare is not None:
+        comparisons = compare_to_baseline(results, load_baseline(arguments.compare), arguments.tolerance)
+        print()
+        print("%-50s %15s %15s %10s" % ("benchmark", "baseline ms/op", "current ms/op", "change"))
+        for comparison in comparisons:
+            print("%-50s %15.1f %15.1f %+9.1f%%%s" % (
+                comparison.name, 1e3 / comparison.baseline, 1e3 / comparison.current,
+                (comparison.baseline / comparison.current - 1) * 100, " REGRESSED" if comparison.regressed else ""))
+        failed = failed or any(comparison.regressed for comparison in comparisons)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
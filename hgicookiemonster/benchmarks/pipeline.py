@@ -0,0 +1,363 @@
+"""
+End-to-end benchmark of Cookie Monster's pipeline, wired as in `hgicookiemonster.run` but against an in-memory cookie
+jar, a scripted source of updates and a fake iRODS enrichment loader. Usage:
+
+    python -m hgicookiemonster.benchmarks.pipeline [--updates 10000] [--targets 2000] [--update-rate 500]
+                                                   [--max-threads 5] [--pool-size 16]
+                                                   [--cookie-jar-latency 0.005] [--irods-latency 0.05]
+
+Reports sustained throughput, latency from an update being retrieved to its cookie being processed, and how busy the
+processing threads were, and the concurrency limit that the cookie jar's bulkhead settled on. Used to size
+`max_threads` and `COOKIEMONSTER_POOL_SIZE` offline.
+"""
+import argparse
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock, Semaphore, Thread, Event
+from typing import Callable, Dict, List
+
+from cookiemonster.common.collections import UpdateCollection
+from cookiemonster.common.models import Update, Enrichment
+from cookiemonster.cookiejar.in_memory_cookiejar import InMemoryCookieJar
+from cookiemonster.logging.logger import PythonLoggingLogger
+from cookiemonster.processor._enrichment import EnrichmentLoaderSource
+from cookiemonster.processor._rules import RuleSource
+from cookiemonster.processor.basic_processing import BasicProcessorManager
+
+import hgicookiemonster.rules
+from hgicookiemonster.benchmarks._common import write_nowhere
+from hgicookiemonster.benchmarks.enrichment_loaders import fake_irods_loader
+from hgicookiemonster.benchmarks.synthetic import generate_irods_metadata
+from hgicookiemonster.concurrency import ConcurrencyController, BACKEND_COOKIE_JAR, Bulkhead
+from hgicookiemonster.context import HgiContext
+from hgicookiemonster.metrics import MetricsRegistry
+from hgicookiemonster.run import _connect_retrieval_manager_to_cookie_jar, _connect_processor_manager_to_cookie_jar
+from hgicookiemonster.shared.reported import ReportedIndex
+from hgicookiemonster.tests._common import create_data_object_modification_as_metadata, \
+    CREATION_DATA_OBJECT_MODIFICATION_AS_METADATA
+
+DEFAULT_NUMBER_OF_UPDATES = 10000
+DEFAULT_NUMBER_OF_TARGETS = 2000
+DEFAULT_UPDATE_RATE = 500.0
+DEFAULT_RETRIEVAL_PERIOD = 1.0
+DEFAULT_MAX_THREADS = 5
+DEFAULT_POOL_SIZE = 16
+DEFAULT_COOKIE_JAR_LATENCY = 0.005
+DEFAULT_IRODS_LATENCY = 0.05
+DEFAULT_TIMEOUT = 600.0
+
+_UTILISATION_SAMPLE_INTERVAL = 0.01
+
+
+class ScriptedRetrievalManager:
+    """
+    Stands in for a retrieval manager, giving listeners scripted updates.
+    """
+    def __init__(self):
+        self._listeners = []    # type: List[Callable[[UpdateCollection], None]]
+
+    def add_listener(self, listener: Callable[[UpdateCollection], None]):
+        self._listeners.append(listener)
+
+    def retrieve(self, updates: UpdateCollection):
+        """
+        Gives the listeners the given updates, as if they have just been retrieved.
+        :param updates: the updates
+        """
+        for listener in self._listeners:
+            listener(updates)
+
+
+class InstrumentedInMemoryCookieJar(InMemoryCookieJar):
+    """
+    In-memory cookie jar that simulates the latency and connection pool of a remote cookie jar and records when cookies
+    finish being processed and how many are being processed at once.
+
+    Enrichments written to the jar are numbered in the order that they finish being written. A cookie has been processed
+    once a pass over it that was fetched after its last enrichment was written has completed.
+    """
+    def __init__(self, latency: float, pool_size: int, bulkhead: Bulkhead=None):
+        """
+        Constructor.
+        :param latency: the time (in seconds) that each request to the cookie jar takes
+        :param pool_size: the maximum number of requests to the cookie jar that can be made at once
+        :param bulkhead: optional bulkhead to make each request within, as requests to CouchDB are
+        """
+        super().__init__()
+        self.latency = latency
+        self.bulkhead = bulkhead
+        self.completed_at = dict()    # type: Dict[str, float]
+        self.processing = 0
+        self._connections = Semaphore(pool_size)
+        self._lock = Lock()
+        self._written = 0
+        self._last_written = dict()     # type: Dict[str, int]
+        self._fetched_after = dict()    # type: Dict[str, int]
+        self._completed_after = dict()  # type: Dict[str, int]
+        self._fetching = 0
+        self._stopped = False
+
+    def is_processed(self, identifier: str) -> bool:
+        """
+        Gets whether the cookie with the given identifier has been processed since its last enrichment was written.
+        :param identifier: the identifier of the cookie
+        :return: whether the cookie has been processed
+        """
+        with self._lock:
+            return self._completed_after.get(identifier, -1) >= self._last_written.get(identifier, 0)
+
+    def stop_processing(self):
+        """
+        Stops giving out cookies for processing and waits for those being processed to be finished with.
+        """
+        with self._lock:
+            self._stopped = True
+        while self._fetching > 0 or self.processing > 0:
+            time.sleep(0.01)
+
+    def _request(self):
+        if self.bulkhead is None:
+            self._make_request()
+        else:
+            with self.bulkhead.slot():
+                self._make_request()
+
+    def _make_request(self):
+        with self._connections:
+            time.sleep(self.latency)
+
+    def enrich_cookie(self, identifier: str, enrichment: Enrichment, mark_for_processing: bool=True):
+        self._request()
+        super().enrich_cookie(identifier, enrichment, mark_for_processing=mark_for_processing)
+        with self._lock:
+            self._written += 1
+            self._last_written[identifier] = self._written
+
+    def get_next_for_processing(self):
+        with self._lock:
+            if self._stopped:
+                return None
+            self._fetching += 1
+        cookie = None
+        try:
+            self._request()
+            with self._lock:
+                # Only the enrichments written before the cookie was fetched can have been seen by the pass over it
+                written = self._written
+            cookie = super().get_next_for_processing()
+        finally:
+            with self._lock:
+                self._fetching -= 1
+                if cookie is not None:
+                    self.processing += 1
+                    self._fetched_after[cookie.identifier] = written
+        return cookie
+
+    def mark_as_complete(self, identifier: str):
+        self._request()
+        super().mark_as_complete(identifier)
+        with self._lock:
+            self.processing -= 1
+            fetched_after = self._fetched_after.pop(identifier, -1)
+            seen_last = fetched_after >= self._last_written.get(identifier, 0)
+            if seen_last:
+                self._completed_after[identifier] = fetched_after
+                self.completed_at[identifier] = time.monotonic()
+        if not seen_last:
+            # An enrichment written whilst the cookie was being fetched may not have been seen, so it is processed again
+            self.mark_for_processing(identifier)
+
+    def mark_as_failed(self, identifier: str, requeue_delay: timedelta=timedelta(0)):
+        self._request()
+        super().mark_as_failed(identifier, requeue_delay)
+        with self._lock:
+            self.processing -= 1
+            self._fetched_after.pop(identifier, None)
+
+
+def generate_updates(number_of_updates: int, number_of_targets: int, seed: int=0) -> List[Update]:
+    """
+    Generates updates to data objects in iRODS. The first update to each target is its creation.
+    :param number_of_updates: the number of updates to generate
+    :param number_of_targets: the number of different data objects that the updates are to
+    :param seed: seed for the random choice of targets and metadata
+    :return: the generated updates, in timestamp order
+    """
+    random_generator = random.Random(seed)
+    created = set()
+    updates = []
+    timestamp = datetime(2016, 1, 1)
+    for _ in range(number_of_updates):
+        target = "/seq/%d/%d_1#1.cram" % divmod(random_generator.randrange(number_of_targets), 1000)
+        timestamp += timedelta(milliseconds=1)
+        if target not in created:
+            metadata = CREATION_DATA_OBJECT_MODIFICATION_AS_METADATA
+            created.add(target)
+        else:
+            metadata = create_data_object_modification_as_metadata(generate_irods_metadata(random_generator))
+        updates.append(Update(target, timestamp, metadata))
+    return updates
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    # Nearest-rank method
+    return values[max(1, int(math.ceil(percentile / 100 * len(values)))) - 1]
+
+
+def run_pipeline(updates: List[Update], update_rate: float=DEFAULT_UPDATE_RATE,
+                 retrieval_period: float=DEFAULT_RETRIEVAL_PERIOD, max_threads: int=DEFAULT_MAX_THREADS,
+                 pool_size: int=DEFAULT_POOL_SIZE,
+                 cookie_jar_latency: float=DEFAULT_COOKIE_JAR_LATENCY, irods_latency: float=DEFAULT_IRODS_LATENCY,
+                 timeout: float=DEFAULT_TIMEOUT) -> Dict[str, float]:
+    """
+    Pushes the given updates through the pipeline and measures how it copes.
+    :param updates: the updates, in timestamp order
+    :param update_rate: the rate (in updates per second) at which updates are made available for retrieval
+    :param retrieval_period: the time (in seconds) between retrievals
+    :param max_threads: the number of threads to process cookies with (`max_threads`)
+    :param pool_size: the maximum number of requests to the cookie jar at once, which caps its adaptive concurrency
+    limit, and the number of threads to put retrieved updates into the cookie jar with (`COOKIEMONSTER_POOL_SIZE`)
+    :param cookie_jar_latency: the time (in seconds) that each request to the cookie jar takes
+    :param irods_latency: the time (in seconds) that each load from iRODS takes
+    :param timeout: the maximum time (in seconds) to wait for all updates to be processed
+    :return: the measurements, in a map where the key is the name of the measurement
+    """
+    directory = tempfile.mkdtemp()
+    os.environ[fake_irods_loader.FAKE_IRODS_LATENCY_ENVIRONMENT_VARIABLE] = str(irods_latency)
+    try:
+        # The rules are copied so that the outputs written alongside them (e.g. the not ignored list) are thrown away
+        rules_location = os.path.join(directory, "rules")
+        shutil.copytree(os.path.dirname(hgicookiemonster.rules.__file__), rules_location,
+                        ignore=shutil.ignore_patterns("__pycache__", "not_ignored.txt"))
+        enrichment_loaders_location = os.path.dirname(fake_irods_loader.__file__)
+
+        logger = PythonLoggingLogger()
+        metrics = MetricsRegistry(logger)
+        concurrency = ConcurrencyController(metrics)
+        cookie_jar_bulkhead = concurrency.bulkhead(BACKEND_COOKIE_JAR, pool_size)
+        cookie_jar = InstrumentedInMemoryCookieJar(cookie_jar_latency, pool_size, cookie_jar_bulkhead)
+        retrieval_manager = ScriptedRetrievalManager()
+        reported = ReportedIndex(os.path.join(directory, "reported"))
+        context = HgiContext(cookie_jar, None, write_nowhere, None, None, logger, metrics, reported,
+                             concurrency)
+
+        rules_source = RuleSource(rules_location, context)
+        rules_source.start()
+        enrichment_loader_source = EnrichmentLoaderSource(enrichment_loaders_location, context)
+        enrichment_loader_source.start()
+        processor_manager = BasicProcessorManager(cookie_jar, rules_source, enrichment_loader_source, max_threads,
+                                                  logger)
+
+        enrichment_executor = _connect_retrieval_manager_to_cookie_jar(retrieval_manager, cookie_jar, pool_size,
+                                                                       metrics)
+        _connect_processor_manager_to_cookie_jar(processor_manager, cookie_jar)
+
+        # Sample how many cookies are being processed at once
+        utilisation_samples = []    # type: List[int]
+        stop_sampling = Event()
+
+        def sample_utilisation():
+            while not stop_sampling.wait(_UTILISATION_SAMPLE_INTERVAL):
+                utilisation_samples.append(cookie_jar.processing)
+        sampler = Thread(target=sample_utilisation, daemon=True)
+        sampler.start()
+        try:
+            # Retrieve updates periodically, as they become available at the given rate
+            retrieved_at = dict()    # type: Dict[str, float]
+            updates_per_retrieval = max(1, int(update_rate * retrieval_period))
+            started_at = time.monotonic()
+            for i in range(0, len(updates), updates_per_retrieval):
+                retrieval_time = started_at + (i / update_rate)
+                time.sleep(max(0.0, retrieval_time - time.monotonic()))
+                batch = updates[i:i + updates_per_retrieval]
+                now = time.monotonic()
+                for update in batch:
+                    retrieved_at[update.target] = now
+                retrieval_manager.retrieve(UpdateCollection(batch))
+            retrieval_finished_at = time.monotonic()
+
+            # Wait for the cookie of every update to have been processed since its last enrichment was written
+            deadline = time.monotonic() + timeout
+            processed = 0
+            while True:
+                processed = sum(1 for target in retrieved_at if cookie_jar.is_processed(target))
+                if processed == len(retrieved_at) or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.1)
+            completed = processed == len(retrieved_at)
+            finished_at = time.monotonic()
+        finally:
+            # Stop everything that was started, so that none of its threads outlive the run
+            stop_sampling.set()
+            sampler.join()
+            enrichment_executor.shutdown()
+            cookie_jar.stop_processing()
+            rules_source.stop()
+            enrichment_loader_source.stop()
+            reported.close()
+
+        latencies = sorted((cookie_jar.completed_at[target] if cookie_jar.is_processed(target) else finished_at) - at
+                           for target, at in retrieved_at.items())
+        elapsed = finished_at - started_at
+        return OrderedDict([
+            ("completed", float(completed)),
+            ("updates", float(len(updates))),
+            ("cookies", float(len(retrieved_at))),
+            ("processed", float(processed)),
+            ("elapsed", elapsed),
+            ("retrieval_elapsed", retrieval_finished_at - started_at),
+            ("throughput_updates_per_second", len(updates) / elapsed),
+            ("throughput_cookies_per_second", len(retrieved_at) / elapsed),
+            ("latency_p50", _percentile(latencies, 50)),
+            ("latency_p95", _percentile(latencies, 95)),
+            ("latency_p99", _percentile(latencies, 99)),
+            ("latency_max", latencies[-1]),
+            ("processing_thread_utilisation",
+             sum(utilisation_samples) / (len(utilisation_samples) * max_threads)
+             if len(utilisation_samples) > 0 else 0.0),
+            ("cookie_jar_concurrency_limit", float(cookie_jar_bulkhead.limit.limit))
+        ])
+    finally:
+        os.environ.pop(fake_irods_loader.FAKE_IRODS_LATENCY_ENVIRONMENT_VARIABLE, None)
+        shutil.rmtree(directory)
+
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline end-to-end with a synthetic workload")
+    parser.add_argument("--updates", type=int, default=DEFAULT_NUMBER_OF_UPDATES, help="number of updates")
+    parser.add_argument("--targets", type=int, default=DEFAULT_NUMBER_OF_TARGETS,
+                        help="number of different data objects that the updates are to")
+    parser.add_argument("--update-rate", type=float, default=DEFAULT_UPDATE_RATE,
+                        help="rate (in updates per second) at which updates are made available for retrieval")
+    parser.add_argument("--retrieval-period", type=float, default=DEFAULT_RETRIEVAL_PERIOD,
+                        help="time (in seconds) between retrievals")
+    parser.add_argument("--max-threads", type=int, default=DEFAULT_MAX_THREADS,
+                        help="number of threads to process cookies with")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="maximum number of requests to the cookie jar at once (caps its concurrency limit)")
+    parser.add_argument("--cookie-jar-latency", type=float, default=DEFAULT_COOKIE_JAR_LATENCY,
+                        help="time (in seconds) that each request to the cookie jar takes")
+    parser.add_argument("--irods-latency", type=float, default=DEFAULT_IRODS_LATENCY,
+                        help="time (in seconds) that each load from iRODS takes")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="maximum time (in seconds) to wait for all updates to be processed")
+    arguments = parser.parse_args(arguments)
+
+    updates = generate_updates(arguments.updates, arguments.targets)
+    measurements = run_pipeline(updates, arguments.update_rate, arguments.retrieval_period, arguments.max_threads,
+                                arguments.pool_size, arguments.cookie_jar_latency, arguments.irods_latency,
+                                arguments.timeout)
+    for name, value in measurements.items():
+        print("%-40s %15.3f" % (name, value))
+    return 0 if measurements["completed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,188 @@
+"""
+Micro-benchmarks of the rules, run against synthetic cookies. Usage:
+
+    python -m hgicookiemonster.benchmarks.rules [--scales 1,10,100] [--save-baseline baseline.json]
+                                                [--compare baseline.json]
+
+Each rule's `matches` and `action`, and the full set of rules (in priority order, as they are applied when a cookie is
+processed), are timed with cookies with increasing numbers of enrichments. Each is timed cold, with the caches of
+decoded enrichments and projections cleared and what has been reported forgotten before each operation (as when a
+cookie has not been seen before, so rules that report once per identifier report it), and warm, with the same cookies
+cycled through (as when the same copy of a cookie is evaluated again, after it has been reported).
+"""
+import argparse
+import importlib
+import os
+import pkgutil
+import shutil
+import sys
+import tempfile
+from itertools import cycle
+from typing import Any, Callable, List
+
+from cookiemonster.common.models import Cookie
+from cookiemonster.processor.models import Rule
+
+import hgicookiemonster.rules
+from hgicookiemonster.benchmarks._common import BenchmarkResult, measure, get_operations_per_second, save_baseline, \
+    load_baseline, compare_to_baseline, write_nowhere, DEFAULT_MINIMUM_TIME, DEFAULT_REGRESSION_TOLERANCE
+from hgicookiemonster.benchmarks.synthetic import SyntheticCookieGenerator
+from hgicookiemonster.context import HgiContext
+from hgicookiemonster.shared.common import clear_caches
+from hgicookiemonster.shared.reported import ReportedIndex
+
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_NUMBER_OF_COOKIES = 100
+
+
+def load_rules() -> List[Rule]:
+    """
+    Loads the rules defined in `hgicookiemonster.rules`.
+    :return: the rules, in priority order
+    """
+    rules = []
+    for _, module_name, _ in pkgutil.iter_modules(hgicookiemonster.rules.__path__):
+        if module_name.endswith("_rule"):
+            module = importlib.import_module("%s.%s" % (hgicookiemonster.rules.__name__, module_name))
+            rules.append(module._rule)
+    return sorted(rules, key=lambda rule: rule.priority)
+
+
+def apply_rules(rules: List[Rule], cookie: Cookie, context: HgiContext):
+    """
+    Applies the given rules to the given cookie, in the same way that they are applied when a cookie is processed.
+    :param rules: the rules, in priority order
+    :param cookie: the cookie
+    :param context: the context to apply the rules in
+    """
+    for rule in rules:
+        if rule.matches(cookie, context):
+            if rule.execute_action(cookie, context):
+                break
+
+
+def measure_cold_and_warm(name: str, operation: Callable[[Cookie], Any], cookies: List[Cookie],
+                          minimum_time: float=DEFAULT_MINIMUM_TIME,
+                          forget_reported: Callable[[], None]=None) -> List[BenchmarkResult]:
+    """
+    Measures how long the given operation takes on the given cookies, both with the caches cleared (and what has been
+    reported forgotten) before each operation (cold) and without (warm).
+    :param name: the name of the benchmark, which is suffixed with whether it is cold or warm
+    :param operation: the operation to measure, which is given a cookie
+    :param cookies: the cookies to cycle through
+    :param minimum_time: the minimum time (in seconds) to spend on each benchmark
+    :param forget_reported: optional function that forgets everything that the rules have reported, which is called
+    before each cold operation
+    :return: the cold then the warm benchmark results
+    """
+    next_cookie = cycle(cookies).__next__
+
+    def cold_operation():
+        clear_caches()
+        if forget_reported is not None:
+            forget_reported()
+        operation(next_cookie())
+
+    cold = measure(name.replace("@", ".cold@"), cold_operation, minimum_time)
+    warm = measure(name.replace("@", ".warm@"), lambda: operation(next_cookie()), minimum_time)
+    return [cold, warm]
+
+
+def benchmark_rules(rules: List[Rule], context: HgiContext, scales: List[int]=DEFAULT_SCALES,
+                    number_of_cookies: int=DEFAULT_NUMBER_OF_COOKIES, minimum_time: float=DEFAULT_MINIMUM_TIME,
+                    forget_reported: Callable[[], None]=None) -> List[BenchmarkResult]:
+    """
+    Benchmarks the given rules.
+    :param rules: the rules, in priority order
+    :param context: the context to apply the rules in
+    :param scales: multipliers of the number of enrichments that each cookie has
+    :param number_of_cookies: the number of different cookies to cycle through
+    :param minimum_time: the minimum time (in seconds) to spend on each benchmark
+    :param forget_reported: optional function that forgets everything that the rules have reported, such that cold
+    operations take the path of a cookie that has not been reported
+    :return: the benchmark results, named "<rule ID or `all_rules`>.<operation>.<cold or warm>@<number of enrichments
+    per cookie>"
+    """
+    results = []
+    for scale in scales:
+        generator = SyntheticCookieGenerator(number_of_irods_updates=5 * scale, number_of_irods=scale,
+                                             number_of_rule_applications=3 * scale)
+        cookies = generator.generate_many(number_of_cookies)
+        suffix = "@%d" % generator.number_of_enrichments
+
+        for rule in rules:
+            results.extend(measure_cold_and_warm("%s.matches%s" % (rule.id, suffix),
+                                                 lambda cookie: rule.matches(cookie, context), cookies, minimum_time,
+                                                 forget_reported))
+            results.extend(measure_cold_and_warm("%s.action%s" % (rule.id, suffix),
+                                                 lambda cookie: rule.execute_action(cookie, context), cookies,
+                                                 minimum_time, forget_reported))
+        results.extend(measure_cold_and_warm("all_rules.apply%s" % suffix,
+                                             lambda cookie: apply_rules(rules, cookie, context), cookies,
+                                             minimum_time, forget_reported))
+    return results
+
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the rules against synthetic cookies")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="comma separated multipliers of the number of enrichments that each cookie has")
+    parser.add_argument("--cookies", type=int, default=DEFAULT_NUMBER_OF_COOKIES,
+                        help="number of different cookies to cycle through")
+    parser.add_argument("--minimum-time", type=float, default=DEFAULT_MINIMUM_TIME,
+                        help="minimum time (in seconds) to spend on each benchmark")
+    parser.add_argument("--save-baseline", help="location to save the results to as a baseline")
+    parser.add_argument("--compare", help="location of a baseline to compare the results to")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_REGRESSION_TOLERANCE,
+                        help="fraction by which operations per second can drop before being considered a regression")
+    arguments = parser.parse_args(arguments)
+
+    directory = tempfile.mkdtemp()
+    # Be very bad and rebind a constant so that the benchmark does not add to the real not ignored list
+    import hgicookiemonster.rules.not_ignored_rule
+    not_ignored_list_location = os.path.join(directory, "not_ignored.txt")
+    hgicookiemonster.rules.not_ignored_rule.NOT_IGNORED_LIST_LOCATION = not_ignored_list_location
+    reported_location = os.path.join(directory, "reported")
+    context = HgiContext(None, None, write_nowhere, None, None, reported=ReportedIndex(reported_location))
+
+    def forget_reported():
+        # The not ignored list is emptied too, else the new index would be seeded with the identifiers listed in it
+        context.reported.close()
+        os.remove(reported_location)
+        open(not_ignored_list_location, "w").close()
+        context.reported = ReportedIndex(reported_location)
+
+    try:
+        scales = [int(scale) for scale in arguments.scales.split(",")]
+        results = benchmark_rules(load_rules(), context, scales, arguments.cookies, arguments.minimum_time,
+                                  forget_reported)
+    finally:
+        context.reported.close()
+        shutil.rmtree(directory)
+
+    print("%-80s %15s %15s %15s" % ("benchmark", "ops/sec", "us/op", "us/enrichment"))
+    for result in results:
+        number_of_enrichments = int(result.name.rpartition("@")[2])
+        seconds_per_operation = result.seconds / result.operations
+        print("%-80s %15.1f %15.2f %15.4f" % (result.name, get_operations_per_second(result),
+                                               seconds_per_operation * 1e6,
+                                               seconds_per_operation * 1e6 / number_of_enrichments))
+
+    if arguments.save_baseline is not None:
+        save_baseline(results, arguments.save_baseline)
+
+    if arguments.compare is not None:
+        comparisons = compare_to_baseline(results, load_baseline(arguments.compare), arguments.tolerance)
+        print()
+        print("%-80s %15s %15s %10s" % ("benchmark", "baseline", "current", "change"))
+        for comparison in comparisons:
+            print("%-80s %15.1f %15.1f %+9.1f%%%s" % (
+                comparison.name, comparison.baseline, comparison.current,
+                (comparison.current / comparison.baseline - 1) * 100, " REGRESSED" if comparison.regressed else ""))
+        if any(comparison.regressed for comparison in comparisons):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
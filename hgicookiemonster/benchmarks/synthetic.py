@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from baton.collections import IrodsMetadata
+from cookiemonster.common.models import Cookie, Enrichment
+from cookiemonster.processor.json_convert import RuleApplicationLogJSONEncoder
+from cookiemonster.processor.models import RuleApplicationLog
+from cookiemonster.processor.processing import RULE_APPLICATION
+from hgicommon.collections import Metadata
+
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT, IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.shared.constants.irods import IRODS_STUDY_ID_KEY, IRODS_TARGET_KEY, IRODS_REFERENCE_KEY, \
+    IRODS_MANUAL_QC_KEY, IRODS_TARGET_LIBRARY_VALUE
+from hgicookiemonster.tests._common import create_creation_enrichment, create_data_object_modification_as_metadata, \
+    create_data_object_as_metadata
+
+SYNTHETIC_STUDY_IDS = ("3543", "3596", "3597", "3765", "4113", "1000", "2000", "3000")
+SYNTHETIC_REFERENCES = (
+    "/lustre/scratch/references/Homo_sapiens/1000Genomes_hs37d5/all/fasta/hs37d5.fa",
+    "/lustre/scratch/references/Anopheles_gambiae/AgamP4/all/fasta/AgamP4.fa"
+)
+SYNTHETIC_TARGETS = (IRODS_TARGET_LIBRARY_VALUE, "1", "0")
+SYNTHETIC_RULE_IDS = ("not_cram", "study_library", "not_ignored", "other")
+
+_START = datetime(2016, 1, 1)
+_RULE_APPLICATION_LOG_JSON_ENCODER = RuleApplicationLogJSONEncoder()
+
+
+class SyntheticCookieGenerator:
+    """
+    Generates cookies enriched like those in production, for benchmarking. Generation is deterministic for a given seed.
+    """
+    def __init__(self, number_of_irods_updates: int=5, number_of_irods: int=1, number_of_rule_applications: int=3,
+                 seed: int=0):
+        """
+        Constructor.
+        :param number_of_irods_updates: the number of `irods_update` enrichments that each cookie has (the first of
+        which is the creation of the data object)
+        :param number_of_irods: the number of `irods` enrichments that each cookie has
+        :param number_of_rule_applications: the number of `rule_application` enrichments that each cookie has
+        :param seed: seed for the random choice of metadata
+        """
+        self.number_of_irods_updates = number_of_irods_updates
+        self.number_of_irods = number_of_irods
+        self.number_of_rule_applications = number_of_rule_applications
+        self._random = random.Random(seed)
+        self._generated = 0
+
+    @property
+    def number_of_enrichments(self) -> int:
+        """
+        The number of enrichments that each generated cookie has.
+        """
+        return self.number_of_irods_updates + self.number_of_irods + self.number_of_rule_applications
+
+    def generate(self) -> Cookie:
+        """
+        Generates a cookie.
+        :return: the generated cookie
+        """
+        self._generated += 1
+        cookie = Cookie("/seq/%d/%d_1#%d.cram" % (self._generated, self._generated, self._random.randrange(100)))
+        timestamp = _START + timedelta(minutes=self._generated)
+        for enrichment in self._generate_enrichments(timestamp):
+            cookie.enrich(enrichment)
+        return cookie
+
+    def generate_many(self, number: int) -> List[Cookie]:
+        """
+        Generates the given number of cookies.
+        :param number: the number of cookies to generate
+        :return: the generated cookies
+        """
+        return [self.generate() for _ in range(number)]
+
+    def _generate_enrichments(self, timestamp: datetime) -> Iterable[Enrichment]:
+        for i in range(self.number_of_irods_updates):
+            timestamp += timedelta(seconds=1)
+            if i == 0:
+                yield create_creation_enrichment(timestamp)
+            else:
+                yield Enrichment(IRODS_UPDATE_ENRICHMENT, timestamp,
+                                 create_data_object_modification_as_metadata(self._generate_irods_metadata()))
+        for _ in range(self.number_of_irods):
+            timestamp += timedelta(seconds=1)
+            yield Enrichment(IRODS_ENRICHMENT, timestamp,
+                             create_data_object_as_metadata(metadata=self._generate_irods_metadata()))
+        for _ in range(self.number_of_rule_applications):
+            timestamp += timedelta(seconds=1)
+            rule_application_log = RuleApplicationLog(self._random.choice(SYNTHETIC_RULE_IDS), False)
+            yield Enrichment(RULE_APPLICATION, timestamp,
+                             Metadata(_RULE_APPLICATION_LOG_JSON_ENCODER.default(rule_application_log)))
+
+    def _generate_irods_metadata(self) -> IrodsMetadata:
+        return generate_irods_metadata(self._random)
+
+
+def generate_irods_metadata(random_generator: random.Random) -> IrodsMetadata:
+    """
+    Generates iRODS metadata like that of the data objects in production.
+    :param random_generator: the random number generator to choose metadata values with
+    :return: the generated metadata
+    """
+    return IrodsMetadata({
+        IRODS_STUDY_ID_KEY: {random_generator.choice(SYNTHETIC_STUDY_IDS)},
+        IRODS_TARGET_KEY: {random_generator.choice(SYNTHETIC_TARGETS)},
+        IRODS_REFERENCE_KEY: {random_generator.choice(SYNTHETIC_REFERENCES)},
+        IRODS_MANUAL_QC_KEY: {random_generator.choice(("0", "1"))}
+    })
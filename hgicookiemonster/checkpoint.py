@@ -0,0 +1,181 @@
+import logging
+import os
+import tempfile
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from threading import Lock, Thread, Event
+from typing import Dict, Iterable, Optional
+
+_RESOLUTION = timedelta(microseconds=1)
+
+
+class EnrichmentCheckpoint:
+    """
+    Durable checkpoint of how far through the retrieved updates Cookie Monster has got, defined as the low watermark of
+    the timestamps of updates whose enrichments have been put into the cookie jar: every update before the watermark has
+    been enriched, therefore retrieval can safely resume from it after a restart.
+
+    The watermark is written to file atomically at a bounded rate. It is only written once it has held for a delay, to
+    allow for the cookie jar buffering writes before they are persisted.
+
+    Updates whose enrichments could not be put into the cookie jar (after retrying) are abandoned rather than holding
+    back the watermark indefinitely. They are appended to a dead letter file, from which they can be replayed.
+    """
+    def __init__(self, location: str, write_interval: timedelta, persistence_delay: timedelta=timedelta(0),
+                 dead_letter_location: str=None):
+        """
+        Constructor.
+        :param location: the location of the checkpoint file
+        :param write_interval: the minimum time between writes of the checkpoint file
+        :param persistence_delay: how long after being put into the cookie jar that an enrichment can be assumed to be
+        persisted
+        :param dead_letter_location: the location of the file that abandoned updates are appended to (defaults to the
+        location of the checkpoint file suffixed with `.failed`)
+        """
+        self.location = location
+        self.write_interval = write_interval
+        self.persistence_delay = persistence_delay
+        self.dead_letter_location = dead_letter_location if dead_letter_location is not None \
+            else "%s.failed" % location
+        self._outstanding = Counter()  # type: Counter[datetime]
+        self._latest_retrieved = None  # type: Optional[datetime]
+        self._abandoned = 0
+        self._observed = deque()     # type: deque
+        self._written = None   # type: Optional[datetime]
+        self._lock = Lock()
+        self._stopped = Event()
+        self._writer = None    # type: Optional[Thread]
+
+    def read(self) -> Optional[datetime]:
+        """
+        Reads the checkpoint from file.
+        :return: the checkpointed watermark else `None` if no (valid) checkpoint has been written
+        """
+        try:
+            with open(self.location, "r") as file:
+                # Checkpoints were previously written in whole seconds
+                return datetime.fromtimestamp(float(file.read().strip()))
+        except (OSError, ValueError):
+            return None
+
+    def retrieved(self, timestamps: Iterable[datetime], to_enrich: Iterable[datetime]):
+        """
+        Records that updates with the given timestamps have been retrieved, of which those with the `to_enrich`
+        timestamps are going to be put into the cookie jar (the rest have been dropped).
+        :param timestamps: the timestamps of all the retrieved updates
+        :param to_enrich: the timestamps of the retrieved updates that are going to be put into the cookie jar
+        """
+        with self._lock:
+            self._outstanding.update(to_enrich)
+            for timestamp in timestamps:
+                if self._latest_retrieved is None or timestamp > self._latest_retrieved:
+                    self._latest_retrieved = timestamp
+
+    def completed(self, timestamps: Iterable[datetime]):
+        """
+        Records that updates with the given timestamps have been put into the cookie jar.
+        :param timestamps: the timestamps of the updates
+        """
+        with self._lock:
+            self._outstanding.subtract(timestamps)
+            for timestamp in [timestamp for timestamp, count in self._outstanding.items() if count <= 0]:
+                del self._outstanding[timestamp]
+
+    def abandoned(self, target: str, timestamps: Iterable[datetime]):
+        """
+        Records that updates of the given target with the given timestamps could not be put into the cookie jar and
+        will not be retried. They are appended to the dead letter file and no longer hold back the watermark.
+        :param target: the target of the updates
+        :param timestamps: the timestamps of the updates
+        """
+        timestamps = list(timestamps)
+        try:
+            with self._lock:
+                with open(self.dead_letter_location, "a") as file:
+                    for timestamp in timestamps:
+                        file.write("%r\t%s\n" % (timestamp.timestamp(), target))
+                    file.flush()
+                    os.fsync(file.fileno())
+        except OSError:
+            logging.exception("Failed to record abandoned updates of \"%s\" in \"%s\": %s"
+                              % (target, self.dead_letter_location, timestamps))
+        self.completed(timestamps)
+        with self._lock:
+            self._abandoned += len(timestamps)
+
+    def get_status(self) -> Dict[str, float]:
+        """
+        Gets the progress of the checkpoint, including the age of the watermark, which grows if updates are not being
+        put into the cookie jar.
+        :return: the progress of the checkpoint
+        """
+        watermark = self.get_watermark()
+        with self._lock:
+            status = {"outstanding": sum(self._outstanding.values()), "abandoned": self._abandoned}
+        if watermark is not None:
+            status["watermark_age"] = (datetime.now() - watermark).total_seconds()
+        return status
+
+    def get_watermark(self) -> Optional[datetime]:
+        """
+        Gets the current low watermark.
+        :return: the timestamp from which retrieval must resume to not miss any update else `None` if nothing has been
+        retrieved
+        """
+        with self._lock:
+            if len(self._outstanding) > 0:
+                # Just before the earliest outstanding update, so that it is retrieved again
+                return min(self._outstanding.keys()) - _RESOLUTION
+            return self._latest_retrieved
+
+    def write(self):
+        """
+        Writes the latest watermark that was observed at least the persistence delay ago to file, if it has changed. The
+        file is replaced atomically.
+        """
+        now = time.monotonic()
+        self._observed.append((now, self.get_watermark()))
+        to_write = None
+        while len(self._observed) > 0 and now - self._observed[0][0] >= self.persistence_delay.total_seconds():
+            _, to_write = self._observed.popleft()
+
+        if to_write is None or to_write == self._written:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.location))
+        file_descriptor, temp_location = tempfile.mkstemp(
+            dir=directory, prefix=".%s." % os.path.basename(self.location))
+        try:
+            with os.fdopen(file_descriptor, "w") as file:
+                file.write(repr(to_write.timestamp()))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_location, self.location)
+        except:
+            os.remove(temp_location)
+            raise
+        self._written = to_write
+
+    def start(self):
+        """
+        Starts writing the checkpoint periodically in a background thread.
+        """
+        if self._writer is None:
+            self._writer = Thread(target=self._write_periodically, name=type(self).__name__, daemon=True)
+            self._writer.start()
+
+    def stop(self):
+        """
+        Stops writing the checkpoint periodically.
+        """
+        self._stopped.set()
+        if self._writer is not None:
+            self._writer.join()
+
+    def _write_periodically(self):
+        while not self._stopped.wait(self.write_interval.total_seconds()):
+            try:
+                self.write()
+            except Exception:
+                logging.exception("Failed to write checkpoint to \"%s\"" % self.location)
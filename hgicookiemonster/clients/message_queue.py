@@ -1,30 +1,206 @@
-from pika import PlainCredentials, ConnectionParameters, BlockingConnection
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+from threading import Condition, Thread
+from typing import Callable, List, Optional, Tuple
+
+if False:  # Imported only for type hints (`typing.TYPE_CHECKING` is not in Python 3.5.1)
+    from pika import ConnectionParameters, BlockingConnection
+
+from hgicookiemonster.metrics import MetricsRegistry
+
+MEASUREMENT_MESSAGE_QUEUE_PUBLISH_TIME = "message_queue_publish_time"
+MEASUREMENT_MESSAGE_QUEUE_BACKLOG = "message_queue_backlog"
+MEASUREMENT_MESSAGE_QUEUE_DROPPED = "message_queue_dropped"
+
+DEFAULT_MAX_BUFFERED = 10000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_RECONNECT_DELAY = timedelta(seconds=5)
+DEFAULT_CLOSE_TIMEOUT = timedelta(seconds=10)
+HEARTBEAT_INTERVAL = timedelta(seconds=10)
+
+# Tuple where the first element is the message, the second is the queue name and the third is when it was posted
+_BufferedMessage = Tuple[str, str, float]
 
 
 class BasicMessageQueue:
     """
-    Basic message queue client (e.g. for use with RabbitMQ).
+    Basic message queue client (e.g. for use with RabbitMQ). Messages are buffered in memory and published in batches
+    by a background thread over a long-lived connection, which is re-established if lost. Each batch is published in a
+    transaction, so that the message broker accepts it with a single round trip once committed; batches that are not
+    committed are published again.
     """
-    def __init__(self, host: str, port: int, username: str, password: str):
+    def __init__(self, host: str, port: int, username: str, password: str, metrics: MetricsRegistry=None,
+                 max_buffered: int=DEFAULT_MAX_BUFFERED, batch_size: int=DEFAULT_BATCH_SIZE,
+                 reconnect_delay: timedelta=DEFAULT_RECONNECT_DELAY,
+                 connection_factory: Callable[["ConnectionParameters"], "BlockingConnection"]=None):
         """
         Constructor.
         :param host: location of message broker
         :param port: port message broker runs on
         :param username: username for message broker
         :param password: username for message broker
+        :param metrics: optional registry of metrics to report publish latency and backlog to
+        :param max_buffered: the maximum number of messages waiting to be published, above which the oldest are dropped
+        :param batch_size: the maximum number of messages to publish in one transaction
+        :param reconnect_delay: the time to wait before reconnecting after the connection is lost
+        :param connection_factory: opens a blocking connection to the message broker with the given parameters (pika's
+        `BlockingConnection` if `None`)
         """
+        # pika is only imported when a message queue is used, as it is slow to import and the message queue is optional
+        from pika import PlainCredentials, ConnectionParameters, BlockingConnection
+
         credentials = PlainCredentials(username, password)
         self._connection_parameters = ConnectionParameters(host, port, credentials=credentials)
+        self.max_buffered = max_buffered
+        self.batch_size = batch_size
+        self.reconnect_delay = reconnect_delay
+        self.dropped = 0
+        self._connection_factory = connection_factory if connection_factory is not None else BlockingConnection
+        self._connection = None     # type: Optional[BlockingConnection]
+        self._channel = None
+        self._buffer = deque()  # type: deque
+        self._in_flight = []    # type: List[_BufferedMessage]
+        self._condition = Condition()
+        self._closing = False
+        self._abandoned = False
+        self._committing = False
+
+        self._publish_time = None
+        self._dropped_counter = None
+        if metrics is not None:
+            self._publish_time = metrics.histogram(MEASUREMENT_MESSAGE_QUEUE_PUBLISH_TIME)
+            self._dropped_counter = metrics.counter(MEASUREMENT_MESSAGE_QUEUE_DROPPED)
+            metrics.register_sampler(MEASUREMENT_MESSAGE_QUEUE_BACKLOG, lambda: len(self._buffer))
+
+        self._publisher = Thread(target=self._publish_buffered, name=type(self).__name__, daemon=True)
+        self._publisher.start()
+
+    @property
+    def backlog(self) -> int:
+        """
+        The number of messages waiting to be published.
+        """
+        return len(self._buffer)
 
     def post(self, message: str, queue_name: str):
         """
-        Posts the given message to a queue with the given name via the message broker's default exchange.
+        Posts the given message to a queue with the given name via the message broker's default exchange. Does not
+        block on the message broker.
         :param message: the message to post
         :param queue_name: the name of the queue to post to
+        :raises ValueError: if the message queue has been closed
         """
-        connection = BlockingConnection(self._connection_parameters)
+        with self._condition:
+            if self._closing:
+                raise ValueError("Cannot post to a closed message queue")
+            self._buffer.append((message, queue_name, time.monotonic()))
+            while len(self._buffer) > self.max_buffered:
+                self._buffer.popleft()
+                self.dropped += 1
+                if self._dropped_counter is not None:
+                    self._dropped_counter.increment()
+            self._condition.notify()
+
+    def close(self, timeout: timedelta=DEFAULT_CLOSE_TIMEOUT) -> List[Tuple[str, str]]:
+        """
+        Publishes the buffered messages then closes the connection to the message broker. Messages that could not be
+        published within the timeout (e.g. because the message broker is down) are abandoned, so that they will not be
+        published later, and are logged as errors and returned. Messages that were being committed when the timeout
+        passed may or may not have been published, so are logged but not returned.
+        :param timeout: the maximum time to wait for buffered messages to be published (waits indefinitely if `None`)
+        :return: the messages that were not published, as tuples where the first element is the message and the second
+        is the name of the queue it was posted to
+        """
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._publisher.join(timeout.total_seconds() if timeout is not None else None)
+
+        with self._condition:
+            self._abandoned = True
+            in_doubt = self._in_flight if self._committing else []
+            unpublished = [(message, queue_name) for message, queue_name, _ in
+                           ([] if self._committing else self._in_flight) + list(self._buffer)]
+            self._buffer.clear()
+            self._condition.notify()
+        if len(in_doubt) > 0:
+            logging.error("%d message(s) were being committed to the message broker when closing, so may not have "
+                          "been published: %s" % (len(in_doubt), [message for message, _, _ in in_doubt]))
+        if len(unpublished) > 0:
+            logging.error("%d message(s) could not be published to the message broker before closing: %s"
+                          % (len(unpublished), unpublished))
+        return unpublished
+
+    def _publish_buffered(self):
+        while True:
+            with self._condition:
+                if len(self._buffer) == 0 and not self._abandoned:
+                    if self._closing:
+                        break
+                    self._condition.wait(HEARTBEAT_INTERVAL.total_seconds())
+                if self._abandoned:
+                    break
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._in_flight = batch
+
+            if len(batch) == 0 and self._connection is None:
+                continue
+            try:
+                if self._connection is None:
+                    self._connect()
+                if len(batch) == 0:
+                    # Keep the otherwise idle connection alive
+                    self._connection.process_data_events()
+                else:
+                    self._publish(batch)
+            except Exception:
+                logging.exception("Failed to publish to message broker; reconnecting in %s" % self.reconnect_delay)
+                self._disconnect()
+                self._requeue(batch)
+                time.sleep(self.reconnect_delay.total_seconds())
+        self._disconnect()
+
+    def _publish(self, batch: List[_BufferedMessage]):
+        for message, queue_name, _ in batch:
+            self._channel.basic_publish(exchange="", routing_key=queue_name, body=message)
+        with self._condition:
+            if self._abandoned:
+                # Not committed, so the message broker discards the batch when the connection is closed
+                return
+            self._committing = True
         try:
-            channel = connection.channel()
-            channel.basic_publish(exchange="", routing_key=queue_name, body=message)
-        finally:
-            connection.close()
+            self._channel.tx_commit()
+        except Exception:
+            with self._condition:
+                self._committing = False
+            raise
+        with self._condition:
+            # Cleared together so that closing never sees a committed batch as unpublished
+            self._committing = False
+            self._in_flight = []
+        if self._publish_time is not None:
+            published_at = time.monotonic()
+            for _, _, posted_at in batch:
+                self._publish_time.observe(published_at - posted_at)
+
+    def _requeue(self, batch: List[_BufferedMessage]):
+        with self._condition:
+            if not self._abandoned:
+                self._buffer.extendleft(reversed(batch))
+            self._in_flight = []
+
+    def _connect(self):
+        self._connection = self._connection_factory(self._connection_parameters)
+        self._channel = self._connection.channel()
+        self._channel.tx_select()
+
+    def _disconnect(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+        self._connection = None
+        self._channel = None
@@ -1,6 +1,10 @@
 import atexit
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta, date
+from queue import Queue, Full, Empty
+from threading import Thread
+from typing import Callable, List, Optional, Tuple
 
 # TODO? It might be better to use Python's logging module to do this,
 # but it seems to be very awkward to create a separate logger that logs
@@ -8,29 +12,180 @@ from datetime import datetime
 # back to run-of-the-mill FS operations.
 import logging
 
+from hgicookiemonster.metrics import MetricsRegistry
+
 _LOG_FORMAT = "{timestamp}\t{message}\n"
 
+MEASUREMENT_RULE_OUTPUT_QUEUE = "rule_output_queue"
+MEASUREMENT_RULE_OUTPUT_DROPPED = "rule_output_dropped"
+
+FSYNC_NEVER = "never"
+FSYNC_ON_FLUSH = "flush"
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_ON_FLUSH)
+
+DEFAULT_MAX_QUEUED = 10000
+DEFAULT_PUT_TIMEOUT = timedelta(seconds=10)
+DEFAULT_FLUSH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = timedelta(seconds=1)
+
+_STOP = object()
+
+
 class RuleOutputWriter:
     """
-    Simple log file writer
+    Log file writer. Messages are queued and written in batches by a background thread, so that callers neither block on
+    nor interleave their writes to the file. Callers block whilst the queue is full, up to a timeout, after which the
+    message is dropped: as the log is the record of what rules have reported, drops are logged as errors, counted and
+    reported to the caller. Callers that need to know when their message is in the file (e.g. to record that it has
+    been reported) can give a callback, which is called by the writer thread once it has been written (and synced, if
+    the fsync policy is to sync on flush).
     """
-    def __init__(self, filename:str):
+    def __init__(self, filename: str, metrics: MetricsRegistry=None, max_queued: int=DEFAULT_MAX_QUEUED,
+                 flush_size: int=DEFAULT_FLUSH_SIZE, flush_interval: timedelta=DEFAULT_FLUSH_INTERVAL,
+                 max_file_size: int=None, rotate_daily: bool=False, fsync: str=FSYNC_NEVER,
+                 put_timeout: timedelta=DEFAULT_PUT_TIMEOUT):
+        """
+        Constructor.
+        :param filename: the location of the log file
+        :param metrics: optional registry of metrics to report queue depth and dropped messages to
+        :param max_queued: the maximum number of messages waiting to be written, above which callers block
+        :param flush_size: the maximum number of messages to write at once
+        :param flush_interval: the maximum time that a message waits for others to be written with
+        :param max_file_size: the size (in bytes) above which the log file is rotated (not rotated by size if `None`)
+        :param rotate_daily: whether to rotate the log file when the (UTC) date changes
+        :param fsync: when to sync the log file to disk (one of `FSYNC_POLICIES`)
+        :param put_timeout: the maximum time to block a caller for whilst the queue is full before dropping its message
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy \"%s\" (expected one of: %s)" % (fsync, ", ".join(FSYNC_POLICIES)))
         filename = os.path.expanduser(filename)
         filename = os.path.abspath(filename)
         logging.debug('Writing rule output to "%s"', filename)
 
-        try:
-            self.file = open(filename, 'a', 1)
-        except FileNotFoundError:
-            self.file = open(filename, 'w', 1)
+        self.filename = filename
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_file_size = max_file_size
+        self.rotate_daily = rotate_daily
+        self.fsync = fsync
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self._queue = Queue(max_queued)
+        self._closed = False
+        self._dropped_counter = None
+        if metrics is not None:
+            self._dropped_counter = metrics.counter(MEASUREMENT_RULE_OUTPUT_DROPPED)
+            metrics.register_sampler(MEASUREMENT_RULE_OUTPUT_QUEUE, self._queue.qsize)
+
+        self.file = None
+        self._file_date = None  # type: Optional[date]
+        self._open()
 
-        atexit.register(self.file.close)
+        self._writer = Thread(target=self._write_queued, name=type(self).__name__, daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
 
-    def __call__(self, message:str):
+    def __call__(self, message: str, on_written: Callable[[], None]=None) -> bool:
+        """
+        Queues the given message to be written, blocking whilst the queue is full up to the put timeout.
+        :param message: the message
+        :param on_written: optional callback, called from the writer thread once the message has been written
+        :return: whether the message was queued (else it was dropped, and will not be written)
+        """
         ts = datetime.utcnow()
-        log_data = {
-            'timestamp': '{:%Y-%m-%d %H:%M:%S}'.format(ts),
-            'message':   message
-        }
+        if self._closed:
+            self._drop(message, "closed")
+            return False
+        try:
+            self._queue.put((ts, message, on_written), timeout=self.put_timeout.total_seconds())
+        except Full:
+            self._drop(message, "not being written to quickly enough")
+            return False
+        return True
+
+    def close(self):
+        """
+        Writes all queued messages then closes the log file. Messages given after closing are dropped.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        # Messages queued whilst closing are never written (nor are their callbacks called)
+        while not self._queue.empty():
+            self._drop(self._queue.get()[1], "closed")
+
+    def _drop(self, message: str, reason: str):
+        self.dropped += 1
+        if self._dropped_counter is not None:
+            self._dropped_counter.increment()
+        logging.error("Dropped rule output as \"%s\" is %s: %s" % (self.filename, reason, message))
+
+    def _write_queued(self):
+        stopping = False
+        while not stopping:
+            batch = []  # type: List[Tuple[datetime, str, Optional[Callable[[], None]]]]
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval.total_seconds()
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.flush_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except Empty:
+                    break
+            stopping = item is _STOP
+
+            try:
+                self._write(batch)
+            except Exception:
+                logging.exception("Failed to write %d message(s) to \"%s\"" % (len(batch), self.filename))
+                continue
+            for _, message, on_written in batch:
+                if on_written is not None:
+                    try:
+                        on_written()
+                    except Exception:
+                        logging.exception("Callback for rule output that has been written failed: %s" % message)
+        self.file.close()
+
+    def _write(self, batch: List[Tuple[datetime, str, Optional[Callable[[], None]]]]):
+        if len(batch) == 0:
+            return
+        for ts, message, _ in batch:
+            line = _LOG_FORMAT.format(timestamp='{:%Y-%m-%d %H:%M:%S}'.format(ts), message=message)
+            if self.rotate_daily and ts.date() != self._file_date:
+                if self.file.tell() > 0:
+                    self._rotate(self._file_date.isoformat())
+                self._file_date = ts.date()
+            elif self.max_file_size is not None and 0 < self.file.tell() \
+                    and self.file.tell() + len(line.encode()) > self.max_file_size:
+                self._rotate('{:%Y%m%d%H%M%S}'.format(ts))
+            self.file.write(line)
+        self.file.flush()
+        if self.fsync == FSYNC_ON_FLUSH:
+            os.fsync(self.file.fileno())
+
+    def _open(self):
+        self.file = open(self.filename, 'a')
+        if os.path.getsize(self.filename) > 0:
+            self._file_date = datetime.utcfromtimestamp(os.path.getmtime(self.filename)).date()
+        else:
+            self._file_date = datetime.utcnow().date()
+
+    def _rotate(self, suffix: str):
+        self.file.flush()
+        if self.fsync == FSYNC_ON_FLUSH:
+            os.fsync(self.file.fileno())
+        self.file.close()
 
-        self.file.write(_LOG_FORMAT.format(**log_data))
+        rotated_filename = "%s.%s" % (self.filename, suffix)
+        i = 1
+        while os.path.exists(rotated_filename):
+            rotated_filename = "%s.%s.%d" % (self.filename, suffix, i)
+            i += 1
+        os.rename(self.filename, rotated_filename)
+        logging.info('Rotated rule output from "%s" to "%s"', self.filename, rotated_filename)
+        self._open()
@@ -1,7 +1,29 @@
-from slackclient import SlackClient
+import atexit
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Condition, Thread
+from typing import Dict, List, Optional, Tuple, Any
+
+from hgicookiemonster.metrics import MetricsRegistry
 
 _SLACK_CLIENT_POST_MESSAGE = "chat.postMessage"
 
+MEASUREMENT_SLACK_QUEUE = "slack_queue"
+MEASUREMENT_SLACK_DROPPED = "slack_dropped"
+MEASUREMENT_SLACK_FAILED = "slack_failed"
+
+DEFAULT_MAX_QUEUED = 1000
+DEFAULT_MAX_POSTS_PER_MINUTE = 20
+DEFAULT_DIGEST_WINDOW = timedelta(seconds=60)
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = timedelta(seconds=2)
+DEFAULT_CLOSE_TIMEOUT = timedelta(seconds=10)
+
+# Tuple where the first element is the channel, the second is the username and the third is the group
+_DigestKey = Tuple[Optional[str], Optional[str], Any]
+
 
 class BasicSlackClient:
     """
@@ -14,18 +36,204 @@ class BasicSlackClient:
         """
         self._default_channel = default_channel
         self._default_username = default_username
+        # slackclient is only imported when Slack is used, as it is slow to import and Slack notifications are optional
+        from slackclient import SlackClient
         self._slack_client = SlackClient(token)
 
-    def post(self, message: str, channel: str=None, username: str=None):
+    def post(self, message: str, channel: str=None, username: str=None) -> Dict:
         """
         Post the given message to the given channel as the given username.
         :param message: the message to post
         :param channel: the channel to post to
         :param username: the username to post as
+        :return: the response from Slack
         """
         if channel is None:
             channel = self._default_channel
         if username is None:
             username = self._default_username
 
-        self._slack_client.api_call(_SLACK_CLIENT_POST_MESSAGE, channel=channel, text=message, username=username)
+        return self._slack_client.api_call(_SLACK_CLIENT_POST_MESSAGE, channel=channel, text=message,
+                                           username=username)
+
+
+class _TokenBucket:
+    """
+    Token bucket rate limiter.
+    """
+    def __init__(self, rate: float, capacity: int):
+        """
+        Constructor.
+        :param rate: the number of tokens added per second
+        :param capacity: the maximum number of tokens that can be saved up (i.e. the maximum burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_filled = time.monotonic()
+
+    def take(self):
+        """
+        Takes a token, waiting for one to be added if there are none.
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_filled) * self.rate)
+        self._last_filled = now
+        if self._tokens < 1:
+            time.sleep((1 - self._tokens) / self.rate)
+            self._tokens = 1.0
+            self._last_filled = time.monotonic()
+        self._tokens -= 1
+
+
+class SlackNotifier:
+    """
+    Asynchronous Slack notifier. Messages are queued and posted by a background thread at a limited rate, retrying with
+    backoff if posting fails. Messages in the same group (e.g. from the same rule or about the same study) posted within
+    the digest window are merged into one; messages that are not in a group are posted straight away. Queued messages
+    are posted when the interpreter exits, for up to the close timeout.
+    """
+    def __init__(self, slack_client: BasicSlackClient, metrics: MetricsRegistry=None,
+                 max_queued: int=DEFAULT_MAX_QUEUED, max_posts_per_minute: float=DEFAULT_MAX_POSTS_PER_MINUTE,
+                 digest_window: timedelta=DEFAULT_DIGEST_WINDOW, max_retries: int=DEFAULT_MAX_RETRIES,
+                 retry_backoff: timedelta=DEFAULT_RETRY_BACKOFF, close_timeout: timedelta=DEFAULT_CLOSE_TIMEOUT):
+        """
+        Constructor.
+        :param slack_client: the client to post to Slack with
+        :param metrics: optional registry of metrics to report queue depth, dropped and failed messages to
+        :param max_queued: the maximum number of messages waiting to be posted, above which messages are dropped
+        :param max_posts_per_minute: the maximum rate of posts to Slack
+        :param digest_window: the time that a message waits for others in the same group to be posted with
+        :param max_retries: the maximum number of times to retry a failed post before giving up on it
+        :param retry_backoff: the time to wait before the first retry, which doubles for each further retry
+        :param close_timeout: the maximum time to wait for queued messages to be posted when the interpreter exits
+        """
+        self.slack_client = slack_client
+        self.max_queued = max_queued
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.dropped = 0
+        self.failed = 0
+        self._rate_limiter = _TokenBucket(max_posts_per_minute / 60, 1)
+        self._digests = OrderedDict()  # type: Dict[_DigestKey, _Digest]
+        self._queued = 0
+        self._condition = Condition()
+        self._closing = False
+
+        self._dropped_counter = None
+        self._failed_counter = None
+        if metrics is not None:
+            self._dropped_counter = metrics.counter(MEASUREMENT_SLACK_DROPPED)
+            self._failed_counter = metrics.counter(MEASUREMENT_SLACK_FAILED)
+            metrics.register_sampler(MEASUREMENT_SLACK_QUEUE, lambda: self._queued)
+
+        self._poster = Thread(target=self._post_queued, name=type(self).__name__, daemon=True)
+        self._poster.start()
+        atexit.register(self.close, close_timeout)
+
+    def post(self, message: str, channel: str=None, username: str=None, group: str=None):
+        """
+        Queues the given message to be posted to the given channel as the given username. Does not block on Slack.
+        :param message: the message to post
+        :param channel: the channel to post to
+        :param username: the username to post as
+        :param group: the group that the message is in, which is used as the title of digests (not digested if `None`)
+        """
+        with self._condition:
+            if self._closing or self._queued >= self.max_queued:
+                self.dropped += 1
+                if self._dropped_counter is not None:
+                    self._dropped_counter.increment()
+                return
+            # Messages that are not in a group are kept apart by using a key that is never repeated
+            key = (channel, username, group if group is not None else object())
+            digest = self._digests.get(key)
+            if digest is None:
+                due_at = time.monotonic()
+                if group is not None:
+                    due_at += self.digest_window.total_seconds()
+                digest = _Digest(due_at)
+                self._digests[key] = digest
+            digest.messages.append(message)
+            self._queued += 1
+            self._condition.notify()
+
+    def close(self, timeout: timedelta=None):
+        """
+        Posts all queued messages, without waiting for digest windows to close. Messages posted after closing are
+        dropped.
+        :param timeout: the maximum time to wait for queued messages to be posted (waits indefinitely if `None`)
+        """
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._poster.join(timeout.total_seconds() if timeout is not None else None)
+        if self._poster.is_alive():
+            with self._condition:
+                logging.warning("Timed out posting to Slack; %d queued message(s) not posted" % self._queued)
+
+    def _post_queued(self):
+        while True:
+            with self._condition:
+                while True:
+                    if len(self._digests) == 0:
+                        if self._closing:
+                            return
+                        self._condition.wait()
+                        continue
+                    # Digests are due in the order they were started, other than those not in a group (due immediately)
+                    key, digest = min(self._digests.items(), key=lambda item: item[1].due_at)
+                    wait = digest.due_at - time.monotonic()
+                    if wait <= 0 or self._closing:
+                        break
+                    self._condition.wait(wait)
+                del self._digests[key]
+                self._queued -= len(digest.messages)
+
+            channel, username, group = key
+            self._post_with_retries(_format_digest(digest.messages, group if isinstance(group, str) else None),
+                                    channel, username)
+
+    def _post_with_retries(self, message: str, channel: Optional[str], username: Optional[str]):
+        backoff = self.retry_backoff.total_seconds()
+        for attempt in range(self.max_retries + 1):
+            self._rate_limiter.take()
+            try:
+                response = self.slack_client.post(message, channel, username)
+                if response is None or response.get("ok", True):
+                    return
+                error = response.get("error")
+            except Exception as e:
+                error = e
+            if attempt < self.max_retries:
+                logging.warning("Failed to post to Slack (%s); retrying in %.1fs" % (error, backoff))
+                time.sleep(backoff)
+                backoff *= 2
+            else:
+                logging.error("Failed to post to Slack (%s); giving up on message: %s" % (error, message))
+        self.failed += 1
+        if self._failed_counter is not None:
+            self._failed_counter.increment()
+
+
+class _Digest:
+    """
+    Messages in the same group that are to be posted as one.
+    """
+    def __init__(self, due_at: float):
+        self.due_at = due_at
+        self.messages = []  # type: List[str]
+
+
+def _format_digest(messages: List[str], group: Optional[str]) -> str:
+    """
+    Formats the given messages as one.
+    :param messages: the messages
+    :param group: the group that the messages are in
+    :return: the formatted messages
+    """
+    if len(messages) == 1 and group is None:
+        return messages[0]
+    title = "%d notification(s)" % len(messages) if group is None else "%s (%d)" % (group, len(messages))
+    return "%s:\n%s" % (title, "\n".join("- %s" % message for message in messages))
@@ -0,0 +1,95 @@
+"""
+Compaction of the enrichments of a cookie.
+
+Cookie jars cannot replace the enrichments of a cookie, so compacted enrichments cannot yet be written back safely:
+deleting a cookie and then rewriting it (through a cookie jar that buffers writes) would lose its history if a write
+failed or the process stopped before the buffer was flushed, and other readers would see it missing or half rebuilt.
+"""
+from typing import Dict, List, Optional, Sequence
+
+from baton.collections import DataObjectReplicaCollection, IrodsMetadata
+from cookiemonster.common.models import Enrichment
+from cookiemonster.processor.json_convert import RuleApplicationLogJSONDecoder
+from cookiemonster.processor.processing import RULE_APPLICATION
+from cookiemonster.retriever.source.irods.json_convert import DataObjectModificationJSONEncoder
+from cookiemonster.retriever.source.irods.models import DataObjectModification
+from hgicommon.collections import Metadata
+
+from hgicookiemonster.shared.common import decode_irods_update_enrichment, project_irods_knowledge
+from hgicookiemonster.shared.constants.enrichments import IRODS_UPDATE_ENRICHMENT, IRODS_SNAPSHOT_ENRICHMENT
+from hgicookiemonster.shared.constants.irods import IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE
+
+DEFAULT_KEEP_RECENT_UPDATES = 10
+
+_RULE_APPLICATION_LOG_JSON_DECODER = RuleApplicationLogJSONDecoder()
+_DATA_OBJECT_MODIFICATION_JSON_ENCODER = DataObjectModificationJSONEncoder()
+
+
+def _create_snapshot(enrichments: Sequence[Enrichment], folded: Sequence[Enrichment]) -> Enrichment:
+    """
+    Creates an iRODS snapshot enrichment holding what is known about the data object in iRODS from the given
+    enrichments, timestamped as the last of them.
+    :param enrichments: the enrichments
+    :param folded: the iRODS update and snapshot enrichments amongst the given enrichments, which the snapshot replaces
+    :return: the snapshot
+    """
+    knowledge = project_irods_knowledge(enrichments)
+    replicas = []
+    if knowledge.creation_observed:
+        # The replica that shows the creation is kept so that the creation is observed from the snapshot
+        for enrichment in folded:
+            replica = decode_irods_update_enrichment(enrichment).modified_replicas.get_by_number(
+                IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE)
+            if replica is not None:
+                replicas.append(replica)
+                break
+    modification = DataObjectModification(IrodsMetadata(knowledge.latest_metadata),
+                                          DataObjectReplicaCollection(replicas))
+    return Enrichment(IRODS_SNAPSHOT_ENRICHMENT, enrichments[-1].timestamp,
+                      Metadata(_DATA_OBJECT_MODIFICATION_JSON_ENCODER.default(modification)))
+
+
+def compact_enrichments(enrichments: Sequence[Enrichment], keep_recent_updates: int=DEFAULT_KEEP_RECENT_UPDATES) \
+        -> Optional[List[Enrichment]]:
+    """
+    Compacts the given enrichments of a cookie, such that what is projected from them and whether rules match them are
+    unchanged:
+    - the iRODS update (and snapshot) enrichments older than the most recent iRODS updates are folded into a snapshot of
+      what is known about the data object at the time of the last of them, which takes its place;
+    - only the most recent rule application log of each rule is kept.
+    Other enrichments are kept, in the same order.
+    :param enrichments: the enrichments to compact
+    :param keep_recent_updates: the number of the most recent iRODS update enrichments to keep as they are (at least 1,
+    so that the time of the most recent update is kept)
+    :return: the compacted enrichments else `None` if they cannot be compacted
+    """
+    if keep_recent_updates < 1:
+        raise ValueError("At least the most recent iRODS update must be kept, not %d" % keep_recent_updates)
+
+    update_indices = [i for i, enrichment in enumerate(enrichments) if enrichment.source == IRODS_UPDATE_ENRICHMENT]
+    folded_indices = []     # type: List[int]
+    if len(update_indices) > keep_recent_updates:
+        oldest_kept_index = update_indices[-keep_recent_updates]
+        folded_indices = [i for i, enrichment in enumerate(enrichments[:oldest_kept_index])
+                          if enrichment.source in (IRODS_UPDATE_ENRICHMENT, IRODS_SNAPSHOT_ENRICHMENT)]
+    if len(folded_indices) < 2:
+        # Replacing a single enrichment with a snapshot would not make the cookie any smaller
+        folded_indices = []
+
+    latest_rule_application_indices = dict()     # type: Dict[str, int]
+    for i, enrichment in enumerate(enrichments):
+        if enrichment.source == RULE_APPLICATION:
+            rule_id = _RULE_APPLICATION_LOG_JSON_DECODER.decode_parsed(dict(enrichment.metadata)).rule_id
+            latest_rule_application_indices[rule_id] = i
+    kept_rule_application_indices = set(latest_rule_application_indices.values())
+
+    compacted = []  # type: List[Enrichment]
+    folded = set(folded_indices)
+    for i, enrichment in enumerate(enrichments):
+        if i in folded:
+            if i == folded_indices[-1]:
+                compacted.append(_create_snapshot(enrichments[:i + 1], [enrichments[j] for j in folded_indices]))
+        elif enrichment.source != RULE_APPLICATION or i in kept_rule_application_indices:
+            compacted.append(enrichment)
+
+    return compacted if len(compacted) < len(enrichments) else None
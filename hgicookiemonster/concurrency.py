@@ -0,0 +1,295 @@
+import time
+from contextlib import contextmanager
+from threading import Condition, Lock, local
+from typing import Callable, Dict, Iterator, Optional
+
+from hgicookiemonster.metrics import MetricsRegistry
+
+MEASUREMENT_CONCURRENCY = "concurrency"
+MEASUREMENT_CONCURRENCY_LATENCY = "concurrency_latency"
+MEASUREMENT_CONCURRENCY_WAIT_TIME = "concurrency_wait_time"
+MEASUREMENT_CONCURRENCY_OUTCOME = "concurrency_outcome"
+
+BACKEND_COOKIE_JAR = "cookie_jar"
+BACKEND_IRODS = "irods"
+
+DEFAULT_WINDOW_SIZE = 20
+DEFAULT_INCREASE = 1.0
+DEFAULT_DECREASE_FACTOR = 0.75
+DEFAULT_LATENCY_TOLERANCE = 2.0
+DEFAULT_MAX_ERROR_RATE = 0.05
+DEFAULT_BASELINE_SMOOTHING = 0.05
+
+# Bulkheads that HTTP requests are made within, where the key is the URL that the requests are to (or below)
+_http_bulkheads = dict()    # type: Dict[str, Bulkhead]
+_http_bulkheads_lock = Lock()
+
+
+class AIMDLimit:
+    """
+    Concurrency limit that is adjusted by additive increase, multiplicative decrease (AIMD) according to the latency and
+    error rate of the requests made within it. Requests are considered in windows: if a window's error rate is too high
+    or its mean latency has risen too far above the baseline (the lowest latency seen recently, i.e. the latency when
+    the backend is not loaded), the limit is decreased; otherwise it is increased if the limit was reached during the
+    window, probing for more throughput.
+    """
+    def __init__(self, initial_limit: int, max_limit: int, min_limit: int=1, window_size: int=DEFAULT_WINDOW_SIZE,
+                 increase: float=DEFAULT_INCREASE, decrease_factor: float=DEFAULT_DECREASE_FACTOR,
+                 latency_tolerance: float=DEFAULT_LATENCY_TOLERANCE, max_error_rate: float=DEFAULT_MAX_ERROR_RATE,
+                 baseline_smoothing: float=DEFAULT_BASELINE_SMOOTHING):
+        """
+        Constructor.
+        :param initial_limit: the limit to start at
+        :param max_limit: the highest that the limit can be increased to
+        :param min_limit: the lowest that the limit can be decreased to
+        :param window_size: the number of requests in each window
+        :param increase: the amount the limit is increased by after a window with healthy latency and error rate
+        :param decrease_factor: the factor the limit is multiplied by after a window with unhealthy latency or error
+        rate
+        :param latency_tolerance: the multiple of the baseline latency above which latency is unhealthy
+        :param max_error_rate: the fraction of requests that can fail before the error rate is unhealthy
+        :param baseline_smoothing: the fraction of the difference to a higher latency that the baseline moves by per
+        window, so that it follows a backend that has permanently become slower
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit (%d) <= max_limit (%d)" % (min_limit, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window_size = window_size
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.baseline_smoothing = baseline_smoothing
+        self.baseline_latency = None    # type: Optional[float]
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._lock = Lock()
+        self._reset_window()
+
+    @property
+    def limit(self) -> int:
+        """
+        The current limit.
+        """
+        return int(self._limit)
+
+    def update(self, latency: float, error: bool, in_flight: int):
+        """
+        Updates the limit with the outcome of a request.
+        :param latency: the time (in seconds) the request took
+        :param error: whether the request failed
+        :param in_flight: the number of requests that were in flight when the request was made (including it)
+        """
+        with self._lock:
+            self._requests += 1
+            self._errors += 1 if error else 0
+            self._total_latency += latency
+            self._saturated = self._saturated or in_flight >= self.limit
+            if self._requests < self.window_size:
+                return
+
+            mean_latency = self._total_latency / self._requests
+            if self.baseline_latency is None or mean_latency < self.baseline_latency:
+                self.baseline_latency = mean_latency
+            else:
+                self.baseline_latency += (mean_latency - self.baseline_latency) * self.baseline_smoothing
+
+            if self._errors / self._requests > self.max_error_rate \
+                    or mean_latency > self.baseline_latency * self.latency_tolerance:
+                self._limit = max(self._limit * self.decrease_factor, self.min_limit)
+            elif self._saturated:
+                # Only probe for more throughput if the current limit is actually constraining
+                self._limit = min(self._limit + self.increase, self.max_limit)
+            self._reset_window()
+
+    def _reset_window(self):
+        self._requests = 0
+        self._errors = 0
+        self._total_latency = 0.0
+        self._saturated = False
+
+
+class Bulkhead:
+    """
+    Limits the number of concurrent requests to a backend, isolating the rest of the system from the backend being slow
+    or failing. The limit adapts to the backend's latency and error rate.
+    """
+    def __init__(self, name: str, limit: AIMDLimit, metrics: MetricsRegistry=None):
+        """
+        Constructor.
+        :param name: the name of the backend
+        :param limit: the adaptive concurrency limit
+        :param metrics: optional registry of metrics to report the latency and outcome of requests to
+        """
+        self.name = name
+        self.limit = limit
+        self._in_flight = 0
+        self._waiting = 0
+        self._condition = Condition()
+        self._local = local()
+
+        self._latency = None
+        self._wait_time = None
+        self._succeeded = None
+        self._failed = None
+        if metrics is not None:
+            tags = {"backend": name}
+            self._latency = metrics.histogram(MEASUREMENT_CONCURRENCY_LATENCY, tags)
+            self._wait_time = metrics.histogram(MEASUREMENT_CONCURRENCY_WAIT_TIME, tags)
+            self._succeeded = metrics.counter(MEASUREMENT_CONCURRENCY_OUTCOME, dict(tags, outcome="succeeded"))
+            self._failed = metrics.counter(MEASUREMENT_CONCURRENCY_OUTCOME, dict(tags, outcome="failed"))
+            metrics.register_sampler(MEASUREMENT_CONCURRENCY, self.get_status, tags)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of requests currently being made.
+        """
+        return self._in_flight
+
+    def get_status(self) -> Dict[str, float]:
+        """
+        Gets the current limit and occupancy of the bulkhead.
+        :return: the current limit and occupancy
+        """
+        with self._condition:
+            return {"limit": self.limit.limit, "max_limit": self.limit.max_limit, "in_flight": self._in_flight,
+                    "waiting": self._waiting, "baseline_latency": self.limit.baseline_latency or 0.0}
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Context manager that waits for the number of requests in flight to be below the limit before making the request
+        in the block. The request is considered to have failed if the block raises. Nested use in the same thread does
+        not take another slot.
+        """
+        if getattr(self._local, "depth", 0) > 0:
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        in_flight = self.acquire()
+        self._local.depth = 1
+        started_at = time.monotonic()
+        error = True
+        try:
+            yield
+            error = False
+        finally:
+            self._local.depth = 0
+            self.release(time.monotonic() - started_at, error, in_flight)
+
+    def acquire(self) -> int:
+        """
+        Waits for the number of requests in flight to be below the limit then takes a slot for a request.
+        :return: the number of requests in flight, including this one
+        """
+        started_at = time.monotonic()
+        with self._condition:
+            if self._in_flight >= self.limit.limit:
+                self._waiting += 1
+                while self._in_flight >= self.limit.limit:
+                    self._condition.wait()
+                self._waiting -= 1
+            self._in_flight += 1
+            in_flight = self._in_flight
+        if self._wait_time is not None:
+            self._wait_time.observe(time.monotonic() - started_at)
+        return in_flight
+
+    def release(self, latency: float, error: bool, in_flight: int):
+        """
+        Releases a slot taken with `acquire`, adjusting the limit with the outcome of the request.
+        :param latency: the time (in seconds) the request took
+        :param error: whether the request failed
+        :param in_flight: the number of requests in flight when the slot was taken, as returned by `acquire`
+        """
+        self.limit.update(latency, error, in_flight)
+        with self._condition:
+            self._in_flight -= 1
+            # The limit may have increased, letting more than one waiting request through
+            self._condition.notify_all()
+        if self._latency is not None:
+            self._latency.observe(latency)
+            (self._failed if error else self._succeeded).increment()
+
+    def wrap(self, function: Callable) -> Callable:
+        """
+        Wraps the given function so that each call to it is made within this bulkhead.
+        :param function: the function to wrap
+        :return: the wrapped function
+        """
+        def wrapped(*args, **kwargs):
+            with self.slot():
+                return function(*args, **kwargs)
+        return wrapped
+
+
+class ConcurrencyController:
+    """
+    Gives each backend its own bulkhead with an adaptive concurrency limit, publishing the limits as metrics.
+    """
+    def __init__(self, metrics: MetricsRegistry=None):
+        """
+        Constructor.
+        :param metrics: optional registry of metrics to publish limits, latencies and outcomes to
+        """
+        self.metrics = metrics
+        self._bulkheads = dict()    # type: Dict[str, Bulkhead]
+        self._lock = Lock()
+
+    def bulkhead(self, backend: str, max_limit: int, initial_limit: int=None, min_limit: int=1) -> Bulkhead:
+        """
+        Gets the bulkhead for the given backend, creating it if it does not exist.
+        :param backend: the name of the backend
+        :param max_limit: the highest the concurrency limit can be increased to (e.g. the size of a connection pool)
+        :param initial_limit: the concurrency limit to start at (half of the maximum if `None`)
+        :param min_limit: the lowest the concurrency limit can be decreased to
+        :return: the bulkhead
+        """
+        with self._lock:
+            if backend not in self._bulkheads:
+                if initial_limit is None:
+                    initial_limit = max(max_limit // 2, min_limit)
+                limit = AIMDLimit(initial_limit, max_limit, min_limit)
+                self._bulkheads[backend] = Bulkhead(backend, limit, self.metrics)
+            return self._bulkheads[backend]
+
+    def get_status(self) -> Dict[str, Dict[str, float]]:
+        """
+        Gets the current limit and occupancy of every bulkhead.
+        :return: map where the key is the name of the backend and the value is the status of its bulkhead
+        """
+        with self._lock:
+            bulkheads = list(self._bulkheads.values())
+        return {bulkhead.name: bulkhead.get_status() for bulkhead in bulkheads}
+
+
+def add_http_bulkhead(url: str, bulkhead: Bulkhead):
+    """
+    Makes every HTTP request (made with `requests`) to the given URL, or below it, within the given bulkhead. Used for
+    the cookie jar's database: the bulkhead is beneath the cookie jar's rate limiting and write buffering, so its limit
+    adapts to the latency of the database's responses alone rather than to time spent throttled or buffered.
+    :param url: the URL (e.g. of the CouchDB server)
+    :param bulkhead: the bulkhead
+    """
+    from requests.adapters import HTTPAdapter
+
+    with _http_bulkheads_lock:
+        _http_bulkheads[url.rstrip("/")] = bulkhead
+        if not getattr(HTTPAdapter.send, "_within_bulkheads", False):
+            HTTPAdapter.send = _send_within_bulkhead(HTTPAdapter.send)
+
+
+def _send_within_bulkhead(send: Callable) -> Callable:
+    def wrapped(adapter, request, *args, **kwargs):
+        for url, bulkhead in list(_http_bulkheads.items()):
+            if request.url == url or request.url.startswith(url + "/"):
+                with bulkhead.slot():
+                    return send(adapter, request, *args, **kwargs)
+        return send(adapter, request, *args, **kwargs)
+    wrapped._within_bulkheads = True
+    return wrapped
@@ -1,8 +1,12 @@
 from datetime import timedelta
 from configparser import ConfigParser
+from typing import List, Optional
 
 CONFIG_RETRIEVAL = "retrieval"
 CONFIG_RETRIEVAL_PERIOD = "period"
+CONFIG_RETRIEVAL_INGEST_PATTERNS = "ingest_patterns"
+CONFIG_RETRIEVAL_MAX_QUEUED_ENRICHMENTS = "max_queued_enrichments"
+CONFIG_RETRIEVAL_CHECKPOINT_INTERVAL = "checkpoint_interval"
 
 CONFIG_COOKIEJAR = "cookiejar"
 CONFIG_COOKIEJAR_URL = "url"
@@ -20,9 +24,17 @@ CONFIG_PROCESSING_ENRICHMENT_LOADERS = "enrichment_loaders"
 CONFIG_BATON = "baton"
 CONFIG_BATON_BINARIES_LOCATION = "bin"
 CONFIG_BATON_IRODS_ZONE = "zone"
+CONFIG_BATON_MAX_CONNECTIONS = "max_connections"
+CONFIG_BATON_CONNECTION_IDLE_TIMEOUT = "connection_idle_timeout"
+CONFIG_BATON_BATCH_SIZE = "batch_size"
+CONFIG_BATON_BATCH_LATENCY = "batch_latency"
+CONFIG_BATON_PREFETCH = "prefetch"
+CONFIG_BATON_PREFETCH_CAPACITY = "prefetch_capacity"
 
 CONFIG_API = "api"
 CONFIG_API_PORT = "port"
+CONFIG_API_PROFILER_PORT = "profiler_port"
+CONFIG_API_PROFILER_HOST = "profiler_host"
 
 CONFIG_INFLUXDB = "influxdb"
 CONFIG_INFLUXDB_HOST = "host"
@@ -32,13 +44,18 @@ CONFIG_INFLUXDB_PASSWORD = "password"
 CONFIG_INFLUXDB_DATABASE = "database"
 CONFIG_INFLUXDB_BUFFER_LATENCY = "buffer_latency"
 
-# CONFIG_SLACK = "slack"
-# CONFIG_SLACK_TOKEN = "token"
-# CONFIG_SLACK_DEFAULT_CHANNEL = "default_channel"
-# CONFIG_SLACK_DEFAULT_USERNAME = "default_username"
+CONFIG_SLACK = "slack"
+CONFIG_SLACK_TOKEN = "token"
+CONFIG_SLACK_DEFAULT_CHANNEL = "default_channel"
+CONFIG_SLACK_DEFAULT_USERNAME = "default_username"
+CONFIG_SLACK_MAX_POSTS_PER_MINUTE = "max_posts_per_minute"
+CONFIG_SLACK_DIGEST_WINDOW = "digest_window"
 
 CONFIG_RULE_OUTPUT = "output"
 CONFIG_RULE_OUTPUT_LOG = "rule_log"
+CONFIG_RULE_OUTPUT_MAX_SIZE = "max_size"
+CONFIG_RULE_OUTPUT_ROTATE_DAILY = "rotate_daily"
+CONFIG_RULE_OUTPUT_FSYNC = "fsync"
 
 CONFIG_MESSAGE_QUEUE = "message_queue"
 CONFIG_MESSAGE_QUEUE_HOST = "host"
@@ -54,6 +71,9 @@ class CookieMonsterConfig:
     class RetrievalConfig:
         def __init__(self):
             self.period = None  # type: float
+            self.ingest_patterns = None     # type: List[str]
+            self.max_queued_enrichments = None  # type: int
+            self.checkpoint_interval = None     # type: timedelta
 
     class CookieJarConfig:
         def __init__(self):
@@ -74,10 +94,18 @@ class CookieMonsterConfig:
         def __init__(self):
             self.binaries_location = None   # type: str
             self.zone = None    # type: str
+            self.max_connections = None     # type: int
+            self.connection_idle_timeout = None     # type: timedelta
+            self.batch_size = None  # type: int
+            self.batch_latency = None   # type: timedelta
+            self.prefetch = None    # type: bool
+            self.prefetch_capacity = None   # type: int
 
     class ApiConfig:
         def __init__(self):
             self.port = None    # type: int
+            self.profiler_port = None   # type: Optional[int]
+            self.profiler_host = None   # type: str
 
     class InfluxDBConfig:
         def __init__(self):
@@ -88,15 +116,20 @@ class CookieMonsterConfig:
             self.database = None    # type: str
             self.buffer_latency = None  # type: int
 
-    # class SlackConfig:
-    #     def __init__(self):
-    #         self.token = None   # type: str
-    #         self.default_channel = None     # type: str
-    #         self.default_username = None     # type: str
+    class SlackConfig:
+        def __init__(self):
+            self.token = None   # type: str
+            self.default_channel = None     # type: str
+            self.default_username = None     # type: str
+            self.max_posts_per_minute = None    # type: float
+            self.digest_window = None   # type: timedelta
 
     class OutputConfig:
         def __init__(self):
             self.log_file = None  # type: str
+            self.max_size = None  # type: Optional[int]
+            self.rotate_daily = None  # type: bool
+            self.fsync = None  # type: str
 
     class MessageQueueConfig:
         def __init__(self):
@@ -113,7 +146,7 @@ class CookieMonsterConfig:
         self.baton = CookieMonsterConfig.BatonConfig()
         self.api = CookieMonsterConfig.ApiConfig()
         self.influxdb = CookieMonsterConfig.InfluxDBConfig()
-        # self.slack = CookieMonsterConfig.SlackConfig()
+        self.slack = None   # type: Optional[CookieMonsterConfig.SlackConfig]
         self.output = CookieMonsterConfig.OutputConfig()
         self.message_queue = CookieMonsterConfig.MessageQueueConfig()
 
@@ -130,6 +163,12 @@ def load_config(location: str) -> CookieMonsterConfig:
     config = CookieMonsterConfig()
 
     config.retrieval.period = config_parser[CONFIG_RETRIEVAL].getfloat(CONFIG_RETRIEVAL_PERIOD)
+    config.retrieval.ingest_patterns = config_parser[CONFIG_RETRIEVAL].get(
+        CONFIG_RETRIEVAL_INGEST_PATTERNS, fallback="").replace(",", " ").split()
+    config.retrieval.max_queued_enrichments = config_parser[CONFIG_RETRIEVAL].getint(
+        CONFIG_RETRIEVAL_MAX_QUEUED_ENRICHMENTS, fallback=10000)
+    config.retrieval.checkpoint_interval = timedelta(seconds=config_parser[CONFIG_RETRIEVAL].getfloat(
+        CONFIG_RETRIEVAL_CHECKPOINT_INTERVAL, fallback=10.0))
 
     config.processing.max_threads = config_parser[CONFIG_PROCESSING].getint(
         CONFIG_PROCESSING_MAX_THREADS)
@@ -150,8 +189,19 @@ def load_config(location: str) -> CookieMonsterConfig:
 
     config.baton.binaries_location = config_parser[CONFIG_BATON].get(CONFIG_BATON_BINARIES_LOCATION)
     config.baton.zone = config_parser[CONFIG_BATON].get(CONFIG_BATON_IRODS_ZONE)
+    config.baton.max_connections = config_parser[CONFIG_BATON].getint(CONFIG_BATON_MAX_CONNECTIONS, fallback=20)
+    config.baton.connection_idle_timeout = timedelta(seconds=config_parser[CONFIG_BATON].getfloat(
+        CONFIG_BATON_CONNECTION_IDLE_TIMEOUT, fallback=300))
+    config.baton.batch_size = config_parser[CONFIG_BATON].getint(CONFIG_BATON_BATCH_SIZE, fallback=100)
+    config.baton.batch_latency = timedelta(milliseconds=config_parser[CONFIG_BATON].getint(
+        CONFIG_BATON_BATCH_LATENCY, fallback=250))
+    config.baton.prefetch = config_parser[CONFIG_BATON].getboolean(CONFIG_BATON_PREFETCH, fallback=False)
+    config.baton.prefetch_capacity = config_parser[CONFIG_BATON].getint(CONFIG_BATON_PREFETCH_CAPACITY,
+                                                                        fallback=50000)
 
     config.api.port = config_parser[CONFIG_API].getint(CONFIG_API_PORT)
+    config.api.profiler_port = config_parser[CONFIG_API].getint(CONFIG_API_PROFILER_PORT, fallback=None)
+    config.api.profiler_host = config_parser[CONFIG_API].get(CONFIG_API_PROFILER_HOST, fallback="localhost")
 
     config.influxdb.host = config_parser[CONFIG_INFLUXDB].get(CONFIG_INFLUXDB_HOST)
     config.influxdb.port = config_parser[CONFIG_INFLUXDB].getint(CONFIG_INFLUXDB_PORT)
@@ -160,11 +210,22 @@ def load_config(location: str) -> CookieMonsterConfig:
     config.influxdb.database = config_parser[CONFIG_INFLUXDB].get(CONFIG_INFLUXDB_DATABASE)
     config.influxdb.buffer_latency = config_parser[CONFIG_INFLUXDB].getint(CONFIG_INFLUXDB_BUFFER_LATENCY)
 
-    # config.slack.token = config_parser[CONFIG_SLACK].get(CONFIG_SLACK_TOKEN)
-    # config.slack.default_channel = config_parser[CONFIG_SLACK].get(CONFIG_SLACK_DEFAULT_CHANNEL)
-    # config.slack.default_username = config_parser[CONFIG_SLACK].get(CONFIG_SLACK_DEFAULT_USERNAME)
+    # Slack notifications are only enabled if configured
+    if config_parser.has_section(CONFIG_SLACK):
+        config.slack = CookieMonsterConfig.SlackConfig()
+        config.slack.token = config_parser[CONFIG_SLACK].get(CONFIG_SLACK_TOKEN)
+        config.slack.default_channel = config_parser[CONFIG_SLACK].get(CONFIG_SLACK_DEFAULT_CHANNEL)
+        config.slack.default_username = config_parser[CONFIG_SLACK].get(CONFIG_SLACK_DEFAULT_USERNAME)
+        config.slack.max_posts_per_minute = config_parser[CONFIG_SLACK].getfloat(
+            CONFIG_SLACK_MAX_POSTS_PER_MINUTE, fallback=20.0)
+        config.slack.digest_window = timedelta(seconds=config_parser[CONFIG_SLACK].getfloat(
+            CONFIG_SLACK_DIGEST_WINDOW, fallback=60.0))
 
     config.output.log_file = config_parser[CONFIG_RULE_OUTPUT].get(CONFIG_RULE_OUTPUT_LOG)
+    config.output.max_size = config_parser[CONFIG_RULE_OUTPUT].getint(CONFIG_RULE_OUTPUT_MAX_SIZE, fallback=None)
+    config.output.rotate_daily = config_parser[CONFIG_RULE_OUTPUT].getboolean(CONFIG_RULE_OUTPUT_ROTATE_DAILY,
+                                                                             fallback=False)
+    config.output.fsync = config_parser[CONFIG_RULE_OUTPUT].get(CONFIG_RULE_OUTPUT_FSYNC, fallback="never")
 
     config.message_queue.host = config_parser[CONFIG_MESSAGE_QUEUE].get(CONFIG_MESSAGE_QUEUE_HOST)
     config.message_queue.port = config_parser[CONFIG_MESSAGE_QUEUE].getint(CONFIG_MESSAGE_QUEUE_PORT)
@@ -1,21 +1,34 @@
 from cookiemonster.common.context import Context
-from cookiemonster.cookiejar import CookieJar
+from cookiemonster.logging.logger import Logger, PythonLoggingLogger
 
-from hgicookiemonster.clients.message_queue import BasicMessageQueue
-from hgicookiemonster.clients.slack import BasicSlackClient
 from hgicookiemonster.clients.rule_log import RuleOutputWriter
+from hgicookiemonster.concurrency import ConcurrencyController
 from hgicookiemonster.config import CookieMonsterConfig
+from hgicookiemonster.metrics import MetricsRegistry
+from hgicookiemonster.shared.reported import ReportedIndex
+
+if False:  # Imported only for type hints (`typing.TYPE_CHECKING` is not in Python 3.5.1)
+    from cookiemonster.cookiejar import CookieJar
+    from hgicookiemonster.clients.message_queue import BasicMessageQueue
+    from hgicookiemonster.clients.slack import SlackNotifier
 
 
 class HgiContext(Context):
     """
     Context for HGI Cookie Monster's rules, notification receivers and enrichment loaders.
     """
-    def __init__(self, cookie_jar: CookieJar, config: CookieMonsterConfig,
-                 rule_log_writer: RuleOutputWriter, slack: BasicSlackClient,
-                 message_queue: BasicMessageQueue):
+    def __init__(self, cookie_jar: "CookieJar", config: CookieMonsterConfig,
+                 rule_log_writer: RuleOutputWriter, slack: "SlackNotifier",
+                 message_queue: "BasicMessageQueue", logger: Logger=PythonLoggingLogger(),
+                 metrics: MetricsRegistry=None, reported: ReportedIndex=None,
+                 concurrency: ConcurrencyController=None):
         self.cookie_jar = cookie_jar
         self.config = config
         self.rule_writer = rule_log_writer
         self.slack = slack
         self.message_queue = message_queue
+        self.logger = logger
+        self.metrics = metrics if metrics is not None else MetricsRegistry(logger)
+        # Rules that report once per identifier rely on there being an index of what has been reported
+        self.reported = reported if reported is not None else ReportedIndex()
+        self.concurrency = concurrency if concurrency is not None else ConcurrencyController(self.metrics)
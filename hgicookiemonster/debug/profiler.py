@@ -0,0 +1,259 @@
+"""
+Sampling profiler of all of the threads in this process. Usage (whilst Cookie Monster is running):
+
+    kill -USR2 <pid>                                        # Writes a profile to the configuration directory
+    curl "http://localhost:<profiler_port>/profile?seconds=30" > profile.collapsed
+    curl "http://localhost:<profiler_port>/threads"         # Current stack of each thread
+
+Profiles are in the collapsed stack format (one line of `thread;frame;frame... count` per distinct stack), which can be
+rendered with `flamegraph.pl` or speedscope.
+"""
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from types import CodeType, FrameType
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_SAMPLING_INTERVAL = 0.02
+MIN_SAMPLING_INTERVAL = 0.001
+DEFAULT_PROFILE_DURATION = 30.0
+MAX_PROFILE_DURATION = 600.0
+PROFILE_SIGNAL = signal.SIGUSR2
+PROFILE_FILE_PREFIX = "profile-"
+PROFILE_FILE_SUFFIX = ".collapsed"
+
+
+class ProfilerBusyError(Exception):
+    """
+    Raised when a profile is requested whilst another is being taken.
+    """
+
+
+class SamplingProfiler:
+    """
+    Profiler that periodically samples the stack of every thread, aggregating the samples as collapsed stacks grouped by
+    thread name. Only one profile is taken at a time.
+    """
+    def __init__(self, interval: float=DEFAULT_SAMPLING_INTERVAL):
+        """
+        Constructor.
+        :param interval: the default time (in seconds) between samples
+        """
+        self.interval = interval
+        self.samples = 0
+        self.sampling_time = 0.0
+        self._stacks = defaultdict(int)     # type: Dict[Tuple[str, Tuple[CodeType, ...]], int]
+        self._frame_names = dict()  # type: Dict[CodeType, str]
+        self._thread_names = dict()     # type: Dict[int, str]
+        self._lock = Lock()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether a profile is being taken.
+        """
+        return self._running
+
+    def profile(self, duration: float, interval: float=None) -> str:
+        """
+        Profiles for the given length of time, blocking until done.
+        :param duration: the time (in seconds) to profile for
+        :param interval: the time (in seconds) between samples (the default is used if `None`)
+        :return: the collapsed stacks
+        :raises ProfilerBusyError: if a profile is already being taken
+        """
+        with self._lock:
+            if self._running:
+                raise ProfilerBusyError()
+            self._running = True
+            self._stacks.clear()
+            self.samples = 0
+            self.sampling_time = 0.0
+        try:
+            self._sample_until(time.monotonic() + duration, interval if interval is not None else self.interval)
+            return self.get_collapsed_stacks()
+        finally:
+            self._running = False
+
+    def get_collapsed_stacks(self) -> str:
+        """
+        Gets the stacks sampled in the latest profile in the collapsed stack format.
+        :return: the collapsed stacks, most sampled first
+        """
+        collapsed_stacks = defaultdict(int)     # type: Dict[str, int]
+        for (thread_name, codes), count in list(self._stacks.items()):
+            frame_names = [thread_name] + [self._get_frame_name(code) for code in codes]
+            collapsed_stacks[";".join(frame_names)] += count
+        stacks = sorted(collapsed_stacks.items(), key=lambda item: item[1], reverse=True)
+        return "".join("%s %d\n" % (stack, count) for stack, count in stacks)
+
+    def _sample_until(self, end: float, interval: float):
+        sampling_thread = threading.get_ident()
+        next_sample = time.monotonic()
+        while next_sample < end:
+            started_at = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != sampling_thread:
+                    self._stacks[(self._get_thread_name(thread_id), self._walk(frame))] += 1
+            self.samples += 1
+            self.sampling_time += time.perf_counter() - started_at
+
+            # Keep to the schedule rather than drifting by the time taken to sample
+            next_sample += interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.monotonic()
+
+    @staticmethod
+    def _walk(frame: Optional[FrameType]) -> Tuple[CodeType, ...]:
+        # Code objects are collected (and only named when the profile is formatted) to keep the cost of sampling low
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        return tuple(codes)
+
+    def _get_frame_name(self, code: CodeType) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            name = "%s (%s:%d)" % (code.co_name, code.co_filename, code.co_firstlineno)
+            self._frame_names[code] = name
+        return name
+
+    def _get_thread_name(self, thread_id: int) -> str:
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            # Thread IDs can be reused so names are refreshed when unknown
+            self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._thread_names.setdefault(thread_id, "thread-%d" % thread_id)
+        return name
+
+
+def format_thread_stacks() -> str:
+    """
+    Formats what each thread is currently doing.
+    :return: the stack of each thread
+    """
+    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines = []
+    for thread_id, frame in sys._current_frames().items():
+        lines.append("# Thread: %s (%d)" % (thread_names.get(thread_id, "unknown"), thread_id))
+        for filename, lineno, name, line in traceback.extract_stack(frame):
+            lines.append('File: "%s", line %d, in %s' % (filename, lineno, name))
+            if line:
+                lines.append("  %s" % line.strip())
+        lines.append("")
+    return "\n".join(lines)
+
+
+def install_profile_signal_handler(profiler: SamplingProfiler, directory: str,
+                                   duration: float=DEFAULT_PROFILE_DURATION, signal_number: int=PROFILE_SIGNAL):
+    """
+    Installs a handler that profiles for the given length of time when the given signal is received, writing the profile
+    to a timestamped file in the given directory. Must be called from the main thread.
+    :param profiler: the profiler to profile with
+    :param directory: the directory to write profiles to
+    :param duration: the time (in seconds) to profile for
+    :param signal_number: the signal to profile on
+    """
+    def write_profile():
+        location = os.path.join(directory, "%s%s%s" % (
+            PROFILE_FILE_PREFIX, datetime.utcnow().strftime("%Y%m%dT%H%M%S"), PROFILE_FILE_SUFFIX))
+        try:
+            collapsed_stacks = profiler.profile(duration)
+        except ProfilerBusyError:
+            logging.warning("Not profiling as a profile is already being taken")
+            return
+        with open(location, "w") as file:
+            file.write(collapsed_stacks)
+        logging.info("Wrote profile of %d samples to %s" % (profiler.samples, location))
+
+    def handle_signal(signal_number, frame):
+        # Signal handlers run in the main thread, which must not be blocked for the duration of the profile
+        Thread(target=write_profile, name="profiler", daemon=True).start()
+
+    signal.signal(signal_number, handle_signal)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ProfilerRequestHandler(BaseHTTPRequestHandler):
+    profiler = None     # type: SamplingProfiler
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/threads":
+            self._respond(HTTPStatus.OK, format_thread_stacks())
+        elif url.path == "/profile":
+            query = parse_qs(url.query)
+            try:
+                duration = float(query.get("seconds", [DEFAULT_PROFILE_DURATION])[0])
+                interval = float(query.get("interval", [self.profiler.interval])[0])
+            except ValueError:
+                self._respond(HTTPStatus.BAD_REQUEST, "seconds and interval must be numbers\n")
+                return
+            if not math.isfinite(duration) or duration < 0:
+                self._respond(HTTPStatus.BAD_REQUEST, "seconds must be a finite number that is not negative\n")
+                return
+            duration = min(duration, MAX_PROFILE_DURATION)
+            if not math.isfinite(interval) or interval < MIN_SAMPLING_INTERVAL:
+                self._respond(HTTPStatus.BAD_REQUEST, "interval must be a finite number of at least %s\n"
+                              % MIN_SAMPLING_INTERVAL)
+                return
+            try:
+                collapsed_stacks = self.profiler.profile(duration, interval)
+            except ProfilerBusyError:
+                self._respond(HTTPStatus.CONFLICT, "A profile is already being taken\n")
+                return
+            self._respond(HTTPStatus.OK, collapsed_stacks, {
+                "X-Profile-Samples": str(self.profiler.samples),
+                "X-Profile-Sampling-Time": "%.6f" % self.profiler.sampling_time
+            })
+        else:
+            self._respond(HTTPStatus.NOT_FOUND, "Not found\n")
+
+    def _respond(self, status: HTTPStatus, body: str, headers: Dict[str, str]=None):
+        encoded_body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def log_message(self, format: str, *args):
+        logging.debug("Profiler HTTP request from %s: %s" % (self.address_string(), format % args))
+
+
+def serve_profiler(profiler: SamplingProfiler, port: int, host: str="localhost") -> HTTPServer:
+    """
+    Serves profiles (`GET /profile?seconds=<duration>&interval=<interval>`) and the current stack of each thread
+    (`GET /threads`) over HTTP, in a background thread.
+    :param profiler: the profiler to profile with
+    :param port: the port to listen on (0 to choose a free one)
+    :param host: the host to listen on (all interfaces if empty, which exposes the process' stacks to the network)
+    :return: the server, which can be stopped with `shutdown`
+    """
+    handler = type("ProfilerRequestHandler", (_ProfilerRequestHandler, ), {"profiler": profiler})
+    server = _ThreadingHTTPServer((host, port), handler)
+    Thread(target=server.serve_forever, name="profiler-http", daemon=True).start()
+    return server
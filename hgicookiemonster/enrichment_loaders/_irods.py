@@ -1,21 +1,184 @@
-from datetime import datetime
-from threading import BoundedSemaphore
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Sequence, Union
 
-from baton._baton.api import connect_to_irods_with_baton
+from baton._baton._baton_runner import BatonRunner
+from baton._baton.api import connect_to_irods_with_baton, Connection
 from baton._baton.json import DataObjectJSONEncoder
-from cookiemonster.common.models import Cookie, Enrichment
+from baton.models import DataObject
+from cookiemonster.common.models import Cookie, Enrichment, Update
+from cookiemonster.retriever.source.irods.json_convert import DataObjectModificationJSONDecoder
 from hgicommon.collections import Metadata
+from hgicookiemonster.concurrency import BACKEND_IRODS
 from hgicookiemonster.context import HgiContext
+from hgicookiemonster.shared.batching import Batcher
+from hgicookiemonster.shared.caching import LRUCache
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT
+from hgicookiemonster.shared.constants.irods import IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE
+from hgicookiemonster.shared.pooling import ConnectionPool
 
-IRODS_ENRICHMENT = "irods"
-MAX_IRODS_CONNECTIONS = 20      # TODO: This should be a setting...
+MEASUREMENT_IRODS_CONNECTION_POOL = "irods_connection_pool"
+MEASUREMENT_IRODS_CONNECTION_WAIT_TIME = "irods_connection_wait_time"
+MEASUREMENT_IRODS_BATCH_SIZE = "irods_batch_size"
+MEASUREMENT_IRODS_PREFETCH_HITS = "irods_prefetch_hits"
+MEASUREMENT_IRODS_PREFETCHED = "irods_prefetched"
 
-_irods_connections = BoundedSemaphore(MAX_IRODS_CONNECTIONS)
+PREFETCHED_TIME_TO_LIVE = timedelta(minutes=10)
+
+_CRAM_EXTENSION = ".cram"
+
+_irods_connection_pool = None     # type: ConnectionPool[Connection]
+_data_object_batcher = None     # type: Batcher[str, DataObject]
+_prefetched = None  # type: LRUCache
+_setup_lock = Lock()
+
+
+class _Prefetch:
+    """
+    Fetch of a data object that was started before it was known to be required.
+    """
+    def __init__(self, data_object: Future):
+        self.data_object = data_object
+        # The data object is at least as up-to-date as when its fetch was requested
+        self.requested_at = datetime.now()
+        self._requested_at_monotonic = time.monotonic()
+
+    def has_expired(self) -> bool:
+        return time.monotonic() - self._requested_at_monotonic > PREFETCHED_TIME_TO_LIVE.total_seconds()
+
+
+def _get_irods_connection_pool(context: HgiContext) -> ConnectionPool:
+    """
+    Gets the pool of baton connections to iRODS, creating it from the configuration in the given context on first use.
+    :param context: the context
+    :return: the connection pool
+    """
+    global _irods_connection_pool
+    with _setup_lock:
+        if _irods_connection_pool is None:
+            binaries_location = context.config.baton.binaries_location
+
+            def healthy(connection: Connection) -> bool:
+                # baton spawns a process per query so a connection is usable as long as its binaries still are
+                return BatonRunner.validate_baton_binaries_location(binaries_location) is None
+
+            _irods_connection_pool = ConnectionPool(
+                lambda: connect_to_irods_with_baton(binaries_location), context.config.baton.max_connections,
+                idle_timeout=context.config.baton.connection_idle_timeout, health_check=healthy)
+            context.metrics.register_sampler(MEASUREMENT_IRODS_CONNECTION_POOL, _irods_connection_pool.get_status)
+        return _irods_connection_pool
+
+
+def _get_data_object_batcher(context: HgiContext) -> Batcher:
+    """
+    Gets the batcher of data object fetches, creating it from the configuration in the given context on first use.
+    :param context: the context
+    :return: the batcher
+    """
+    global _data_object_batcher
+    connection_pool = _get_irods_connection_pool(context)
+    with _setup_lock:
+        if _data_object_batcher is None:
+            _data_object_batcher = Batcher(
+                lambda paths: _get_data_objects_by_paths(paths, connection_pool, context),
+                context.config.baton.batch_size, context.config.baton.batch_latency,
+                max_concurrent_batches=connection_pool.max_size)
+        return _data_object_batcher
+
+
+def _get_prefetched(context: HgiContext) -> LRUCache:
+    """
+    Gets the cache of prefetched data objects, creating it from the configuration in the given context on first use.
+    :param context: the context
+    :return: the cache, where the key is the path of the data object and the value is its `_Prefetch`
+    """
+    global _prefetched
+    with _setup_lock:
+        if _prefetched is None:
+            prefetched = LRUCache(context.config.baton.prefetch_capacity)
+            # Prefetches are removed from the cache when used, so those evicted were never used
+            context.metrics.register_sampler(MEASUREMENT_IRODS_PREFETCHED, lambda: {
+                "size": len(prefetched), "capacity": prefetched.capacity, "unused_evictions": prefetched.evictions})
+            _prefetched = prefetched
+        return _prefetched
+
+
+def _get_data_objects_by_paths(paths: Sequence[str], connection_pool: ConnectionPool, context: HgiContext) \
+        -> Dict[str, Union[DataObject, Exception]]:
+    """
+    Gets the data objects at the given paths in one baton call. If that fails (e.g. because one of the data objects no
+    longer exists), the data objects are got individually so that the failure is attributed to the right path.
+    :param paths: the paths of the data objects
+    :param connection_pool: pool of connections to iRODS
+    :param context: the context
+    :return: map where the key is the path and the value is either the data object or the exception raised getting it
+    """
+    # Calls to iRODS are made within a bulkhead, the adaptive limit of which is capped by the size of the pool
+    with context.concurrency.bulkhead(BACKEND_IRODS, connection_pool.max_size).slot():
+        _irods, wait_time = connection_pool.acquire()
+        context.metrics.histogram(MEASUREMENT_IRODS_CONNECTION_WAIT_TIME).observe(wait_time)
+        data_objects = dict()   # type: Dict[str, Union[DataObject, Exception]]
+        try:
+            try:
+                for data_object in _irods.data_object.get_by_path(list(paths)):
+                    data_objects[data_object.path] = data_object
+            except Exception:
+                if len(paths) == 1:
+                    raise
+                for path in paths:
+                    try:
+                        data_objects[path] = _irods.data_object.get_by_path(path)
+                    except Exception as e:
+                        data_objects[path] = e
+        except:
+            connection_pool.discard(_irods)
+            raise
+        connection_pool.release(_irods)
+
+    context.metrics.histogram(MEASUREMENT_IRODS_BATCH_SIZE).observe(len(paths))
+    return data_objects
+
+
+def is_prefetch_candidate(update: Update) -> bool:
+    """
+    Whether the cookie that the given update is for will plausibly be enriched from iRODS, defined as the update being
+    for the creation of a CRAM (which therefore cannot have been enriched from iRODS before).
+    :param update: the update
+    :return: whether the data object that the update is for should be prefetched
+    """
+    if not update.target.lower().endswith(_CRAM_EXTENSION):
+        return False
+    modification = DataObjectModificationJSONDecoder().decode_parsed(dict(update.metadata))
+    return modification.modified_replicas.get_by_number(IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE) is not None
+
+
+def prefetch_data_object(path: str, context: HgiContext):
+    """
+    Starts fetching the data object at the given path so that it is ready when an enrichment is loaded for it.
+    :param path: the path of the data object
+    :param context: the context
+    """
+    _get_prefetched(context).put(path, _Prefetch(_get_data_object_batcher(context).submit(path)))
 
 
 def load_enrichment_from_irods(cookie: Cookie, context: HgiContext) -> Enrichment:
-    with _irods_connections:
-        _irods = connect_to_irods_with_baton(context.config.baton.binaries_location)
-        data_object = _irods.data_object.get_by_path(cookie.identifier)
-        data_object_as_json = DataObjectJSONEncoder().default(data_object)
-        return Enrichment(IRODS_ENRICHMENT, datetime.now(), Metadata(data_object_as_json))
+    # Nothing will have been prefetched if prefetching is not enabled
+    prefetch = _prefetched.pop(cookie.identifier) if _prefetched is not None else None   # type: _Prefetch
+    if prefetch is not None and not prefetch.has_expired():
+        try:
+            data_object = prefetch.data_object.result()
+            fetched_at = prefetch.requested_at
+            context.metrics.counter(MEASUREMENT_IRODS_PREFETCH_HITS).increment()
+        except Exception:
+            prefetch = None
+    else:
+        prefetch = None
+
+    if prefetch is None:
+        fetched_at = datetime.now()
+        data_object = _get_data_object_batcher(context).get(cookie.identifier)
+
+    data_object_as_json = DataObjectJSONEncoder().default(data_object)
+    return Enrichment(IRODS_ENRICHMENT, fetched_at, Metadata(data_object_as_json))
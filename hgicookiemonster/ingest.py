@@ -0,0 +1,44 @@
+import re
+from collections import OrderedDict
+from fnmatch import translate
+from typing import Iterable, Dict, List
+
+from cookiemonster.common.models import Update
+
+
+class PathPatternUpdateFilter:
+    """
+    Admits updates for targets whose paths match any of the given (case-insensitive) glob patterns, e.g. `*.cram`.
+    """
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Constructor.
+        :param patterns: the glob patterns that the paths of admitted updates' targets match
+        """
+        self.patterns = list(patterns)
+        if len(self.patterns) == 0:
+            raise ValueError("At least one pattern must be given")
+        self._pattern = re.compile("|".join(translate(pattern) for pattern in self.patterns), re.IGNORECASE)
+
+    def __call__(self, update: Update) -> bool:
+        """
+        Whether the given update is admitted.
+        :param update: the update
+        :return: whether the update is admitted
+        """
+        return self._pattern.match(update.target) is not None
+
+
+def group_updates_by_target(updates: Iterable[Update]) -> Dict[str, List[Update]]:
+    """
+    Groups the given updates by their target. Targets are in the order that they were first updated and the updates of
+    each target are in timestamp order.
+    :param updates: the updates
+    :return: ordered map where the key is the target and the value is the updates for that target
+    """
+    grouped = OrderedDict()     # type: Dict[str, List[Update]]
+    for update in updates:
+        grouped.setdefault(update.target, []).append(update)
+    for target_updates in grouped.values():
+        target_updates.sort(key=lambda update: update.timestamp)
+    return grouped
@@ -0,0 +1,139 @@
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from cookiemonster.common.models import Cookie, Enrichment
+from cookiemonster.processor._enrichment import EnrichmentLoaderSource
+from cookiemonster.processor._rules import RuleSource
+from cookiemonster.processor.models import Rule, EnrichmentLoader
+
+from hgicookiemonster.context import HgiContext
+from hgicookiemonster.metrics import MetricsRegistry
+
+MEASUREMENT_RULE_TIME = "rule_time"
+MEASUREMENT_RULE_MATCHES = "rule_matches"
+MEASUREMENT_ENRICHMENT_LOADER_TIME = "enrichment_loader_time"
+MEASUREMENT_ENRICHMENT_LOADER_CAN_ENRICH = "enrichment_loader_can_enrich"
+
+
+def _timed(function: Callable[..., Any], observe: Callable[[float], None]) -> Callable[..., Any]:
+    """
+    Wraps the given function so that the time each call to it takes is observed, even if it raises.
+    :param function: the function to wrap
+    :param observe: given the time (in seconds) that each call takes
+    :return: the wrapped function
+    """
+    def timed(*args, **kwargs) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            observe(time.perf_counter() - started_at)
+    return timed
+
+
+def instrument_rule(rule: Rule, metrics: MetricsRegistry) -> Rule:
+    """
+    Creates a copy of the given rule that measures how long its precondition and action take and how often it matches.
+    :param rule: the rule to instrument
+    :param metrics: the registry of metrics to measure with
+    :return: the instrumented rule
+    """
+    tags = {"rule_id": str(rule.id), "priority": str(rule.priority)}
+    matched = metrics.counter(MEASUREMENT_RULE_MATCHES, dict(tags, outcome="matched"))
+    not_matched = metrics.counter(MEASUREMENT_RULE_MATCHES, dict(tags, outcome="not_matched"))
+    timed_matches = _timed(rule.matches, metrics.histogram(
+        MEASUREMENT_RULE_TIME, dict(tags, operation="matches")).observe)
+    timed_action = _timed(rule.execute_action, metrics.histogram(
+        MEASUREMENT_RULE_TIME, dict(tags, operation="action")).observe)
+
+    def matches(cookie: Cookie, context: HgiContext) -> bool:
+        result = timed_matches(cookie, context)
+        (matched if result else not_matched).increment()
+        return result
+
+    return Rule(matches, timed_action, rule.id, rule.priority)
+
+
+def instrument_enrichment_loader(enrichment_loader: EnrichmentLoader, metrics: MetricsRegistry) -> EnrichmentLoader:
+    """
+    Creates a copy of the given enrichment loader that measures how long checking whether it can enrich and loading
+    take and how often it can enrich.
+    :param enrichment_loader: the enrichment loader to instrument
+    :param metrics: the registry of metrics to measure with
+    :return: the instrumented enrichment loader
+    """
+    tags = {"enrichment_loader": str(enrichment_loader.name), "priority": str(enrichment_loader.priority)}
+    can = metrics.counter(MEASUREMENT_ENRICHMENT_LOADER_CAN_ENRICH, dict(tags, outcome="can_enrich"))
+    cannot = metrics.counter(MEASUREMENT_ENRICHMENT_LOADER_CAN_ENRICH, dict(tags, outcome="cannot_enrich"))
+    timed_can_enrich = _timed(enrichment_loader.can_enrich, metrics.histogram(
+        MEASUREMENT_ENRICHMENT_LOADER_TIME, dict(tags, operation="can_enrich")).observe)
+    timed_load = _timed(enrichment_loader.load_enrichment, metrics.histogram(
+        MEASUREMENT_ENRICHMENT_LOADER_TIME, dict(tags, operation="load")).observe)
+
+    def can_enrich(cookie: Cookie, context: HgiContext) -> bool:
+        result = timed_can_enrich(cookie, context)
+        (can if result else cannot).increment()
+        return result
+
+    def load(cookie: Cookie, context: HgiContext) -> Enrichment:
+        return timed_load(cookie, context)
+
+    return EnrichmentLoader(can_enrich, load, enrichment_loader.name, enrichment_loader.priority)
+
+
+class _InstrumentedCache:
+    """
+    Cache of instrumented copies of the items loaded by a source, which are made when the item is first seen.
+    """
+    def __init__(self, instrument: Callable[[Any], Any]):
+        self._instrument = instrument
+        self._instrumented = dict()     # type: Dict[int, Tuple[Any, Any]]
+
+    def get_all(self, items: List[Any]) -> List[Any]:
+        instrumented = dict()   # type: Dict[int, Tuple[Any, Any]]
+        for item in items:
+            cached = self._instrumented.get(id(item))
+            if cached is None or cached[0] is not item:
+                cached = (item, self._instrument(item))
+            instrumented[id(item)] = cached
+        # Forget items that are no longer loaded (e.g. because their file has changed)
+        self._instrumented = instrumented
+        return [instrumented[id(item)][1] for item in items]
+
+
+class InstrumentedRuleSource(RuleSource):
+    """
+    Source of the rules defined in a directory, which are instrumented to measure how long they take and how often they
+    match.
+    """
+    def __init__(self, directory_location: str, context: HgiContext):
+        """
+        Constructor.
+        :param directory_location: the location of the directory containing the rules
+        :param context: the context that the rules are given, the metrics registry of which is measured with
+        """
+        super().__init__(directory_location, context)
+        self._instrumented = _InstrumentedCache(lambda rule: instrument_rule(rule, context.metrics))
+
+    def get_all(self) -> List[Rule]:
+        return self._instrumented.get_all(super().get_all())
+
+
+class InstrumentedEnrichmentLoaderSource(EnrichmentLoaderSource):
+    """
+    Source of the enrichment loaders defined in a directory, which are instrumented to measure how long they take and
+    how often they can enrich.
+    """
+    def __init__(self, directory_location: str, context: HgiContext):
+        """
+        Constructor.
+        :param directory_location: the location of the directory containing the enrichment loaders
+        :param context: the context that the enrichment loaders are given, the metrics registry of which is measured
+        with
+        """
+        super().__init__(directory_location, context)
+        self._instrumented = _InstrumentedCache(
+            lambda enrichment_loader: instrument_enrichment_loader(enrichment_loader, context.metrics))
+
+    def get_all(self) -> List[EnrichmentLoader]:
+        return self._instrumented.get_all(super().get_all())
@@ -0,0 +1,287 @@
+import logging
+import math
+import random
+from datetime import timedelta
+from itertools import count
+from threading import Lock, Thread, Event, local
+from typing import Dict, List, Callable, Tuple, Any, Optional
+
+from cookiemonster.logging.logger import Logger
+
+DEFAULT_NUMBER_OF_STRIPES = 16
+DEFAULT_MAX_SAMPLES = 4096
+DEFAULT_FLUSH_INTERVAL = timedelta(seconds=60)
+
+HISTOGRAM_PERCENTILES = (50, 95, 99)
+
+_MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# Threads are numbered in the order that they first update a metric, so that they are spread evenly across stripes
+# (thread identifiers cannot be used as they are typically aligned addresses, which would all map to the same stripe)
+_thread_number = local()
+_next_thread_number = count()
+
+
+def _get_thread_number() -> int:
+    """
+    Gets the number of the current thread, assigning it one if it does not have one yet.
+    :return: the number of the current thread
+    """
+    try:
+        return _thread_number.value
+    except AttributeError:
+        # `next` on `count` is atomic under the GIL
+        _thread_number.value = next(_next_thread_number)
+        return _thread_number.value
+
+
+class _Striped:
+    """
+    Spreads updates across a number of independently locked stripes, chosen by thread, to reduce lock contention between
+    threads updating the same metric.
+    """
+    def __init__(self, number_of_stripes: int, initial: Callable[[], Any]):
+        self._initial = initial
+        self._locks = [Lock() for _ in range(number_of_stripes)]
+        self._stripes = [initial() for _ in range(number_of_stripes)]
+
+    def _stripe_index(self) -> int:
+        return _get_thread_number() % len(self._stripes)
+
+    def _swap_all(self) -> List[Any]:
+        """
+        Replaces the value of every stripe with its initial value.
+        :return: the replaced values
+        """
+        values = []
+        for i, lock in enumerate(self._locks):
+            with lock:
+                values.append(self._stripes[i])
+                self._stripes[i] = self._initial()
+        return values
+
+
+class Counter(_Striped):
+    """
+    Counts occurrences. The count is reset when collected.
+    """
+    def __init__(self, number_of_stripes: int=DEFAULT_NUMBER_OF_STRIPES):
+        super().__init__(number_of_stripes, int)
+
+    def increment(self, amount: int=1):
+        index = self._stripe_index()
+        with self._locks[index]:
+            self._stripes[index] += amount
+
+    def collect(self) -> int:
+        """
+        Gets the count since last collected.
+        :return: the count
+        """
+        return sum(self._swap_all())
+
+
+class Gauge(_Striped):
+    """
+    Value that goes up and down. The value is not reset when collected.
+    """
+    def __init__(self, number_of_stripes: int=DEFAULT_NUMBER_OF_STRIPES):
+        super().__init__(number_of_stripes, int)
+
+    def increment(self, amount: float=1):
+        index = self._stripe_index()
+        with self._locks[index]:
+            self._stripes[index] += amount
+
+    def decrement(self, amount: float=1):
+        self.increment(-amount)
+
+    def set(self, value: float):
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            self._stripes = [value] + [0] * (len(self._stripes) - 1)
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+    @property
+    def value(self) -> float:
+        return sum(self._stripes)
+
+    def collect(self) -> float:
+        """
+        Gets the current value.
+        :return: the value
+        """
+        return self.value
+
+
+class Histogram(_Striped):
+    """
+    Distribution of observed values (e.g. latencies). Observations are reset when collected. If more observations are
+    made between collections than can be kept, a uniform sample of them is kept.
+    """
+    class _Samples:
+        def __init__(self):
+            self.count = 0
+            self.total = 0.0
+            self.maximum = None     # type: Optional[float]
+            self.values = []    # type: List[float]
+
+    def __init__(self, number_of_stripes: int=DEFAULT_NUMBER_OF_STRIPES, max_samples: int=DEFAULT_MAX_SAMPLES):
+        super().__init__(number_of_stripes, Histogram._Samples)
+        self._max_samples_per_stripe = max(1, max_samples // number_of_stripes)
+
+    def observe(self, value: float):
+        index = self._stripe_index()
+        with self._locks[index]:
+            samples = self._stripes[index]
+            samples.count += 1
+            samples.total += value
+            if samples.maximum is None or value > samples.maximum:
+                samples.maximum = value
+            if len(samples.values) < self._max_samples_per_stripe:
+                samples.values.append(value)
+            else:
+                # Reservoir sampling
+                replace = random.randrange(samples.count)
+                if replace < self._max_samples_per_stripe:
+                    samples.values[replace] = value
+
+    def collect(self) -> Optional[Dict[str, float]]:
+        """
+        Gets a summary of the observations made since last collected.
+        :return: the count, mean, maximum and percentiles of the observations else `None` if there were none
+        """
+        all_samples = self._swap_all()
+        count = sum(samples.count for samples in all_samples)
+        if count == 0:
+            return None
+        values = sorted(value for samples in all_samples for value in samples.values)
+        summary = {
+            "count": count,
+            "mean": sum(samples.total for samples in all_samples) / count,
+            "max": max(samples.maximum for samples in all_samples if samples.maximum is not None)
+        }
+        for percentile in HISTOGRAM_PERCENTILES:
+            # Nearest-rank method
+            rank = max(1, int(math.ceil(percentile / 100 * len(values))))
+            summary["p%d" % percentile] = values[rank - 1]
+        return summary
+
+
+class MetricsRegistry:
+    """
+    Registry of in-process metrics, aggregates of which are periodically flushed to a logger. Updating a metric does not
+    go to the logger, keeping the cost of measuring off hot paths.
+    """
+    def __init__(self, logger: Logger, flush_interval: timedelta=DEFAULT_FLUSH_INTERVAL):
+        """
+        Constructor.
+        :param logger: the logger to flush aggregates to
+        :param flush_interval: the time between flushes
+        """
+        self.logger = logger
+        self.flush_interval = flush_interval
+        self._metrics = dict()  # type: Dict[_MetricKey, Any]
+        self._samplers = dict()     # type: Dict[_MetricKey, Callable[[], Any]]
+        self._lock = Lock()
+        self._stopped = Event()
+        self._flusher = None    # type: Optional[Thread]
+
+    def counter(self, name: str, tags: Dict[str, str]=None) -> Counter:
+        """
+        Gets the counter with the given name and tags, creating it if it does not exist.
+        :param name: the name of the measurement
+        :param tags: metadata about the measurement
+        :return: the counter
+        """
+        return self._get_or_create(name, tags, Counter)
+
+    def gauge(self, name: str, tags: Dict[str, str]=None) -> Gauge:
+        """
+        Gets the gauge with the given name and tags, creating it if it does not exist.
+        :param name: the name of the measurement
+        :param tags: metadata about the measurement
+        :return: the gauge
+        """
+        return self._get_or_create(name, tags, Gauge)
+
+    def histogram(self, name: str, tags: Dict[str, str]=None) -> Histogram:
+        """
+        Gets the histogram with the given name and tags, creating it if it does not exist.
+        :param name: the name of the measurement
+        :param tags: metadata about the measurement
+        :return: the histogram
+        """
+        return self._get_or_create(name, tags, Histogram)
+
+    def register_sampler(self, name: str, sampler: Callable[[], Any], tags: Dict[str, str]=None):
+        """
+        Registers a function that is called on each flush to get the value(s) to record, e.g. the occupancy of a pool.
+        :param name: the name of the measurement
+        :param sampler: gets the value(s) to record
+        :param tags: metadata about the measurement
+        """
+        with self._lock:
+            self._samplers[MetricsRegistry._to_key(name, tags)] = sampler
+
+    def start(self):
+        """
+        Starts periodically flushing in a background thread.
+        """
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = Thread(target=self._flush_periodically, name="MetricsRegistry", daemon=True)
+                self._flusher.start()
+
+    def stop(self):
+        """
+        Stops periodically flushing, flushing one last time.
+        """
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+
+    def flush(self):
+        """
+        Records aggregates of all metrics using the logger.
+        """
+        with self._lock:
+            metrics = list(self._metrics.items())
+            samplers = list(self._samplers.items())
+
+        for (name, tags), metric in metrics:
+            value = metric.collect()
+            if value is not None:
+                self.logger.record(name, value, dict(tags) if len(tags) > 0 else None)
+        for (name, tags), sampler in samplers:
+            try:
+                value = sampler()
+            except Exception:
+                logging.exception("Failed to sample \"%s\"" % name)
+                continue
+            self.logger.record(name, value, dict(tags) if len(tags) > 0 else None)
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval.total_seconds()):
+            self.flush()
+        self.flush()
+
+    def _get_or_create(self, name: str, tags: Optional[Dict[str, str]], metric_type: type) -> Any:
+        key = MetricsRegistry._to_key(name, tags)
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = metric_type()
+                    self._metrics[key] = metric
+        if not isinstance(metric, metric_type):
+            raise TypeError("Metric \"%s\" is a `%s`, not a `%s`" % (name, type(metric).__name__, metric_type.__name__))
+        return metric
+
+    @staticmethod
+    def _to_key(name: str, tags: Optional[Dict[str, str]]) -> _MetricKey:
+        return name, tuple(sorted(tags.items())) if tags is not None else ()
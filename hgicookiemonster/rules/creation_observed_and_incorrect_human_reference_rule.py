@@ -8,6 +8,7 @@ from hgicookiemonster.context import HgiContext
 from hgicookiemonster.rules.not_cram_rule import NOT_CRAM_RULE_PRIORITY
 from hgicookiemonster.shared.common import was_creation_observed, extract_latest_metadata_key_value_known_in_irods
 from hgicookiemonster.shared.constants.irods import IRODS_REFERENCE_KEY
+from hgicookiemonster.shared.references import ReferenceClassifier
 
 CREATION_OBSERVED_AND_INCORRECT_HUMAN_REFERENCE_RULE_ID = "creation_observed_and_incorrect_human_reference"
 CREATION_OBSERVED_AND_INCORRECT_HUMAN_REFERENCE_RULE_PRIORITY = NOT_CRAM_RULE_PRIORITY + 1
@@ -16,6 +17,10 @@ KNOWN_UNINTERESTING_REFERENCES_PATH = normpath(join(dirname(realpath(__file__)),
 
 _REFERENCE_EXTRACTION_PATTERN = re.compile(".*/references/(.*?)/.*", re.IGNORECASE)
 
+# Reloads uninteresting references when the file changes to (easily) support live updates to this list
+_uninteresting_reference_classifier = ReferenceClassifier(
+    KNOWN_UNINTERESTING_REFERENCES_PATH, _REFERENCE_EXTRACTION_PATTERN)
+
 
 def _matches(cookie: Cookie, context: HgiContext) -> bool:
     """
@@ -33,17 +38,7 @@ def _matches(cookie: Cookie, context: HgiContext) -> bool:
         # Multiple values for reference is unexpected
         return False
 
-    reference_species_groups = re.match(_REFERENCE_EXTRACTION_PATTERN, list(reference)[0])
-    if reference_species_groups is None:
-        # Reference is in unexpected format
-        return False
-    reference_species = reference_species_groups.group(1)
-
-    # Read uninteresting references from file every time to (easily) support live updates to this list
-    with open(KNOWN_UNINTERESTING_REFERENCES_PATH, "r") as file:
-        uninteresting_references = file.read().splitlines()
-
-    return reference_species in uninteresting_references
+    return _uninteresting_reference_classifier.is_listed_species(list(reference)[0])
 
 
 def _action(cookie: Cookie, context: HgiContext) -> bool:
@@ -1,65 +1,98 @@
 import json
 import os
-from collections import UserDict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPSConnection, HTTPResponse, RemoteDisconnected
 from os.path import dirname, normpath, realpath, join
-from typing import Dict, List, Any, Iterable
-from urllib.parse import quote
-from urllib.request import urlopen, Request
+from threading import Lock
+from typing import Any, Iterable, Iterator, Tuple, Mapping
+from urllib.error import HTTPError
+from urllib.parse import quote, urlparse
+from weakref import WeakSet
 
 from cookiemonster.common.helpers import EnrichmentJSONDecoder
 from cookiemonster.common.models import Cookie, Enrichment
-from cookiemonster.processor.json_convert import RuleApplicationLogJSONDecoder
 from cookiemonster.processor.models import Rule
-from cookiemonster.processor.models import RuleApplicationLog
-from cookiemonster.processor.processing import RULE_APPLICATION
 from hgicommon.data_source import register
 from hgicommon.mixable import Priority
 from hgicookiemonster.context import HgiContext
+from hgicookiemonster.shared.caching import LRUCache
+from hgicookiemonster.shared.pooling import ConnectionPool
+from hgicookiemonster.shared.reported import ReportedIndex
 
 NOT_IGNORED_RULE_ID = "not_ignored"
 NOT_IGNORED_RULE_PRIORITY = Priority.MIN_PRIORITY
 
 NOT_IGNORED_LIST_LOCATION = normpath(join(dirname(realpath(__file__)), "not_ignored.txt"))
 
-_RULE_APPLICATION_LOG_JSON_DECODER = RuleApplicationLogJSONDecoder()
+DEFAULT_CACHE_CAPACITY = 1000
+DEFAULT_MAX_CONNECTIONS = 8
+
+_seeded_reported_indexes = WeakSet()     # type: WeakSet
+_seeding_lock = Lock()
+_writing_lock = Lock()
+
+
+def _get_reported(context: HgiContext) -> ReportedIndex:
+    """
+    Gets the index of reported identifiers from the given context, first adding to it the identifiers in the not
+    ignored list (which may have been reported before the index existed).
+    :param context: the context
+    :return: the index of reported identifiers
+    """
+    reported = context.reported
+    if reported not in _seeded_reported_indexes:
+        with _seeding_lock:
+            if reported not in _seeded_reported_indexes:
+                if os.path.exists(NOT_IGNORED_LIST_LOCATION):
+                    with open(NOT_IGNORED_LIST_LOCATION, "r") as file:
+                        reported.mark_all_reported(NOT_IGNORED_RULE_ID,
+                                                   (line.strip() for line in file if len(line.strip()) > 0))
+                _seeded_reported_indexes.add(reported)
+    return reported
 
 
 def _matches(cookie: Cookie, context: HgiContext) -> bool:
     """Matches if this rule has not been matched before."""
-    rule_application_enrichments = [enrichment for enrichment in cookie.enrichments if enrichment.source == RULE_APPLICATION]
-    for enrichment in rule_application_enrichments:
-        rule_application_log = _RULE_APPLICATION_LOG_JSON_DECODER.decode_parsed(enrichment.metadata)    # type: RuleApplicationLog
-        if rule_application_log.rule_id == NOT_IGNORED_RULE_ID:
-            # Limit to reporting once per identifier
-            return False
-    return True
+    # Limit to reporting once per identifier
+    return not _get_reported(context).was_reported(NOT_IGNORED_RULE_ID, cookie.identifier)
 
 
 def _action(cookie: Cookie, context: HgiContext) -> bool:
     """Write identifier to tab file."""
-    with open(NOT_IGNORED_LIST_LOCATION, "a") as file:
-        file.write("%s%s" % (cookie.identifier, os.linesep))
-        file.flush()
+    reported = _get_reported(context)
+    with _writing_lock:
+        if not reported.was_reported(NOT_IGNORED_RULE_ID, cookie.identifier):
+            # Only recorded as reported once in the list, so that it is listed when next processed if writing fails
+            with open(NOT_IGNORED_LIST_LOCATION, "a") as file:
+                file.write("%s%s" % (cookie.identifier, os.linesep))
+                file.flush()
+                os.fsync(file.fileno())
+            reported.mark_reported(NOT_IGNORED_RULE_ID, cookie.identifier)
     return False
 
 
-class _CookieLoadingDict(UserDict):
+class _CookieLoader:
     """
-    Dictionary where keys should be identifiers to cookies that are accessible via the Cookie Monster API. Values are
-    loaded from the API on-the-fly and cached.
+    Loads cookies from the Cookie Monster API, reusing HTTP connections between requests.
     """
     _ENRICHMENT_JSON_DECODER = EnrichmentJSONDecoder()
 
-    def __init__(self, api_location: str, identifiers: Iterable[str]):
-        super().__init__({(identifier, None) for identifier in identifiers})
+    def __init__(self, api_location: str, max_connections: int=DEFAULT_MAX_CONNECTIONS):
+        """
+        Constructor.
+        :param api_location: the location of the Cookie Monster API's cookie jar endpoint
+        :param max_connections: the maximum number of connections to the API that can be open at once
+        """
         self.api_location = api_location
-
-    def __getitem__(self, key: Any) -> Cookie:
-        if self.data[key] is None:
-            self[key] = self._load_cookie(key)
-        return self.data[key]
-
-    def _load_cookie(self, identifier: str) -> Cookie:
+        self.max_connections = max_connections
+        parsed_location = urlparse(api_location)
+        connection_type = HTTPSConnection if parsed_location.scheme == "https" else HTTPConnection
+        self._path = parsed_location.path
+        self._connection_pool = ConnectionPool(
+            lambda: connection_type(parsed_location.netloc), max_connections)  # type: ConnectionPool[HTTPConnection]
+
+    def load(self, identifier: str) -> Cookie:
         """
         Loads a cookie with the given identifier.
         :param identifier: the identifier of the cookie to load
@@ -67,19 +100,105 @@ class _CookieLoadingDict(UserDict):
         """
         # FIXME: There should be a `CookieJar` to do all this (see issue:
         # https://github.com/wtsi-hgi/cookie-monster/issues/44)
-        url = "%s?identifier=%s" % (self.api_location, quote(identifier))
-        request = Request(url, None, {"Accept": "application/json"})
-        cookie_as_json = json.loads(urlopen(request).read().decode("utf-8"))
+        url = "%s?identifier=%s" % (self._path, quote(identifier))
+        try:
+            response, body = self._get(url)
+        except (RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # The API may have closed the connection whilst it was idle in the pool
+            response, body = self._get(url, fresh=True)
+        if response.status != 200:
+            raise HTTPError(self.api_location, response.status, response.reason, response.headers, None)
+        cookie_as_json = json.loads(body.decode("utf-8"))
         # FIXME: There should be a `CookieJSONDecoder`
         cookie = Cookie(identifier)
-        for enrichment in _CookieLoadingDict._ENRICHMENT_JSON_DECODER.decode_parsed(cookie_as_json["enrichments"]):
+        for enrichment in _CookieLoader._ENRICHMENT_JSON_DECODER.decode_parsed(cookie_as_json["enrichments"]):
             assert isinstance(enrichment, Enrichment)
             cookie.enrich(enrichment)
         return cookie
 
+    def _get(self, url: str, fresh: bool=False) -> Tuple[HTTPResponse, bytes]:
+        """
+        Makes a GET request to the API.
+        :param url: the URL to get, relative to the API's host
+        :param fresh: whether to make the request on a new connection rather than on one that has been used before
+        :return: tuple where the first element is the response and the second is its body
+        """
+        with self._connection_pool.connection(fresh) as connection:
+            connection.request("GET", url, headers={"Accept": "application/json"})
+            response = connection.getresponse()
+            return response, response.read()
+
+    def load_all(self, identifiers: Iterable[str]) -> Iterator[Tuple[str, Cookie]]:
+        """
+        Loads the cookies with the given identifiers, loading up to `max_connections` concurrently ahead of the one
+        being yielded.
+        :param identifiers: the identifiers of the cookies to load
+        :return: iterator of tuples where the first element is the identifier and the second is its cookie, in the
+        order of the given identifiers
+        """
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            loading = deque()   # type: deque
+            for identifier in identifiers:
+                loading.append((identifier, executor.submit(self.load, identifier)))
+                if len(loading) > self.max_connections:
+                    identifier, future = loading.popleft()
+                    yield identifier, future.result()
+            while len(loading) > 0:
+                identifier, future = loading.popleft()
+                yield identifier, future.result()
+
+
+class _CookieLoadingDict(Mapping):
+    """
+    Dictionary where keys should be identifiers to cookies that are accessible via the Cookie Monster API. Values are
+    loaded from the API on-the-fly and the most recently used are cached.
+    """
+    def __init__(self, api_location: str, identifiers: Iterable[str], cache_capacity: int=DEFAULT_CACHE_CAPACITY,
+                 max_connections: int=DEFAULT_MAX_CONNECTIONS):
+        self.api_location = api_location
+        self._identifiers = OrderedDict.fromkeys(identifiers)
+        self._cache = LRUCache(cache_capacity)
+        self._loader = _CookieLoader(api_location, max_connections)
+
+    def __getitem__(self, key: Any) -> Cookie:
+        if key not in self._identifiers:
+            raise KeyError(key)
+        return self._cache.get_or_compute(key, lambda: self._loader.load(key))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._identifiers)
+
+    def __len__(self) -> int:
+        return len(self._identifiers)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._identifiers
+
+    def iterate_cookies(self) -> Iterator[Tuple[str, Cookie]]:
+        """
+        Iterates through the cookies, loading them concurrently.
+        :return: iterator of tuples where the first element is the identifier and the second is its cookie
+        """
+        for identifier, cookie in self._loader.load_all(self._identifiers):
+            self._cache.put(identifier, cookie)
+            yield identifier, cookie
+
+
+def _read_not_ignored_identifiers(not_ignored_list_location: str) -> Iterator[str]:
+    """
+    Reads the identifiers in the not ignored list at the given location.
+    :param not_ignored_list_location: the location of the not ignored list to read
+    :return: iterator of the identifiers
+    """
+    with open(not_ignored_list_location, "r") as file:
+        for line in file:
+            identifier = line.strip()
+            if len(identifier) > 0:
+                yield identifier
+
 
 def read_not_ignored(cookie_monster_api_location: str, not_ignored_list_location: str=NOT_IGNORED_LIST_LOCATION) \
-        -> Dict[str, Cookie]:
+        -> Mapping[str, Cookie]:
     """
     Gets not ignored cookies in a dict where the keys are the identifiers of the ignored cookies and the values are the
     cookies themselves (loaded from the API on-the-fly).
@@ -87,11 +206,21 @@ def read_not_ignored(cookie_monster_api_location: str, not_ignored_list_location
     :param not_ignored_list_location: the location of the not ignored list to read
     :return: not ignored cookies
     """
-    identifiers = []    # type: List[str]
-    with open(not_ignored_list_location, "r") as file:
-        for line in file:
-            identifiers.append(line.strip())
-    return _CookieLoadingDict(cookie_monster_api_location, identifiers)
+    return _CookieLoadingDict(cookie_monster_api_location, _read_not_ignored_identifiers(not_ignored_list_location))
+
+
+def iterate_not_ignored(cookie_monster_api_location: str, not_ignored_list_location: str=NOT_IGNORED_LIST_LOCATION,
+                        max_connections: int=DEFAULT_MAX_CONNECTIONS) -> Iterator[Tuple[str, Cookie]]:
+    """
+    Iterates through the not ignored cookies, which are loaded from the API concurrently as the not ignored list is
+    read. Unlike `read_not_ignored`, cookies are not kept once yielded.
+    :param cookie_monster_api_location: the location of the Cookie Monster API
+    :param not_ignored_list_location: the location of the not ignored list to read
+    :param max_connections: the maximum number of connections to the API that can be open at once
+    :return: iterator of tuples where the first element is the identifier and the second is its cookie
+    """
+    loader = _CookieLoader(cookie_monster_api_location, max_connections)
+    return loader.load_all(_read_not_ignored_identifiers(not_ignored_list_location))
 
 
 _rule = Rule(_matches, _action, NOT_IGNORED_RULE_ID, NOT_IGNORED_RULE_PRIORITY)
@@ -0,0 +1,89 @@
+from datetime import datetime
+from os.path import normpath, dirname, join, realpath
+from typing import Callable, Dict
+
+from cookiemonster.common.models import Cookie
+from cookiemonster.processor.models import Rule
+from hgicommon.data_source import register
+from hgicookiemonster.context import HgiContext
+from hgicookiemonster.rules._common import STUDY_RULE_PRIORITY
+from hgicookiemonster.shared.common import extract_studies_of_library
+from hgicookiemonster.shared.constants.enrichments import IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.shared.reloading import ReloadingFileContents
+
+STUDY_LIBRARY_RULE_ID = "study_library"
+STUDY_LIBRARY_RULE_PRIORITY = STUDY_RULE_PRIORITY
+
+WATCHED_STUDIES_PATH = normpath(join(dirname(realpath(__file__)), "resources/studies.txt"))
+
+
+def _parse_watched_studies(contents: str) -> Dict[str, str]:
+    """
+    Parses the table of watched studies, where each (non-empty, non-comment) line holds a study ID then a tab then the
+    study's display name.
+    :param contents: the contents of the table
+    :return: map where the key is the study ID and the value is its display name
+    """
+    watched_studies = dict()    # type: Dict[str, str]
+    for line in contents.splitlines():
+        line = line.strip()
+        if len(line) == 0 or line.startswith("#"):
+            continue
+        study_id, _, name = line.partition("\t")
+        watched_studies[study_id.strip()] = name.strip()
+    return watched_studies
+
+
+# Reloaded when the file changes to support live updates to the watched studies
+_watched_studies = ReloadingFileContents(WATCHED_STUDIES_PATH, _parse_watched_studies)
+
+
+def _get_matched_studies(cookie: Cookie) -> Dict[str, str]:
+    """
+    Gets the watched studies that the given cookie relates to a library in.
+    :param cookie: the cookie
+    :return: map where the key is the study ID and the value is its display name
+    """
+    watched_studies = _watched_studies.get()
+    study_ids = extract_studies_of_library(cookie.enrichments)
+    return {study_id: watched_studies[study_id] for study_id in study_ids & watched_studies.keys()}
+
+
+def _matches(cookie: Cookie, context: HgiContext) -> bool:
+    """Matches if the cookie relates to a library in any of the watched studies."""
+    return len(_get_matched_studies(cookie)) > 0
+
+
+def _action(cookie: Cookie, context: HgiContext) -> bool:
+    """Write a line for each of the watched studies that the library is in, unless already written."""
+    timestamp = cookie.enrichments.get_most_recent_from_source(IRODS_UPDATE_ENRICHMENT).timestamp
+    for study_id, name in sorted(_get_matched_studies(cookie).items()):
+        reported_id = "%s:%s" % (STUDY_LIBRARY_RULE_ID, study_id)
+        if context.reported.was_reported(reported_id, cookie.identifier):
+            continue
+        # Only recorded as reported once the line is in the file, so that a line that is not written (e.g. as Cookie
+        # Monster stopped before it was) is written when the cookie is next processed
+        on_written = _create_on_written(cookie.identifier, timestamp, study_id, name, reported_id, context)
+        if context.rule_writer("Additional library in iRODS for study %s (%s) at %s: %s"
+                               % (study_id, name, timestamp, cookie.identifier), on_written) is False:
+            raise IOError("Line about additional library in study %s was not written: %s"
+                          % (study_id, cookie.identifier))
+    return False
+
+
+def _create_on_written(identifier: str, timestamp: datetime, study_id: str, name: str, reported_id: str,
+                       context: HgiContext) -> Callable[[], None]:
+    """
+    Creates the callback for when the line about an additional library in a study has been written, which records that
+    it has been reported and notifies Slack.
+    """
+    def on_written():
+        context.reported.mark_reported(reported_id, identifier)
+        if context.slack is not None:
+            context.slack.post("Additional library at %s: %s" % (timestamp, identifier),
+                               group="Additional libraries in iRODS for study %s (%s)" % (study_id, name))
+    return on_written
+
+
+_rule = Rule(_matches, _action, STUDY_LIBRARY_RULE_ID, STUDY_LIBRARY_RULE_PRIORITY)
+register(_rule)
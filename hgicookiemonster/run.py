@@ -1,12 +1,11 @@
 import logging
 import time
 import os
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from threading import Lock
+from typing import Callable, List
 
 from cookiemonster.common.collections import UpdateCollection
-from cookiemonster.common.models import Enrichment
+from cookiemonster.common.models import Enrichment, Update
 from cookiemonster.contrib.connection_pool import patch_connection_pools
 from cookiemonster.cookiejar import CookieJar, RateLimitedBiscuitTin
 from cookiemonster.cookiejar.biscuit_tin import add_couchdb_logging
@@ -14,25 +13,41 @@ from cookiemonster.cookiejar.logging_cookie_jar import add_cookie_jar_logging
 from cookiemonster.elmo import HTTP_API, APIDependency
 from cookiemonster.logging.influxdb.logger import InfluxDBLogger
 from cookiemonster.logging.influxdb.models import InfluxDBConnectionConfig
-from cookiemonster.logging.logger import PythonLoggingLogger, Logger
+from cookiemonster.logging.logger import PythonLoggingLogger
 from cookiemonster.monitor.cookiejar_monitor import CookieJarMonitor
 from cookiemonster.monitor.threads_monitor import ThreadsMonitor
-from cookiemonster.processor._enrichment import EnrichmentLoaderSource
-from cookiemonster.processor._rules import RuleSource
 from cookiemonster.processor.basic_processing import BasicProcessorManager
 from cookiemonster.processor.processing import ProcessorManager
 from cookiemonster.retriever.manager import PeriodicRetrievalManager, RetrievalManager
 from cookiemonster.retriever.source.irods.baton_mappers import BatonUpdateMapper
 
-from hgicookiemonster.clients.message_queue import BasicMessageQueue
-from hgicookiemonster.clients.slack import BasicSlackClient
+from hgicookiemonster.clients.slack import BasicSlackClient, SlackNotifier
+from hgicookiemonster.checkpoint import EnrichmentCheckpoint
 from hgicookiemonster.clients.rule_log import RuleOutputWriter
+from hgicookiemonster.concurrency import ConcurrencyController, BACKEND_COOKIE_JAR, add_http_bulkhead
 from hgicookiemonster.config import load_config
 from hgicookiemonster.context import HgiContext
+from hgicookiemonster.debug.profiler import SamplingProfiler, install_profile_signal_handler, serve_profiler
+from hgicookiemonster.enrichment_loaders._irods import is_prefetch_candidate, prefetch_data_object
+from hgicookiemonster.ingest import PathPatternUpdateFilter, group_updates_by_target
+from hgicookiemonster.instrumentation import InstrumentedRuleSource, InstrumentedEnrichmentLoaderSource
+from hgicookiemonster.metrics import MetricsRegistry
+from hgicookiemonster.shared.constants.enrichments import IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.shared.executors import BoundedThreadPoolExecutor
+from hgicookiemonster.shared.reported import ReportedIndex
 
 MEASUREMENT_ENRICH_TIME = "enrich_time"
+MEASUREMENT_ENRICH_QUEUE_TIME = "enrich_queue_time"
 MEASUREMENT_STILL_TO_ENRICH = "still_to_enrich"
-IRODS_UPDATE_ENRICHMENT = "irods_update"
+MEASUREMENT_INGEST = "ingest"
+MEASUREMENT_ENRICHMENT_QUEUE = "enrichment_queue"
+MEASUREMENT_CHECKPOINT = "checkpoint"
+
+DEFAULT_MAX_ENRICHMENT_RETRIES = 3
+DEFAULT_ENRICHMENT_RETRY_BACKOFF = timedelta(seconds=1)
+
+CHECKPOINT_FILE = "since"
+REPORTED_INDEX_FILE = "reported"
 
 
 def run(config_location):
@@ -44,6 +59,9 @@ def run(config_location):
     influxdb_config = InfluxDBConnectionConfig(config.influxdb.host, config.influxdb.port, config.influxdb.username,
                                                config.influxdb.password, config.influxdb.database)
     logger = InfluxDBLogger(influxdb_config, buffer_latency=logging_buffer_latency)
+    # Measurements made on hot paths are aggregated in-process then flushed at the rate that the logger buffers
+    metrics = MetricsRegistry(logger, logging_buffer_latency)
+    metrics.start()
 
     # Set HTTP(S) connection pool size (for CouchDB)
     # NOTE This is taken from an environment variable, as it's not
@@ -61,41 +79,76 @@ def run(config_location):
     add_cookie_jar_logging(cookie_jar, logger)
     add_couchdb_logging(cookie_jar, logger)
 
+    # Give each backend a bulkhead with a concurrency limit that adapts to its latency and error rate. The limits are
+    # capped by the sizes of the connection pools to the backends. The cookie jar's bulkhead is around the requests to
+    # CouchDB, beneath its rate limiting and buffering
+    concurrency = ConcurrencyController(metrics)
+    add_http_bulkhead(config.cookie_jar.url, concurrency.bulkhead(BACKEND_COOKIE_JAR, pool_size))
+
     # Setup data retrieval manager
     update_mapper = BatonUpdateMapper(config.baton.binaries_location, zone=config.baton.zone)
     retrieval_manager = PeriodicRetrievalManager(config.retrieval.period, update_mapper, logger)
 
-    # # Setup basic Slack client
-    # slack = BasicSlackClient(config.slack.token, config.slack.default_channel, config.slack.default_username)
+    # Setup rate limited, digesting Slack notifier (if configured)
     slack = None
+    if config.slack is not None:
+        slack_client = BasicSlackClient(config.slack.token, config.slack.default_channel,
+                                        config.slack.default_username)
+        slack = SlackNotifier(slack_client, metrics, max_posts_per_minute=config.slack.max_posts_per_minute,
+                              digest_window=config.slack.digest_window)
 
     # Setup rule output log file writer
-    rule_log_writer = RuleOutputWriter(config.output.log_file)
+    rule_log_writer = RuleOutputWriter(config.output.log_file, metrics, max_file_size=config.output.max_size,
+                                       rotate_daily=config.output.rotate_daily, fsync=config.output.fsync)
 
     # # Setup basic message queue (e.g. RabbitMQ) client
+    # from hgicookiemonster.clients.message_queue import BasicMessageQueue
     # message_queue = BasicMessageQueue(config.message_queue.host, config.message_queue.port,
-    #                                   config.message_queue.username, config.message_queue.password)
+    #                                   config.message_queue.username, config.message_queue.password, metrics)
     message_queue = None
 
+    # Setup the record of what rules that report once per identifier have reported
+    reported = ReportedIndex(os.path.join(config_location, REPORTED_INDEX_FILE))
+
     # Define the context that rules and enrichment loaders has access to
-    context = HgiContext(cookie_jar, config, rule_log_writer, slack, message_queue)
+    context = HgiContext(cookie_jar, config, rule_log_writer, slack, message_queue, logger, metrics, reported,
+                         concurrency)
 
     # Setup rules source
-    rules_source = RuleSource(config.processing.rules_location, context)
+    rules_source = InstrumentedRuleSource(config.processing.rules_location, context)
     rules_source.start()
 
     # Setup enrichment loader source
-    enrichment_loader_source = EnrichmentLoaderSource(config.processing.enrichment_loaders_location, context)
+    enrichment_loader_source = InstrumentedEnrichmentLoaderSource(
+        config.processing.enrichment_loaders_location, context)
     enrichment_loader_source.start()
 
     # Setup the data processor manager
     processor_manager = BasicProcessorManager(cookie_jar, rules_source, enrichment_loader_source,
                                               config.processing.max_threads, logger)
 
+    # Setup speculative fetching of the data objects that cookies will be enriched with
+    prefetch = None
+    if config.baton.prefetch:
+        def prefetch(update: Update):
+            if is_prefetch_candidate(update):
+                prefetch_data_object(update.target, context)
+
+    # Setup filtering of updates that cannot match any rule
+    update_filter = None
+    if len(config.retrieval.ingest_patterns) > 0:
+        update_filter = PathPatternUpdateFilter(config.retrieval.ingest_patterns)
+
+    # Setup checkpointing of how far through the retrieved updates have been put into the cookie jar
+    checkpoint = EnrichmentCheckpoint(os.path.join(config_location, CHECKPOINT_FILE),
+                                      config.retrieval.checkpoint_interval,
+                                      persistence_delay=config.cookie_jar.buffer_latency)
+    metrics.register_sampler(MEASUREMENT_CHECKPOINT, checkpoint.get_status)
+
     # Connect components to the cookie jar
-    _connect_retrieval_manager_to_cookie_jar(retrieval_manager, cookie_jar, config.cookie_jar.max_requests_per_second,
-                                             logger)
-    _connect_retrieval_manager_to_since_file(retrieval_manager, config_location)
+    # There is no point having more threads putting updates into the cookie jar than connections to its database
+    _connect_retrieval_manager_to_cookie_jar(retrieval_manager, cookie_jar, pool_size, metrics, prefetch, update_filter,
+                                             config.retrieval.max_queued_enrichments, checkpoint)
     _connect_processor_manager_to_cookie_jar(processor_manager, cookie_jar)
 
     # Setup the HTTP API
@@ -104,14 +157,18 @@ def run(config_location):
     api.inject(APIDependency.System, None)
     api.listen(config.api.port)
 
-    # Start the retrieval manager from the last known successful
-    # retrieval time (or invocation time, otherwise)
-    try:
-        with open(os.path.join(config_location, "since"), "r") as f:
-            since_time = datetime.fromtimestamp(int(f.read()))
-    except:
+    # Setup sampling profiler, which profiles on signal (writing to the configuration directory) or over HTTP
+    profiler = SamplingProfiler()
+    install_profile_signal_handler(profiler, config_location)
+    if config.api.profiler_port is not None:
+        serve_profiler(profiler, config.api.profiler_port, config.api.profiler_host)
+
+    # Start the retrieval manager from the checkpoint (or invocation time, otherwise)
+    since_time = checkpoint.read()
+    if since_time is None:
         since_time = datetime.now()
 
+    checkpoint.start()
     retrieval_manager.start(since_time)
 
     # Start processing of any unprocessed cookies
@@ -136,70 +193,112 @@ def _connect_processor_manager_to_cookie_jar(processor_manager: ProcessorManager
 
 
 def _connect_retrieval_manager_to_cookie_jar(retrieval_manager: RetrievalManager, cookie_jar: CookieJar,
-                                             number_of_threads: int=None, logger: Logger=PythonLoggingLogger()):
+                                             number_of_threads: int=None, metrics: MetricsRegistry=None,
+                                             prefetch: Callable[[Update], None]=None,
+                                             update_filter: Callable[[Update], bool]=None,
+                                             max_queued_enrichments: int=10000,
+                                             checkpoint: EnrichmentCheckpoint=None,
+                                             max_enrichment_retries: int=DEFAULT_MAX_ENRICHMENT_RETRIES,
+                                             enrichment_retry_backoff: timedelta=DEFAULT_ENRICHMENT_RETRY_BACKOFF) \
+        -> BoundedThreadPoolExecutor:
     """
     Connect the given retrieval manager to the given cookie jar.
     :param retrieval_manager: the retrieval manager
     :param cookie_jar: the cookie jar to connect to
     :param number_of_threads: the number of threads to use when putting cookies into the jar
+    :param metrics: the registry of metrics to measure with (measurements are logged with Python logging if `None`)
+    :param prefetch: optional function that is given each update as it is retrieved, before it is put into the jar
+    :param update_filter: optional predicate that updates must satisfy to be put into the jar
+    :param max_queued_enrichments: the maximum number of enrichments waiting to be put into the jar, above which the
+    retrieval manager is blocked
+    :param checkpoint: optional checkpoint to record the progress of putting retrieved updates into the jar with
+    :param max_enrichment_retries: the maximum number of times to retry putting a cookie's enrichments into the jar
+    before giving up on them
+    :param enrichment_retry_backoff: the time to wait before the first retry, which doubles for each further retry
+    :return: the executor that puts retrieved updates into the jar, which can be shut down once retrieval has stopped
     """
-    still_to_enrich = 0
-    still_to_enrich_lock = Lock()
-    thread_pool = ThreadPoolExecutor(max_workers=number_of_threads)
-
-    def timed_enrichment(target: str, enrichment: Enrichment):
-        nonlocal still_to_enrich
-        logging.debug("Enriching \"%s\" with: %s" % (target, enrichment))
+    if metrics is None:
+        metrics = MetricsRegistry(PythonLoggingLogger())
+        metrics.start()
+    enrich_time = metrics.histogram(MEASUREMENT_ENRICH_TIME)
+    enrich_queue_time = metrics.histogram(MEASUREMENT_ENRICH_QUEUE_TIME)
+    still_to_enrich = metrics.gauge(MEASUREMENT_STILL_TO_ENRICH)
+    admitted = metrics.counter(MEASUREMENT_INGEST, {"outcome": "admitted"})
+    dropped = metrics.counter(MEASUREMENT_INGEST, {"outcome": "dropped"})
+
+    # Blocks the retrieval manager's listener (and therefore further retrievals) when full
+    thread_pool = BoundedThreadPoolExecutor(max_queued_enrichments, max_workers=number_of_threads)
+    metrics.register_sampler(MEASUREMENT_ENRICHMENT_QUEUE, lambda: {"depth": thread_pool.depth,
+                                                                    "blocked_time": thread_pool.blocked_time})
+
+    def timed_enrichment(target: str, enrichments: List[Enrichment], submitted_at: float):
+        logging.debug("Enriching \"%s\" with: %s" % (target, enrichments))
         started_at = time.monotonic()
+        enrich_queue_time.observe(started_at - submitted_at)
 
+        # Only the last enrichment marks the cookie for processing so that it is processed once for all of them
+        timestamps = [enrichment.timestamp for enrichment in enrichments]
+        enriched = 0
         try:
+            for attempt in range(max_enrichment_retries + 1):
+                try:
+                    while enriched < len(enrichments):
+                        cookie_jar.enrich_cookie(target, enrichments[enriched],
+                                                 mark_for_processing=enriched == len(enrichments) - 1)
+                        enriched += 1
+                    break
+                except Exception:
+                    if attempt == max_enrichment_retries:
+                        raise
+                    backoff = enrichment_retry_backoff.total_seconds() * 2 ** attempt
+                    logging.warning("Enrichment of \"%s\" failed; retrying in %.1fs", target, backoff, exc_info=True)
+                    time.sleep(backoff)
+        except:
             # Let's leave this here, as it's very important that the
             # enrichment succeeds and we need to know about it in detail
             # if/when it doesn't!
-            cookie_jar.enrich_cookie(target, enrichment)
-        except:
             logging.exception("Enrichment of \"%s\" failed!!", target)
+            if checkpoint is not None:
+                # The failed enrichments are recorded as such, rather than holding back the checkpoint indefinitely
+                checkpoint.completed(timestamps[:enriched])
+                checkpoint.abandoned(target, timestamps[enriched:])
+            if enriched > 0:
+                # Ensure the enrichments that did succeed get processed
+                cookie_jar.mark_for_processing(target)
             raise
+        finally:
+            still_to_enrich.decrement(len(enrichments))
+
+        if checkpoint is not None:
+            checkpoint.completed(timestamps)
 
         time_taken = time.monotonic() - started_at
-        logger.record(MEASUREMENT_ENRICH_TIME, time_taken)
-        logging.info("Took %f seconds (wall time) to enrich cookie with path \"%s\"" % (time_taken, target))
-        with still_to_enrich_lock:
-            still_to_enrich -= 1
-            logger.record(MEASUREMENT_STILL_TO_ENRICH, still_to_enrich)
+        enrich_time.observe(time_taken)
+        logging.info("Took %f seconds (wall time) to enrich cookie with path \"%s\" with %d enrichment(s)"
+                     % (time_taken, target, len(enrichments)))
 
     def put_updates_in_cookie_jar(update_collection: UpdateCollection):
-        nonlocal still_to_enrich
-        for update in update_collection:
-            enrichment = Enrichment(IRODS_UPDATE_ENRICHMENT, update.timestamp, update.metadata)
-            with still_to_enrich_lock:
-                still_to_enrich += 1
-                logger.record(MEASUREMENT_STILL_TO_ENRICH, still_to_enrich)
-            thread_pool.submit(timed_enrichment, update.target, enrichment)
+        updates = update_collection
+        if update_filter is not None:
+            updates = [update for update in update_collection if update_filter(update)]
+            admitted.increment(len(updates))
+            dropped.increment(len(update_collection) - len(updates))
+        if checkpoint is not None:
+            checkpoint.retrieved([update.timestamp for update in update_collection],
+                                 [update.timestamp for update in updates])
+
+        # Coalesce updates to the same target so that each cookie is enriched (and then processed) once per retrieval
+        for target, target_updates in group_updates_by_target(updates).items():
+            enrichments = []
+            for update in target_updates:
+                if prefetch is not None:
+                    prefetch(update)
+                enrichments.append(Enrichment(IRODS_UPDATE_ENRICHMENT, update.timestamp, update.metadata))
+            still_to_enrich.increment(len(enrichments))
+            thread_pool.submit(timed_enrichment, target, enrichments, time.monotonic(), weight=len(enrichments))
 
     retrieval_manager.add_listener(put_updates_in_cookie_jar)
-
-
-def _connect_retrieval_manager_to_since_file(retrieval_manager: RetrievalManager,
-                                             config_location: str):
-    """
-    Connect the given retrieval manager to the "since" file
-
-    @param  retrieval_manager  The retrieval manager
-    @param  config_location    Directory containing since file
-    """
-    since_file = os.path.join(config_location, "since")
-
-    def update_since_file(update_collection: UpdateCollection):
-        nonlocal since_file
-        
-        if update_collection:
-            last_retrieval_time = update_collection.get_most_recent()[0].timestamp
-
-            with open(since_file, "w") as f:
-                f.write(str(int(last_retrieval_time.timestamp())))
-
-    retrieval_manager.add_listener(update_since_file)
+    return thread_pool
 
 
 if __name__ == "__main__":
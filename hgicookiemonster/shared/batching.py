@@ -0,0 +1,101 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from queue import Queue, Empty
+from threading import Thread, Lock
+from typing import Callable, Dict, Generic, Hashable, Sequence, TypeVar, Union, Optional
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+
+class Batcher(Generic[KeyType, ValueType]):
+    """
+    Collects requests for values over a short window (or until a maximum batch size is reached) so that they can be
+    loaded together. Concurrent requests for the same key share the same load.
+    """
+    def __init__(self, load_batch: Callable[[Sequence[KeyType]], Dict[KeyType, Union[ValueType, Exception]]],
+                 max_batch_size: int, max_wait: timedelta, max_concurrent_batches: int=1):
+        """
+        Constructor.
+        :param load_batch: loads the values for the given keys, returning a map where the key is a requested key and the
+        value is either its value or the exception raised when trying to load it. Requested keys that are missing from
+        the map are given a `KeyError`
+        :param max_batch_size: the maximum number of keys to load in one batch
+        :param max_wait: the maximum time that a request waits for others to join its batch
+        :param max_concurrent_batches: the maximum number of batches that can be loading at once
+        """
+        if max_batch_size < 1:
+            raise ValueError("Maximum batch size must be positive, not %d" % max_batch_size)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._load_batch = load_batch
+        self._requests = Queue()
+        self._pending = dict()  # type: Dict[KeyType, Future]
+        self._pending_lock = Lock()
+        self._loaders = ThreadPoolExecutor(max_workers=max_concurrent_batches)
+        self._collector = None  # type: Optional[Thread]
+
+    def submit(self, key: KeyType) -> Future:
+        """
+        Requests the value associated to the given key.
+        :param key: the key
+        :return: future of the value
+        """
+        with self._pending_lock:
+            if key in self._pending:
+                return self._pending[key]
+            future = Future()
+            self._pending[key] = future
+            if self._collector is None:
+                self._collector = Thread(target=self._collect, name="%s-collector" % type(self).__name__, daemon=True)
+                self._collector.start()
+        self._requests.put(key)
+        return future
+
+    def get(self, key: KeyType) -> ValueType:
+        """
+        Gets the value associated to the given key, blocking until its batch has been loaded.
+        :param key: the key
+        :return: the value
+        :raises Exception: the exception raised when loading the value
+        """
+        return self.submit(key).result()
+
+    def _collect(self):
+        """
+        Collects requests into batches and dispatches them to be loaded. Runs forever.
+        """
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait.total_seconds()
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except Empty:
+                    break
+            self._loaders.submit(self._load, batch)
+
+    def _load(self, keys: Sequence[KeyType]):
+        """
+        Loads the given batch of keys and resolves the futures of the requests for them.
+        :param keys: the keys to load
+        """
+        try:
+            loaded = self._load_batch(keys)
+        except Exception as e:
+            logging.exception("Failed to load batch of %d" % len(keys))
+            loaded = {key: e for key in keys}
+
+        with self._pending_lock:
+            futures = {key: self._pending.pop(key) for key in keys}
+        for key, future in futures.items():
+            value = loaded.get(key, KeyError(key))
+            if isinstance(value, Exception):
+                future.set_exception(value)
+            else:
+                future.set_result(value)
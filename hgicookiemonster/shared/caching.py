@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+DEFAULT_CACHE_CAPACITY = 10000
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe cache that evicts the least recently used entry when full. Hits, misses and evictions are
+    counted.
+    """
+    def __init__(self, capacity: int=DEFAULT_CACHE_CAPACITY):
+        """
+        Constructor.
+        :param capacity: the maximum number of entries to hold
+        """
+        if capacity < 1:
+            raise ValueError("Cache capacity must be positive, not %d" % capacity)
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any=None) -> Any:
+        """
+        Gets the value cached against the given key, marking it as recently used.
+        :param key: the key
+        :param default: the value to return if there is no such key
+        :return: the cached value else the default
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Caches the given value against the given key, evicting the least recently used entry if full.
+        :param key: the key
+        :param value: the value to cache
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any=None) -> Any:
+        """
+        Removes and returns the value cached against the given key.
+        :param key: the key
+        :param default: the value to return if there is no such key
+        :return: the cached value else the default
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Gets the value cached against the given key, computing and caching it if not already cached. The computation is
+        done outside of the lock, therefore two threads missing on the same key at once may both compute it.
+        :param key: the key
+        :param compute: the (argument-less) function that computes the value
+        :return: the cached or computed value
+        """
+        sentinel = _MISSING
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """
+        Removes all entries from the cache. Hit, miss and eviction counts are not reset.
+        """
+        with self._lock:
+            self._data.clear()
+
+
+_MISSING = object()
@@ -1,15 +1,185 @@
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict, Any, Set, Iterable
 
 from baton._baton.json import DataObjectJSONDecoder
+from baton.models import DataObject
 
 from cookiemonster.common.collections import EnrichmentCollection
+from cookiemonster.common.models import Cookie, Enrichment
 from cookiemonster.retriever.source.irods.json_convert import DataObjectModificationJSONDecoder
 from cookiemonster.retriever.source.irods.models import DataObjectModification
-from hgicookiemonster.enrichment_loaders._irods import IRODS_ENRICHMENT
-from hgicookiemonster.run import IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.shared.caching import LRUCache
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT, IRODS_UPDATE_ENRICHMENT, \
+    IRODS_SNAPSHOT_ENRICHMENT
 from hgicookiemonster.shared.constants.irods import IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE, IRODS_STUDY_ID_KEY, \
     IRODS_TARGET_KEY, IRODS_TARGET_LIBRARY_VALUE
 
+DECODED_ENRICHMENTS_CACHE_CAPACITY = 10000
+IRODS_KNOWLEDGE_CACHE_CAPACITY = 1000
+COOKIE_IRODS_KNOWLEDGE_CACHE_CAPACITY = 10000
+
+_DATA_OBJECT_MODIFICATION_JSON_DECODER = DataObjectModificationJSONDecoder()
+_DATA_OBJECT_JSON_DECODER = DataObjectJSONDecoder()
+
+# Shared by all rules so that each enrichment on a cookie is decoded at most once per processing pass. Entries are keyed
+# by the identity of the enrichment and hold a reference to it so that the identity cannot be reused whilst cached
+decoded_enrichments_cache = LRUCache(DECODED_ENRICHMENTS_CACHE_CAPACITY)
+
+
+def _decode_enrichment(enrichment: Enrichment, decoder) -> object:
+    """
+    Decodes the metadata of the given enrichment with the given decoder, using the shared cache of decoded enrichments.
+    :param enrichment: the enrichment to decode
+    :param decoder: the JSON decoder to decode the enrichment's metadata with
+    :return: the decoded model
+    """
+    key = (id(enrichment), id(decoder))
+    cached = decoded_enrichments_cache.get(key)
+    if cached is not None and cached[0] is enrichment:
+        return cached[1]
+    decoded = decoder.decode_parsed(dict(enrichment.metadata))
+    decoded_enrichments_cache.put(key, (enrichment, decoded))
+    return decoded
+
+
+def decode_irods_update_enrichment(enrichment: Enrichment) -> DataObjectModification:
+    """
+    Decodes the given iRODS update enrichment.
+    :param enrichment: the iRODS update enrichment
+    :return: the data object modification that the enrichment holds
+    """
+    return _decode_enrichment(enrichment, _DATA_OBJECT_MODIFICATION_JSON_DECODER)
+
+
+def decode_irods_enrichment(enrichment: Enrichment) -> DataObject:
+    """
+    Decodes the given iRODS enrichment.
+    :param enrichment: the iRODS enrichment
+    :return: the data object that the enrichment holds
+    """
+    return _decode_enrichment(enrichment, _DATA_OBJECT_JSON_DECODER)
+
+
+class IrodsKnowledge:
+    """
+    What is known about a data object in iRODS from a collection of enrichments: the latest value of each metadata key
+    and whether the creation of the data object was observed.
+    """
+    def __init__(self, creation_observed: bool=False, latest_metadata: Dict[str, Any]=None):
+        self.creation_observed = creation_observed
+        self.latest_metadata = latest_metadata if latest_metadata is not None else dict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Gets the latest value associated to the given metadata key.
+        :param key: the metadata key
+        :return: the latest value associated to the key else `None` if no value is known
+        """
+        return self.latest_metadata.get(key)
+
+    def copy(self) -> "IrodsKnowledge":
+        """
+        Copies this knowledge, such that the copy can be extended without changing the original.
+        :return: the copy
+        """
+        return IrodsKnowledge(self.creation_observed, dict(self.latest_metadata))
+
+
+# Projections are keyed by the identity of the enrichment collection and hold a reference to it, along with the number
+# of enrichments that it contained when projected. Enrichments are only ever added to a collection so a change in size
+# is enough to invalidate a projection
+_irods_knowledge_cache = LRUCache(IRODS_KNOWLEDGE_CACHE_CAPACITY)
+
+
+# Projections of the enrichments of each cookie, keyed by the cookie's identifier. Each holds the number of enrichments
+# projected and a hash of their sources and timestamps, which is checked to ensure that a newly fetched copy of the
+# cookie's enrichments starts with the same enrichments before only the remainder are projected
+_cookie_irods_knowledge_cache = LRUCache(COOKIE_IRODS_KNOWLEDGE_CACHE_CAPACITY)
+
+
+def project_irods_knowledge(enrichments: Iterable[Enrichment], knowledge: IrodsKnowledge=None) -> IrodsKnowledge:
+    """
+    Projects what is known about a data object in iRODS from the given enrichments, in a single pass. iRODS snapshot
+    enrichments are projected in the same way as the iRODS update enrichments that they were compacted from.
+    :param enrichments: the enrichments
+    :param knowledge: knowledge from earlier enrichments to extend (modified), else projected from nothing if `None`
+    :return: the projection
+    """
+    if knowledge is None:
+        knowledge = IrodsKnowledge()
+    for enrichment in enrichments:
+        irods_metadata = None
+        if enrichment.source == IRODS_UPDATE_ENRICHMENT or enrichment.source == IRODS_SNAPSHOT_ENRICHMENT:
+            modification = decode_irods_update_enrichment(enrichment)
+            if modification.modified_replicas.get_by_number(IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE) is not None:
+                knowledge.creation_observed = True
+            irods_metadata = modification.modified_metadata
+        if enrichment.source == IRODS_ENRICHMENT:
+            irods_metadata = decode_irods_enrichment(enrichment).metadata
+
+        if irods_metadata is not None:
+            for key, value in irods_metadata.items():
+                knowledge.latest_metadata[key] = value
+
+    return knowledge
+
+
+def get_irods_knowledge(enrichments: EnrichmentCollection) -> IrodsKnowledge:
+    """
+    Gets what is known about a data object in iRODS from the given enrichments. The projection is built lazily and reused
+    until more enrichments are added to the collection.
+    :param enrichments: the enrichments
+    :return: what is known about the data object in iRODS
+    """
+    key = id(enrichments)
+    cached = _irods_knowledge_cache.get(key)
+    if cached is not None:
+        cached_enrichments, number_of_enrichments, knowledge = cached
+        if cached_enrichments is enrichments and number_of_enrichments == len(enrichments):
+            return knowledge
+    knowledge = project_irods_knowledge(enrichments)
+    _irods_knowledge_cache.put(key, (enrichments, len(enrichments), knowledge))
+    return knowledge
+
+
+def get_irods_knowledge_of_cookie(cookie: Cookie) -> IrodsKnowledge:
+    """
+    Gets what is known about the given cookie's data object in iRODS. Unlike `get_irods_knowledge`, the projection is
+    reused across different copies of the cookie (e.g. each time it is fetched from the cookie jar to be processed),
+    with only the enrichments added since it was last projected being decoded. The projection is also made available to
+    `get_irods_knowledge` for the cookie's enrichments.
+    :param cookie: the cookie
+    :return: what is known about the cookie's data object in iRODS
+    """
+    enrichments = cookie.enrichments
+    cached = _irods_knowledge_cache.get(id(enrichments))
+    if cached is not None and cached[0] is enrichments and cached[1] == len(enrichments):
+        return cached[2]
+
+    signatures = [(enrichment.source, enrichment.timestamp) for enrichment in enrichments]
+    knowledge = None
+    cached = _cookie_irods_knowledge_cache.get(cookie.identifier)
+    if cached is not None:
+        number_of_enrichments, signatures_hash, cached_knowledge = cached
+        if number_of_enrichments <= len(signatures) \
+                and hash(tuple(signatures[:number_of_enrichments])) == signatures_hash:
+            knowledge = project_irods_knowledge(list(enrichments)[number_of_enrichments:], cached_knowledge.copy())
+    if knowledge is None:
+        knowledge = project_irods_knowledge(enrichments)
+
+    _cookie_irods_knowledge_cache.put(cookie.identifier, (len(signatures), hash(tuple(signatures)), knowledge))
+    _irods_knowledge_cache.put(id(enrichments), (enrichments, len(enrichments), knowledge))
+    return knowledge
+
+
+def clear_caches():
+    """
+    Clears the caches of decoded enrichments and of projections of what is known in iRODS, e.g. so that the cost of
+    evaluating rules against cookies that have not been seen before can be measured.
+    """
+    decoded_enrichments_cache.clear()
+    _irods_knowledge_cache.clear()
+    _cookie_irods_knowledge_cache.clear()
+
 
 def was_creation_observed(enrichments: EnrichmentCollection) -> bool:
     """
@@ -18,12 +188,7 @@ def was_creation_observed(enrichments: EnrichmentCollection) -> bool:
     :param enrichments: the enrichments to check for the creation with
     :return: whether the creation of the data object was observed
     """
-    for enrichment in enrichments:
-        if enrichment.source == IRODS_UPDATE_ENRICHMENT:
-            modification = DataObjectModificationJSONDecoder().decode_parsed(enrichment.metadata)  # type: DataObjectModification
-            if modification.modified_replicas.get_by_number(IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE) is not None:
-                return True
-    return False
+    return get_irods_knowledge(enrichments).creation_observed
 
 
 def extract_latest_metadata_key_value_known_in_irods(enrichments: EnrichmentCollection, key: str) -> Optional[Tuple]:
@@ -34,21 +199,21 @@ def extract_latest_metadata_key_value_known_in_irods(enrichments: EnrichmentColl
     :param key: the metadata key
     :return: the lastest value associated to the key else `None` if no value is known
     """
-    value = None
-    for enrichment in enrichments:
-        irods_metadata = None
-        if enrichment.source == IRODS_UPDATE_ENRICHMENT:
-            modification = DataObjectModificationJSONDecoder().decode_parsed(dict(enrichment.metadata))
-            irods_metadata = modification.modified_metadata
-        if enrichment.source == IRODS_ENRICHMENT:
-            data_object = DataObjectJSONDecoder().decode_parsed(dict(enrichment.metadata))
-            irods_metadata = data_object.metadata
+    return get_irods_knowledge(enrichments).get(key)
 
-        if irods_metadata is not None:
-            if key in irods_metadata:
-                value = irods_metadata[key]
 
-    return value
+def extract_studies_of_library(enrichments: EnrichmentCollection) -> Set[str]:
+    """
+    Extracts the IDs of the studies that the enrichments indicate a relation to a library in.
+    :param enrichments: the enrichments
+    :return: the IDs of the studies (empty if the enrichments do not indicate a relation to a library)
+    """
+    knowledge = get_irods_knowledge(enrichments)
+    extracted_study_id = knowledge.get(IRODS_STUDY_ID_KEY)
+    extracted_target = knowledge.get(IRODS_TARGET_KEY)
+    if extracted_study_id is None or extracted_target is None or IRODS_TARGET_LIBRARY_VALUE not in extracted_target:
+        return set()
+    return set(extracted_study_id)
 
 
 def relates_to_library_in_study(enrichments: EnrichmentCollection, study_id: str) -> bool:
@@ -58,8 +223,4 @@ def relates_to_library_in_study(enrichments: EnrichmentCollection, study_id: str
     :param study_id: the study of interest
     :return: whether the enrichments indicate to a library in the given study
     """
-    extracted_study_id = extract_latest_metadata_key_value_known_in_irods(enrichments, IRODS_STUDY_ID_KEY)
-    extracted_target = extract_latest_metadata_key_value_known_in_irods(enrichments, IRODS_TARGET_KEY)
-    if extracted_study_id is None or extracted_target is None:
-        return False
-    return IRODS_TARGET_LIBRARY_VALUE in extracted_target and study_id in extracted_study_id
+    return study_id in extract_studies_of_library(enrichments)
@@ -0,0 +1,4 @@
+IRODS_ENRICHMENT = "irods"
+IRODS_UPDATE_ENRICHMENT = "irods_update"
+# Snapshot of the latest metadata and whether the creation was observed, which older iRODS updates are compacted into
+IRODS_SNAPSHOT_ENRICHMENT = "irods_snapshot"
@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Condition
+from typing import Callable
+
+
+class BoundedThreadPoolExecutor:
+    """
+    Thread pool executor with a bounded amount of outstanding (queued or running) work. Submitting work when the bound
+    has been reached blocks the submitter until enough work has completed, applying backpressure to the source of work
+    rather than letting it build up in memory.
+    """
+    def __init__(self, capacity: int, max_workers: int=None):
+        """
+        Constructor.
+        :param capacity: the maximum amount of outstanding work
+        :param max_workers: the number of threads to do work with
+        """
+        if capacity < 1:
+            raise ValueError("Capacity must be positive, not %d" % capacity)
+        self.capacity = capacity
+        self.depth = 0
+        self.blocked_time = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._condition = Condition()
+
+    def submit(self, function: Callable, *args, weight: int=1, **kwargs) -> Future:
+        """
+        Submits work, blocking whilst there is not enough capacity for it.
+        :param function: the function to run
+        :param args: positional arguments to the function
+        :param weight: the amount of work this counts as (work heavier than the capacity is counted as the capacity)
+        :param kwargs: keyword arguments to the function
+        :return: future of the result of the function
+        """
+        weight = min(max(weight, 1), self.capacity)
+        with self._condition:
+            if self.depth + weight > self.capacity:
+                started_blocking_at = time.monotonic()
+                while self.depth + weight > self.capacity:
+                    self._condition.wait()
+                self.blocked_time += time.monotonic() - started_blocking_at
+            self.depth += weight
+
+        try:
+            future = self._executor.submit(function, *args, **kwargs)
+        except:
+            self._release(weight)
+            raise
+        future.add_done_callback(lambda _: self._release(weight))
+        return future
+
+    def shutdown(self, wait: bool=True):
+        """
+        Shuts down the executor.
+        :param wait: whether to wait for outstanding work to complete
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _release(self, weight: int):
+        """
+        Releases the capacity used by completed work.
+        :param weight: the amount of work that completed
+        """
+        with self._condition:
+            self.depth -= weight
+            self._condition.notify_all()
@@ -0,0 +1,148 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from threading import Condition
+from typing import Callable, Generic, TypeVar, List, Tuple, Iterator, Dict
+
+ConnectionType = TypeVar("ConnectionType")
+
+
+class ConnectionPool(Generic[ConnectionType]):
+    """
+    Bounded pool of reusable connections. Connections are health checked before being handed out and are evicted if left
+    idle for too long.
+    """
+    def __init__(self, connection_factory: Callable[[], ConnectionType], max_size: int,
+                 idle_timeout: timedelta=None, health_check: Callable[[ConnectionType], bool]=None):
+        """
+        Constructor.
+        :param connection_factory: creates a new connection
+        :param max_size: the maximum number of connections that can exist at once
+        :param idle_timeout: how long a connection can be left idle before it is evicted (never evicted if `None`)
+        :param health_check: checks whether a connection is still usable (assumed usable if `None`)
+        """
+        if max_size < 1:
+            raise ValueError("Connection pool size must be positive, not %d" % max_size)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._connection_factory = connection_factory
+        self._health_check = health_check
+        self._idle = []     # type: List[Tuple[ConnectionType, float]]
+        self._size = 0
+        self._in_use = 0
+        self._condition = Condition()
+
+    @property
+    def size(self) -> int:
+        """
+        The number of connections that currently exist (in use or idle).
+        """
+        return self._size
+
+    @property
+    def in_use(self) -> int:
+        """
+        The number of connections that are currently in use.
+        """
+        return self._in_use
+
+    def get_status(self) -> Dict[str, int]:
+        """
+        Gets the occupancy of the pool.
+        :return: the occupancy of the pool
+        """
+        with self._condition:
+            return {"size": self._size, "in_use": self._in_use, "idle": len(self._idle), "max_size": self.max_size}
+
+    @contextmanager
+    def connection(self, fresh: bool=False) -> Iterator[ConnectionType]:
+        """
+        Context manager that borrows a connection from the pool, waiting for one to become available if the pool is
+        exhausted, and returns it to the pool afterwards. Connections are discarded if the block raises.
+        :param fresh: whether to create a new connection rather than reuse an idle one
+        :return: the connection
+        """
+        connection, _ = self.acquire(fresh)
+        try:
+            yield connection
+        except:
+            self.discard(connection)
+            raise
+        self.release(connection)
+
+    def acquire(self, fresh: bool=False) -> Tuple[ConnectionType, float]:
+        """
+        Borrows a connection from the pool, waiting for one to become available if the pool is exhausted.
+        :param fresh: whether to create a new connection rather than reuse an idle one (which is discarded if the pool
+        is full)
+        :return: tuple where the first element is the connection and the second is the time (in seconds) spent waiting
+        for it
+        """
+        started_at = time.monotonic()
+        while True:
+            with self._condition:
+                self._evict_idle()
+                while len(self._idle) == 0 and self._size >= self.max_size:
+                    self._condition.wait()
+                    self._evict_idle()
+                if fresh and self._size >= self.max_size:
+                    # Make room for the new connection by discarding the least recently used idle one
+                    del self._idle[0]
+                    self._size -= 1
+                if fresh or len(self._idle) == 0:
+                    self._size += 1
+                    break
+                # Reuse the most recently used connection so that the rest can go idle and be evicted
+                connection, _ = self._idle.pop()
+                self._in_use += 1
+
+            # The health check may be slow so it is done without holding the lock
+            if self._health_check is None or self._health_check(connection):
+                return connection, time.monotonic() - started_at
+            self.discard(connection)
+
+        try:
+            connection = self._connection_factory()
+        except:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._in_use += 1
+        return connection, time.monotonic() - started_at
+
+    def release(self, connection: ConnectionType):
+        """
+        Returns the given connection to the pool.
+        :param connection: the connection previously borrowed from this pool
+        """
+        with self._condition:
+            self._in_use -= 1
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection: ConnectionType):
+        """
+        Discards the given connection, which was borrowed from this pool, rather than returning it to the pool.
+        :param connection: the connection previously borrowed from this pool
+        """
+        with self._condition:
+            self._in_use -= 1
+            self._size -= 1
+            self._condition.notify()
+
+    def _evict_idle(self):
+        """
+        Evicts connections that have been idle for longer than the idle timeout. Must be called with the lock held.
+        """
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout.total_seconds()
+        # Idle connections are ordered by when they were released so the stale ones are at the start
+        number_to_evict = 0
+        while number_to_evict < len(self._idle) and self._idle[number_to_evict][1] < cutoff:
+            number_to_evict += 1
+        if number_to_evict > 0:
+            del self._idle[:number_to_evict]
+            self._size -= number_to_evict
@@ -0,0 +1,56 @@
+from typing import Pattern, FrozenSet
+
+from hgicookiemonster.shared.caching import LRUCache
+from hgicookiemonster.shared.reloading import ReloadingFileContents
+
+REFERENCE_VERDICTS_CACHE_CAPACITY = 10000
+
+
+class _ReferenceClassification:
+    """
+    Species of interest, along with the verdicts made using them.
+    """
+    def __init__(self, species: FrozenSet[str]):
+        self.species = species
+        self.verdicts = LRUCache(REFERENCE_VERDICTS_CACHE_CAPACITY)
+
+
+class ReferenceClassifier:
+    """
+    Classifies references by whether they are for one of the species listed in a file. The list is reloaded when the
+    file changes (which also forgets previous verdicts) and verdicts are memoized per reference. Safe to use
+    concurrently.
+    """
+    def __init__(self, species_list_location: str, species_extraction_pattern: Pattern):
+        """
+        Constructor.
+        :param species_list_location: location of the file listing a species per line
+        :param species_extraction_pattern: pattern that (when matched against a reference from its start) captures the
+        species of the reference in its first group
+        """
+        self._species_extraction_pattern = species_extraction_pattern
+        self._classification = ReloadingFileContents(
+            species_list_location, lambda contents: _ReferenceClassification(frozenset(contents.splitlines())))
+
+    def is_listed_species(self, reference: str) -> bool:
+        """
+        Whether the given reference is for one of the listed species.
+        :param reference: the reference
+        :return: whether the reference is for a listed species (`False` if the species cannot be extracted)
+        """
+        classification = self._classification.get()
+        return classification.verdicts.get_or_compute(
+            reference, lambda: self._classify(reference, classification.species))
+
+    def _classify(self, reference: str, species: FrozenSet[str]) -> bool:
+        """
+        Classifies the given reference using the given species.
+        :param reference: the reference
+        :param species: the listed species
+        :return: whether the reference is for a listed species
+        """
+        reference_species_groups = self._species_extraction_pattern.match(reference)
+        if reference_species_groups is None:
+            # Reference is in unexpected format
+            return False
+        return reference_species_groups.group(1) in species
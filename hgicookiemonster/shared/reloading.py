@@ -0,0 +1,56 @@
+import os
+import time
+from threading import Lock
+from typing import Callable, Generic, TypeVar
+
+DEFAULT_CHECK_INTERVAL = 1.0
+
+ContentsType = TypeVar("ContentsType")
+
+
+class ReloadingFileContents(Generic[ContentsType]):
+    """
+    The parsed contents of a file, which are reloaded when the file is changed (i.e. its inode, modification time or
+    size changes) so that live edits to the file take effect without having to read the file on every access.
+    """
+    def __init__(self, location: str, parser: Callable[[str], ContentsType],
+                 check_interval: float=DEFAULT_CHECK_INTERVAL):
+        """
+        Constructor.
+        :param location: the location of the file
+        :param parser: parses the (string) contents of the file into the required form
+        :param check_interval: the minimum time (in seconds) between checks for changes to the file
+        """
+        self.location = location
+        self.check_interval = check_interval
+        self._parser = parser
+        self._contents = None   # type: ContentsType
+        self._file_signature = None
+        self._last_checked = None   # type: float
+        self._lock = Lock()
+
+    def get(self) -> ContentsType:
+        """
+        Gets the parsed contents of the file, reloading them first if the file has changed.
+        :return: the parsed contents of the file
+        """
+        now = time.monotonic()
+        if self._last_checked is not None and now - self._last_checked < self.check_interval:
+            return self._contents
+
+        with self._lock:
+            if self._last_checked is None or now - self._last_checked >= self.check_interval:
+                try:
+                    stat = os.stat(self.location)
+                except FileNotFoundError:
+                    if self._file_signature is None:
+                        raise
+                    # Keep using the last contents whilst the file is being replaced
+                    return self._contents
+                file_signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if file_signature != self._file_signature:
+                    with open(self.location, "r") as file:
+                        self._contents = self._parser(file.read())
+                    self._file_signature = file_signature
+                self._last_checked = now
+            return self._contents
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+from threading import Lock
+from typing import Iterable, Set, Tuple
+
+
+class ReportedIndex:
+    """
+    Persistent set of the (rule ID, identifier) pairs that rules have reported, for rules that only report once per
+    identifier. Lookups are done in memory; additions are appended to a log file, from which the set is rebuilt when
+    opened. Without a log file, the index only lasts as long as the process.
+    """
+    def __init__(self, location: str=None):
+        """
+        Constructor.
+        :param location: the location of the log file backing the index (created if it does not exist), else `None`
+        to only hold the index in memory
+        """
+        self.location = location
+        self._reported = set()  # type: Set[Tuple[str, str]]
+        self._lock = Lock()
+        self._file = None
+        if location is not None:
+            ends_with_newline = self._load()
+            self._file = open(location, "a")
+            if not ends_with_newline:
+                # Terminate the incomplete line so that it does not run into the next one
+                self._file.write("\n")
+
+    def __len__(self) -> int:
+        return len(self._reported)
+
+    def was_reported(self, rule_id: str, identifier: str) -> bool:
+        """
+        Gets whether the given rule has reported the given identifier.
+        :param rule_id: the ID of the rule
+        :param identifier: the identifier (e.g. of a cookie)
+        :return: whether the identifier has been reported by the rule
+        """
+        return (rule_id, identifier) in self._reported
+
+    def mark_reported(self, rule_id: str, identifier: str) -> bool:
+        """
+        Records that the given rule has reported the given identifier.
+        :param rule_id: the ID of the rule
+        :param identifier: the identifier (e.g. of a cookie)
+        :return: `True` if the identifier had not already been reported by the rule, else `False`
+        """
+        return len(self.mark_all_reported(rule_id, [identifier])) == 1
+
+    def mark_all_reported(self, rule_id: str, identifiers: Iterable[str]) -> Set[str]:
+        """
+        Records that the given rule has reported all of the given identifiers.
+        :param rule_id: the ID of the rule
+        :param identifiers: the identifiers (e.g. of cookies)
+        :return: the identifiers that had not already been reported by the rule
+        """
+        newly_reported = set()  # type: Set[str]
+        with self._lock:
+            for identifier in identifiers:
+                key = (rule_id, identifier)
+                if key not in self._reported:
+                    if self._file is not None:
+                        self._file.write("%s\n" % json.dumps(key))
+                    self._reported.add(key)
+                    newly_reported.add(identifier)
+            if len(newly_reported) > 0 and self._file is not None:
+                self._file.flush()
+        return newly_reported
+
+    def close(self):
+        """
+        Closes the log file backing the index, if there is one.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+
+    def _load(self) -> bool:
+        """
+        Loads the index from the log file.
+        :return: whether the log file is empty or ends with a complete line
+        """
+        if not os.path.exists(self.location):
+            return True
+        line = "\n"
+        with open(self.location, "r") as file:
+            for line_number, line in enumerate(file, 1):
+                if len(line.strip()) == 0:
+                    continue
+                try:
+                    rule_id, identifier = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if Cookie Monster stopped whilst writing it
+                    logging.warning("Ignoring invalid line %d in reported index \"%s\"" % (line_number, self.location))
+                    continue
+                self._reported.add((rule_id, identifier))
+        return line.endswith("\n")
@@ -9,7 +9,7 @@ from cookiemonster.common.models import Enrichment
 from cookiemonster.retriever.source.irods.json_convert import DataObjectModificationJSONEncoder
 from cookiemonster.retriever.source.irods.models import DataObjectModification
 from hgicommon.collections import Metadata
-from hgicookiemonster.run import IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.shared.constants.enrichments import IRODS_UPDATE_ENRICHMENT
 from hgicookiemonster.shared.constants.irods import IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE
 
 UNINTERESTING_DATA_OBJECT_MODIFICATION_AS_METADATA = Metadata(
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+from hgicookiemonster.benchmarks._common import BenchmarkResult, measure, save_baseline, load_baseline, \
+    compare_to_baseline, get_operations_per_second
+
+
+class TestMeasure(unittest.TestCase):
+    """
+    Tests for `measure`.
+    """
+    def test_measure(self):
+        calls = []
+        result = measure("benchmark", lambda: calls.append(None), minimum_time=0.01)
+        self.assertEqual(result.name, "benchmark")
+        self.assertEqual(result.operations, len(calls))
+        self.assertGreaterEqual(result.seconds, 0.01)
+
+
+class TestBaselines(unittest.TestCase):
+    """
+    Tests for `save_baseline`, `load_baseline` and `compare_to_baseline`.
+    """
+    def setUp(self):
+        _, self.location = tempfile.mkstemp()
+
+    def tearDown(self):
+        os.remove(self.location)
+
+    def test_save_then_load(self):
+        results = [BenchmarkResult("a", 100, 1.0), BenchmarkResult("b", 10, 2.0)]
+        save_baseline(results, self.location)
+        self.assertEqual(load_baseline(self.location), {"a": 100.0, "b": 5.0})
+
+    def test_compare_to_baseline(self):
+        baseline = {"faster": 100.0, "within_tolerance": 100.0, "slower": 100.0}
+        results = [BenchmarkResult("faster", 200, 1.0), BenchmarkResult("within_tolerance", 95, 1.0),
+                   BenchmarkResult("slower", 50, 1.0), BenchmarkResult("new", 1, 1.0)]
+        comparisons = compare_to_baseline(results, baseline, tolerance=0.1)
+        self.assertEqual({comparison.name: comparison.regressed for comparison in comparisons},
+                         {"faster": False, "within_tolerance": False, "slower": True})
+        self.assertEqual(get_operations_per_second(results[0]), 200.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from hgicookiemonster.benchmarks.imports import get_forbidden_modules, measure_import, measure_rule_loading, \
+    FORBIDDEN_ON_RULE_LOAD
+
+
+class TestGetForbiddenModules(unittest.TestCase):
+    """
+    Tests for `get_forbidden_modules`.
+    """
+    def test_get_forbidden_modules(self):
+        modules = ["pika", "pika.adapters", "pikachu", "hgicookiemonster.run", "hgicookiemonster.runner", "os"]
+        self.assertEqual(get_forbidden_modules(modules, ("pika", "hgicookiemonster.run")),
+                         ["hgicookiemonster.run", "pika", "pika.adapters"])
+
+
+class TestMeasureImport(unittest.TestCase):
+    """
+    Tests for `measure_import`.
+    """
+    def test_constants_are_lightweight(self):
+        measurement = measure_import("hgicookiemonster.shared.constants.enrichments")
+        self.assertGreater(measurement.seconds, 0)
+        self.assertIn("hgicookiemonster.shared.constants.enrichments", measurement.modules)
+        self.assertFalse(any(module.startswith("cookiemonster") for module in measurement.modules))
+
+
+class TestMeasureRuleLoading(unittest.TestCase):
+    """
+    Tests for `measure_rule_loading`.
+    """
+    def test_rules_do_not_import_runtime(self):
+        measurement = measure_rule_loading(reloads=1)
+        self.assertGreater(measurement.cold_seconds, 0)
+        self.assertGreater(measurement.reload_seconds, 0)
+        self.assertEqual(get_forbidden_modules(measurement.modules, FORBIDDEN_ON_RULE_LOAD), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from hgicookiemonster.benchmarks.pipeline import generate_updates, ScriptedRetrievalManager, run_pipeline
+from hgicookiemonster.tests._common import CREATION_DATA_OBJECT_MODIFICATION_AS_METADATA
+
+
+class TestGenerateUpdates(unittest.TestCase):
+    """
+    Tests for `generate_updates`.
+    """
+    def test_generate_updates(self):
+        updates = generate_updates(100, 10)
+        self.assertEqual(len(updates), 100)
+        targets = {update.target for update in updates}
+        self.assertLessEqual(len(targets), 10)
+        self.assertEqual(sorted(updates, key=lambda update: update.timestamp), updates)
+
+    def test_first_update_to_target_is_creation(self):
+        seen = set()
+        for update in generate_updates(100, 10):
+            if update.target not in seen:
+                self.assertEqual(update.metadata, CREATION_DATA_OBJECT_MODIFICATION_AS_METADATA)
+                seen.add(update.target)
+
+
+class TestScriptedRetrievalManager(unittest.TestCase):
+    """
+    Tests for `ScriptedRetrievalManager`.
+    """
+    def test_retrieve(self):
+        retrieval_manager = ScriptedRetrievalManager()
+        retrieved = []
+        retrieval_manager.add_listener(retrieved.append)
+        retrieval_manager.retrieve([])
+        self.assertEqual(retrieved, [[]])
+
+
+class TestRunPipeline(unittest.TestCase):
+    """
+    Tests for `run_pipeline`.
+    """
+    def test_run_pipeline(self):
+        updates = generate_updates(20, 5)
+        measurements = run_pipeline(updates, update_rate=1000, retrieval_period=0.01, max_threads=2, pool_size=2,
+                                    cookie_jar_latency=0, irods_latency=0, timeout=30)
+        self.assertTrue(measurements["completed"])
+        self.assertEqual(measurements["updates"], 20)
+        self.assertEqual(measurements["cookies"], len({update.target for update in updates}))
+        self.assertEqual(measurements["processed"], measurements["cookies"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from datetime import timedelta
+from threading import Lock
+from typing import List, Tuple
+
+from hgicookiemonster.clients.message_queue import BasicMessageQueue
+
+
+class _StubBroker:
+    """
+    Stand-in for a message broker, which can be made to fail publishes and commits.
+    """
+    def __init__(self):
+        self.published = []     # type: List[Tuple[str, str]]
+        self.connections = 0
+        self.commits = 0
+        self.failures_to_raise = 0
+        self.failures_to_commit = 0
+        self._lock = Lock()
+
+    def connect(self, connection_parameters) -> "_StubBroker._Connection":
+        with self._lock:
+            self.connections += 1
+        return _StubBroker._Connection(self)
+
+    class _Connection:
+        def __init__(self, broker: "_StubBroker"):
+            self.broker = broker
+            self.uncommitted = []   # type: List[Tuple[str, str]]
+
+        def channel(self) -> "_StubBroker._Connection":
+            return self
+
+        def tx_select(self):
+            pass
+
+        def basic_publish(self, exchange: str, routing_key: str, body: str) -> bool:
+            with self.broker._lock:
+                if self.broker.failures_to_raise > 0:
+                    self.broker.failures_to_raise -= 1
+                    raise ConnectionError()
+                self.uncommitted.append((routing_key, body))
+                return True
+
+        def tx_commit(self):
+            with self.broker._lock:
+                if self.broker.failures_to_commit > 0:
+                    self.broker.failures_to_commit -= 1
+                    raise ConnectionError()
+                self.broker.published.extend(self.uncommitted)
+                self.broker.commits += 1
+                self.uncommitted = []
+
+        def process_data_events(self):
+            pass
+
+        def close(self):
+            pass
+
+
+class TestBasicMessageQueue(unittest.TestCase):
+    """
+    Tests for `BasicMessageQueue`.
+    """
+    def setUp(self):
+        self.broker = _StubBroker()
+
+    def _create_message_queue(self, **kwargs) -> BasicMessageQueue:
+        return BasicMessageQueue("localhost", 5672, "user", "password", reconnect_delay=timedelta(0),
+                                 connection_factory=self.broker.connect, **kwargs)
+
+    def test_post(self):
+        message_queue = self._create_message_queue(batch_size=3)
+        messages = ["message_%d" % i for i in range(10)]
+        # Stop the publisher from taking messages until all have been posted
+        with message_queue._condition:
+            for message in messages:
+                message_queue.post(message, "queue")
+        message_queue.close()
+        self.assertEqual(self.broker.published, [("queue", message) for message in messages])
+        self.assertEqual(self.broker.connections, 1)
+        self.assertEqual(self.broker.commits, 4)
+
+    def test_post_when_connection_lost(self):
+        self.broker.failures_to_raise = 2
+        message_queue = self._create_message_queue()
+        message_queue.post("message_1", "queue")
+        message_queue.post("message_2", "other_queue")
+        message_queue.close()
+        self.assertEqual(self.broker.published, [("queue", "message_1"), ("other_queue", "message_2")])
+        self.assertEqual(self.broker.connections, 3)
+
+    def test_post_when_not_committed(self):
+        self.broker.failures_to_commit = 1
+        message_queue = self._create_message_queue()
+        with message_queue._condition:
+            message_queue.post("message_1", "queue")
+            message_queue.post("message_2", "queue")
+        message_queue.close()
+        self.assertEqual(self.broker.published, [("queue", "message_1"), ("queue", "message_2")])
+
+    def test_close_when_broker_down(self):
+        self.broker.failures_to_raise = float("inf")
+        message_queue = self._create_message_queue()
+        message_queue.post("message", "queue")
+        unpublished = message_queue.close(timeout=timedelta(milliseconds=100))
+        self.assertEqual(unpublished, [("message", "queue")])
+        # The abandoned message is not published once the broker is back
+        self.broker.failures_to_raise = 0
+        message_queue._publisher.join(timeout=1)
+        self.assertFalse(message_queue._publisher.is_alive())
+        self.assertEqual(self.broker.published, [])
+
+    def test_post_when_closed(self):
+        message_queue = self._create_message_queue()
+        message_queue.close()
+        self.assertRaises(ValueError, message_queue.post, "message", "queue")
+
+    def test_post_when_buffer_full(self):
+        message_queue = self._create_message_queue(max_buffered=2)
+        with message_queue._condition:
+            for i in range(3):
+                message_queue.post("message_%d" % i, "queue")
+            self.assertEqual(message_queue.dropped, 1)
+            self.assertEqual(message_queue.backlog, 2)
+        message_queue.close()
+        self.assertEqual(self.broker.published, [("queue", "message_1"), ("queue", "message_2")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from threading import Event
+
+from hgicookiemonster.clients.rule_log import RuleOutputWriter, FSYNC_ON_FLUSH
+
+
+class TestRuleOutputWriter(unittest.TestCase):
+    """
+    Tests for `RuleOutputWriter`.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "output.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _read_messages(self, filename: str=None):
+        with open(filename or self.filename, "r") as file:
+            return [line.rstrip("\n").split("\t", 1)[1] for line in file]
+
+    def test_close_writes_all_queued(self):
+        writer = RuleOutputWriter(self.filename, flush_size=3, flush_interval=timedelta(hours=1))
+        messages = ["message_%d" % i for i in range(10)]
+        for message in messages:
+            writer(message)
+        writer.close()
+        self.assertEqual(self._read_messages(), messages)
+
+    def test_on_written_called_once_written(self):
+        writer = RuleOutputWriter(self.filename, flush_interval=timedelta(hours=1))
+        in_file_when_written = []
+        writer("message", lambda: in_file_when_written.extend(self._read_messages()))
+        time.sleep(0.1)
+        self.assertEqual(in_file_when_written, [])
+        writer.close()
+        self.assertEqual(in_file_when_written, ["message"])
+
+    def test_dropped_when_closed(self):
+        writer = RuleOutputWriter(self.filename)
+        writer.close()
+        written = []
+        self.assertFalse(writer("message", lambda: written.append(True)))
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(written, [])
+        self.assertEqual(self._read_messages(), [])
+
+    def test_appends_to_existing(self):
+        with open(self.filename, "w") as file:
+            file.write("2016-01-01 00:00:00\texisting\n")
+        writer = RuleOutputWriter(self.filename, fsync=FSYNC_ON_FLUSH)
+        writer("new")
+        writer.close()
+        self.assertEqual(self._read_messages(), ["existing", "new"])
+
+    def test_drops_when_full_for_timeout(self):
+        writer = RuleOutputWriter(self.filename, max_queued=1, flush_size=1, put_timeout=timedelta(milliseconds=100))
+        writing = Event()
+        write = writer._write
+        writer._write = lambda batch: (writing.wait(), write(batch))
+        self.assertTrue(writer("first"))
+        while writer._queue.qsize() > 0:
+            time.sleep(0.01)
+        self.assertTrue(writer("second"))
+        started_at = time.monotonic()
+        self.assertFalse(writer("third"))
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.1)
+        self.assertEqual(writer.dropped, 1)
+        writing.set()
+        writer.close()
+        self.assertEqual(self._read_messages(), ["first", "second"])
+
+    def test_rotates_by_size(self):
+        writer = RuleOutputWriter(self.filename, max_file_size=30)
+        for message in ["a" * 5, "b" * 5, "c" * 5]:
+            writer(message)
+        writer.close()
+        self.assertEqual(self._read_messages(), ["c" * 5])
+        rotated = sorted(filename for filename in os.listdir(self.directory) if filename != "output.log")
+        self.assertEqual([self._read_messages(os.path.join(self.directory, filename)) for filename in rotated],
+                         [["a" * 5], ["b" * 5]])
+
+    def test_rotates_by_size_in_bytes(self):
+        # Each line is 26 characters but 31 bytes
+        writer = RuleOutputWriter(self.filename, max_file_size=60)
+        for message in ["\u00e9" * 5, "\u00e8" * 5]:
+            writer(message)
+        writer.close()
+        self.assertEqual(self._read_messages(), ["\u00e8" * 5])
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_rotates_daily(self):
+        with open(self.filename, "w") as file:
+            file.write("2016-01-01 00:00:00\tyesterday\n")
+        yesterday = (datetime.utcnow() - timedelta(days=1)).timestamp()
+        os.utime(self.filename, (yesterday, yesterday))
+        writer = RuleOutputWriter(self.filename, rotate_daily=True)
+        writer("today")
+        writer.close()
+        self.assertEqual(self._read_messages(), ["today"])
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_unknown_fsync_policy(self):
+        self.assertRaises(ValueError, RuleOutputWriter, self.filename, fsync="sometimes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import time
+import unittest
+from datetime import timedelta
+from threading import Event
+from unittest.mock import MagicMock
+
+from hgicookiemonster.clients.slack import SlackNotifier
+
+
+class TestSlackNotifier(unittest.TestCase):
+    """
+    Tests for `SlackNotifier`.
+    """
+    def setUp(self):
+        self.slack_client = MagicMock()
+        self.slack_client.post.return_value = {"ok": True}
+
+    def _create_notifier(self, **kwargs) -> SlackNotifier:
+        kwargs.setdefault("max_posts_per_minute", 60 * 1000)
+        kwargs.setdefault("retry_backoff", timedelta(0))
+        return SlackNotifier(self.slack_client, **kwargs)
+
+    def _get_posted(self):
+        return [call[0] for call in self.slack_client.post.call_args_list]
+
+    def test_post_without_group(self):
+        notifier = self._create_notifier(digest_window=timedelta(hours=1))
+        notifier.post("message_1", "channel")
+        notifier.post("message_2", "channel")
+        notifier.close()
+        self.assertEqual(self._get_posted(), [("message_1", "channel", None), ("message_2", "channel", None)])
+
+    def test_post_without_group_not_delayed(self):
+        notifier = self._create_notifier(digest_window=timedelta(hours=1))
+        notifier.post("message_1", group="group")
+        notifier.post("message_2")
+        started_at = time.monotonic()
+        while len(self._get_posted()) == 0 and time.monotonic() - started_at < 5:
+            time.sleep(0.01)
+        self.assertEqual(self._get_posted(), [("message_2", None, None)])
+        notifier.close()
+
+    def test_post_digests_group(self):
+        notifier = self._create_notifier(digest_window=timedelta(hours=1))
+        notifier.post("message_1", group="group_1")
+        notifier.post("message_2", group="group_2")
+        notifier.post("message_3", group="group_1")
+        notifier.close()
+        posted = self._get_posted()
+        self.assertEqual(len(posted), 2)
+        self.assertEqual(posted[0][0], "group_1 (2):\n- message_1\n- message_3")
+        self.assertEqual(posted[1][0], "group_2 (1):\n- message_2")
+
+    def test_post_does_not_digest_different_channels(self):
+        notifier = self._create_notifier(digest_window=timedelta(hours=1))
+        notifier.post("message_1", "channel_1", group="group")
+        notifier.post("message_2", "channel_2", group="group")
+        notifier.close()
+        self.assertEqual(len(self._get_posted()), 2)
+
+    def test_post_after_digest_window(self):
+        notifier = self._create_notifier(digest_window=timedelta(0))
+        notifier.post("message", group="group")
+        notifier.close()
+        self.assertEqual(len(self._get_posted()), 1)
+
+    def test_post_retries(self):
+        self.slack_client.post.side_effect = [IOError(), {"ok": False, "error": "ratelimited"}, {"ok": True}]
+        notifier = self._create_notifier(max_retries=2)
+        notifier.post("message")
+        notifier.close()
+        self.assertEqual(self.slack_client.post.call_count, 3)
+        self.assertEqual(notifier.failed, 0)
+
+    def test_post_gives_up(self):
+        self.slack_client.post.side_effect = IOError()
+        notifier = self._create_notifier(max_retries=1)
+        notifier.post("message")
+        notifier.close()
+        self.assertEqual(self.slack_client.post.call_count, 2)
+        self.assertEqual(notifier.failed, 1)
+
+    def test_post_when_full(self):
+        notifier = self._create_notifier(max_queued=1, digest_window=timedelta(hours=1))
+        notifier.post("message_1", group="group")
+        notifier.post("message_2", group="group")
+        notifier.close()
+        self.assertEqual(notifier.dropped, 1)
+        self.assertEqual(self._get_posted(), [("group (1):\n- message_1", None, None)])
+
+    def test_post_when_closed(self):
+        notifier = self._create_notifier()
+        notifier.close()
+        notifier.post("message")
+        self.assertEqual(notifier.dropped, 1)
+        self.assertEqual(self._get_posted(), [])
+
+    def test_close_when_timed_out(self):
+        posting = Event()
+        self.slack_client.post.side_effect = lambda *args: posting.wait(5)
+        notifier = self._create_notifier()
+        notifier.post("message")
+        started_at = time.monotonic()
+        notifier.close(timedelta(seconds=0.1))
+        self.assertLess(time.monotonic() - started_at, 5)
+        posting.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
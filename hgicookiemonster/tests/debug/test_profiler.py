@@ -0,0 +1,160 @@
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+from threading import Event, Thread
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from hgicookiemonster.debug.profiler import SamplingProfiler, ProfilerBusyError, format_thread_stacks, \
+    install_profile_signal_handler, serve_profiler, PROFILE_FILE_PREFIX
+
+_INTERVAL = 0.001
+
+
+def _busy_work_for_profiling(stop: Event):
+    while not stop.is_set():
+        sum(range(100))
+
+
+class _BusyThread:
+    """
+    Thread doing work that can be profiled.
+    """
+    def __init__(self):
+        self._stop = Event()
+        self._thread = Thread(target=_busy_work_for_profiling, args=(self._stop, ), name="busy", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    """
+    Tests for `SamplingProfiler`.
+    """
+    def setUp(self):
+        self.profiler = SamplingProfiler(_INTERVAL)
+
+    def test_profile(self):
+        with _BusyThread():
+            collapsed_stacks = self.profiler.profile(0.1)
+        self.assertGreater(self.profiler.samples, 0)
+        busy_stacks = [line for line in collapsed_stacks.splitlines() if line.startswith("busy;")]
+        self.assertGreater(len(busy_stacks), 0)
+        for line in busy_stacks:
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertIn("_busy_work_for_profiling", stack)
+
+    def test_profile_does_not_sample_itself(self):
+        self.profiler.profile(0.01)
+        self.assertNotIn("_sample_until", self.profiler.get_collapsed_stacks())
+
+    def test_profile_when_already_profiling(self):
+        thread = Thread(target=self.profiler.profile, args=(0.5, ))
+        thread.start()
+        while not self.profiler.running:
+            time.sleep(0.001)
+        self.assertRaises(ProfilerBusyError, self.profiler.profile, 0.01)
+        thread.join()
+        self.assertFalse(self.profiler.running)
+
+
+class TestFormatThreadStacks(unittest.TestCase):
+    """
+    Tests for `format_thread_stacks`.
+    """
+    def test_format_thread_stacks(self):
+        thread_stacks = format_thread_stacks()
+        self.assertIn("# Thread: MainThread", thread_stacks)
+        self.assertIn("test_format_thread_stacks", thread_stacks)
+
+
+class TestInstallProfileSignalHandler(unittest.TestCase):
+    """
+    Tests for `install_profile_signal_handler`.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.original_handler = signal.getsignal(signal.SIGUSR2)
+
+    def tearDown(self):
+        signal.signal(signal.SIGUSR2, self.original_handler)
+        shutil.rmtree(self.directory)
+
+    def test_profile_on_signal(self):
+        install_profile_signal_handler(SamplingProfiler(_INTERVAL), self.directory, duration=0.05)
+        os.kill(os.getpid(), signal.SIGUSR2)
+        deadline = time.monotonic() + 5
+        profiles = []
+        while len(profiles) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+            profiles = os.listdir(self.directory)
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].startswith(PROFILE_FILE_PREFIX))
+
+
+class TestServeProfiler(unittest.TestCase):
+    """
+    Tests for `serve_profiler`.
+    """
+    def setUp(self):
+        self.server = serve_profiler(SamplingProfiler(_INTERVAL), 0, "127.0.0.1")
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_profile(self):
+        with _BusyThread():
+            response = urlopen("%s/profile?seconds=0.1" % self.url)
+        self.assertEqual(response.status, 200)
+        self.assertGreater(int(response.headers["X-Profile-Samples"]), 0)
+        self.assertIn("_busy_work_for_profiling", response.read().decode())
+
+    def test_profile_with_invalid_duration(self):
+        with self.assertRaises(HTTPError) as context:
+            urlopen("%s/profile?seconds=soon" % self.url)
+        self.assertEqual(context.exception.code, 400)
+
+    def test_profile_with_unbounded_duration(self):
+        for seconds in ("nan", "inf", "-1"):
+            with self.assertRaises(HTTPError) as context:
+                urlopen("%s/profile?seconds=%s" % (self.url, seconds))
+            self.assertEqual(context.exception.code, 400)
+
+    def test_profile_with_invalid_interval(self):
+        for interval in ("nan", "inf", "0", "-0.1", "0.0001"):
+            with self.assertRaises(HTTPError) as context:
+                urlopen("%s/profile?seconds=0.1&interval=%s" % (self.url, interval))
+            self.assertEqual(context.exception.code, 400)
+
+    def test_threads(self):
+        response = urlopen("%s/threads" % self.url)
+        self.assertIn("# Thread: MainThread", response.read().decode())
+
+    def test_listens_on_localhost_by_default(self):
+        server = serve_profiler(SamplingProfiler(_INTERVAL), 0)
+        try:
+            self.assertEqual(server.server_address[0], "127.0.0.1")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_unknown_path(self):
+        with self.assertRaises(HTTPError) as context:
+            urlopen("%s/other" % self.url)
+        self.assertEqual(context.exception.code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from concurrent.futures import wait
+from datetime import timedelta
+
+from hgicookiemonster.shared.batching import Batcher
+
+
+class TestBatcher(unittest.TestCase):
+    """
+    Tests for `Batcher`.
+    """
+    def setUp(self):
+        self.batches = []
+
+        def load_batch(keys):
+            self.batches.append(list(keys))
+            return {key: ValueError(key) if key < 0 else key * 2 for key in keys if key != 0}
+
+        self.batcher = Batcher(load_batch, 3, timedelta(milliseconds=100))
+
+    def test_invalid_batch_size(self):
+        self.assertRaises(ValueError, Batcher, dict, 0, timedelta(0))
+
+    def test_get(self):
+        self.assertEqual(self.batcher.get(1), 2)
+
+    def test_requests_within_window_batched(self):
+        futures = [self.batcher.submit(key) for key in (1, 2)]
+        wait(futures, timeout=1)
+        self.assertEqual([future.result() for future in futures], [2, 4])
+        self.assertEqual(self.batches, [[1, 2]])
+
+    def test_batches_limited_in_size(self):
+        futures = [self.batcher.submit(key) for key in (1, 2, 3, 4)]
+        wait(futures, timeout=1)
+        self.assertEqual([len(batch) for batch in self.batches], [3, 1])
+
+    def test_same_key_loaded_once(self):
+        self.assertIs(self.batcher.submit(1), self.batcher.submit(1))
+
+    def test_exception_for_key(self):
+        self.assertRaises(ValueError, self.batcher.get, -1)
+
+    def test_missing_key(self):
+        self.assertRaises(KeyError, self.batcher.get, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
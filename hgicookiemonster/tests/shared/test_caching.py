@@ -0,0 +1,59 @@
+import unittest
+
+from hgicookiemonster.shared.caching import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    """
+    Tests for `LRUCache`.
+    """
+    def setUp(self):
+        self.cache = LRUCache(2)
+
+    def test_invalid_capacity(self):
+        self.assertRaises(ValueError, LRUCache, 0)
+
+    def test_get_when_missing(self):
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_get_when_cached(self):
+        self.cache.put("key", "value")
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put(1, "a")
+        self.cache.put(2, "b")
+        self.cache.get(1)
+        self.cache.put(3, "c")
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.get(1), "a")
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(3), "c")
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_pop(self):
+        self.cache.put("key", "value")
+        self.assertEqual(self.cache.pop("key"), "value")
+        self.assertIsNone(self.cache.pop("key"))
+
+    def test_get_or_compute(self):
+        computations = []
+
+        def compute():
+            computations.append(None)
+            return "value"
+
+        self.assertEqual(self.cache.get_or_compute("key", compute), "value")
+        self.assertEqual(self.cache.get_or_compute("key", compute), "value")
+        self.assertEqual(len(computations), 1)
+
+    def test_clear(self):
+        self.cache.put("key", "value")
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,13 +5,13 @@ from baton.json import DataObjectJSONEncoder
 from baton.collections import IrodsMetadata, DataObjectReplicaCollection
 from baton.models import DataObjectReplica, DataObject
 from cookiemonster.common.collections import EnrichmentCollection
-from cookiemonster.common.models import Enrichment
+from cookiemonster.common.models import Cookie, Enrichment
 from cookiemonster.retriever.source.irods.json_convert import DataObjectModificationJSONEncoder
 from cookiemonster.retriever.source.irods.models import DataObjectModification
 from hgicommon.collections import Metadata
-from hgicookiemonster.enrichment_loaders._irods import IRODS_ENRICHMENT
-from hgicookiemonster.run import IRODS_UPDATE_ENRICHMENT
-from hgicookiemonster.shared.common import was_creation_observed, extract_latest_metadata_key_value_known_in_irods
+from hgicookiemonster.shared.common import was_creation_observed, extract_latest_metadata_key_value_known_in_irods, \
+    decode_irods_update_enrichment, get_irods_knowledge, get_irods_knowledge_of_cookie, clear_caches
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT, IRODS_UPDATE_ENRICHMENT
 from hgicookiemonster.shared.constants.irods import IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE
 from hgicookiemonster.tests._common import UNINTERESTING_DATA_OBJECT_MODIFICATION_AS_METADATA, \
     UNINTERESTING_DATA_OBJECT_AS_METADATA
@@ -19,6 +19,17 @@ from hgicookiemonster.tests._common import UNINTERESTING_DATA_OBJECT_MODIFICATIO
 _METADATA_KEY = "key"
 
 
+def _create_metadata_update_enrichment(timestamp: datetime, value: int) -> Enrichment:
+    """
+    Creates an iRODS update enrichment that sets the test metadata key to the given value.
+    :param timestamp: timestamp of the update
+    :param value: the value the key is set to
+    :return: the created enrichment
+    """
+    return Enrichment(IRODS_UPDATE_ENRICHMENT, timestamp, Metadata(DataObjectModificationJSONEncoder().default(
+        DataObjectModification(IrodsMetadata({_METADATA_KEY: {value}})))))
+
+
 class TestWasCreationObserved(unittest.TestCase):
     """
     Tests for `was_creation_observed`.
@@ -159,5 +170,93 @@ class TestExtractLatestMetadataKeyValueKnownInIrods(unittest.TestCase):
         self.assertIn(1, value)
 
 
+class TestGetIrodsKnowledge(unittest.TestCase):
+    """
+    Tests for `get_irods_knowledge`.
+    """
+    def setUp(self):
+        self.enrichment_collection = EnrichmentCollection()
+        self.enrichment_collection.add(Enrichment(
+            IRODS_UPDATE_ENRICHMENT, datetime(1, 1, 1),
+            Metadata(DataObjectModificationJSONEncoder().default(
+                DataObjectModification(IrodsMetadata({_METADATA_KEY: {0}}))))))
+
+    def test_reused_when_unchanged(self):
+        knowledge = get_irods_knowledge(self.enrichment_collection)
+        self.assertIs(get_irods_knowledge(self.enrichment_collection), knowledge)
+
+    def test_invalidated_when_enrichment_added(self):
+        knowledge = get_irods_knowledge(self.enrichment_collection)
+        self.assertEqual(knowledge.get(_METADATA_KEY), {0})
+        self.assertFalse(knowledge.creation_observed)
+
+        modified_replicas = DataObjectReplicaCollection(
+            {DataObjectReplica(IRODS_FIRST_REPLICA_TO_BE_CREATED_VALUE, "")})
+        modification = DataObjectModification(IrodsMetadata({_METADATA_KEY: {1}}), modified_replicas)
+        self.enrichment_collection.add(Enrichment(
+            IRODS_UPDATE_ENRICHMENT, datetime(2, 2, 2),
+            Metadata(DataObjectModificationJSONEncoder().default(modification))))
+
+        knowledge = get_irods_knowledge(self.enrichment_collection)
+        self.assertEqual(knowledge.get(_METADATA_KEY), {1})
+        self.assertTrue(knowledge.creation_observed)
+
+
+class TestGetIrodsKnowledgeOfCookie(unittest.TestCase):
+    """
+    Tests for `get_irods_knowledge_of_cookie`.
+    """
+    def setUp(self):
+        self.cookie = Cookie("/my/cookie")
+        self.cookie.enrichments.add(_create_metadata_update_enrichment(datetime(1, 1, 1), 0))
+
+    def test_shared_with_get_irods_knowledge(self):
+        knowledge = get_irods_knowledge_of_cookie(self.cookie)
+        self.assertEqual(knowledge.get(_METADATA_KEY), {0})
+        self.assertIs(get_irods_knowledge(self.cookie.enrichments), knowledge)
+
+    def test_extended_for_new_copy_of_cookie(self):
+        knowledge = get_irods_knowledge_of_cookie(self.cookie)
+        fetched_cookie = Cookie("/my/cookie")
+        fetched_cookie.enrichments.add(_create_metadata_update_enrichment(datetime(1, 1, 1), 0))
+        fetched_cookie.enrichments.add(_create_metadata_update_enrichment(datetime(2, 2, 2), 1))
+
+        self.assertEqual(get_irods_knowledge_of_cookie(fetched_cookie).get(_METADATA_KEY), {1})
+        self.assertEqual(knowledge.get(_METADATA_KEY), {0})
+
+    def test_reprojected_when_earlier_enrichments_differ(self):
+        get_irods_knowledge_of_cookie(self.cookie)
+        other_cookie = Cookie("/my/cookie")
+        other_cookie.enrichments.add(
+            Enrichment(IRODS_ENRICHMENT, datetime(1, 1, 1), UNINTERESTING_DATA_OBJECT_AS_METADATA))
+        other_cookie.enrichments.add(Enrichment("other", datetime(2, 2, 2), Metadata()))
+
+        self.assertIsNone(get_irods_knowledge_of_cookie(other_cookie).get(_METADATA_KEY))
+
+    def test_reprojected_when_caches_cleared(self):
+        knowledge = get_irods_knowledge_of_cookie(self.cookie)
+        clear_caches()
+        self.assertIsNot(get_irods_knowledge_of_cookie(self.cookie), knowledge)
+
+
+class TestDecodeIrodsUpdateEnrichment(unittest.TestCase):
+    """
+    Tests for `decode_irods_update_enrichment`.
+    """
+    def test_decoded_once(self):
+        enrichment = Enrichment(
+            IRODS_UPDATE_ENRICHMENT, datetime(1, 1, 1), UNINTERESTING_DATA_OBJECT_MODIFICATION_AS_METADATA)
+        decoded = decode_irods_update_enrichment(enrichment)
+        self.assertIsInstance(decoded, DataObjectModification)
+        self.assertIs(decode_irods_update_enrichment(enrichment), decoded)
+
+    def test_equal_enrichments_decoded_separately(self):
+        enrichment_1 = Enrichment(
+            IRODS_UPDATE_ENRICHMENT, datetime(1, 1, 1), UNINTERESTING_DATA_OBJECT_MODIFICATION_AS_METADATA)
+        enrichment_2 = Enrichment(
+            IRODS_UPDATE_ENRICHMENT, datetime(1, 1, 1), UNINTERESTING_DATA_OBJECT_MODIFICATION_AS_METADATA)
+        self.assertIsNot(decode_irods_update_enrichment(enrichment_1), decode_irods_update_enrichment(enrichment_2))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from threading import Event, Thread
+
+from hgicookiemonster.shared.executors import BoundedThreadPoolExecutor
+
+
+class TestBoundedThreadPoolExecutor(unittest.TestCase):
+    """
+    Tests for `BoundedThreadPoolExecutor`.
+    """
+    def setUp(self):
+        self.executor = BoundedThreadPoolExecutor(2, max_workers=2)
+        self.release = Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.shutdown()
+
+    def test_invalid_capacity(self):
+        self.assertRaises(ValueError, BoundedThreadPoolExecutor, 0)
+
+    def test_submit(self):
+        self.assertEqual(self.executor.submit(lambda x: x + 1, 1).result(timeout=1), 2)
+
+    def test_blocks_when_full(self):
+        self.executor.submit(self.release.wait, weight=2)
+        self.assertEqual(self.executor.depth, 2)
+
+        submitted = Event()
+        submitter = Thread(target=lambda: (self.executor.submit(lambda: None), submitted.set()))
+        submitter.start()
+        self.assertFalse(submitted.wait(timeout=0.1))
+
+        self.release.set()
+        self.assertTrue(submitted.wait(timeout=1))
+        submitter.join()
+        self.assertGreater(self.executor.blocked_time, 0)
+
+    def test_weight_limited_to_capacity(self):
+        self.executor.submit(lambda: None, weight=10).result(timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from datetime import timedelta
+from threading import Thread
+
+from hgicookiemonster.shared.pooling import ConnectionPool
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Tests for `ConnectionPool`.
+    """
+    def setUp(self):
+        self.created = []
+
+        def factory() -> object:
+            connection = object()
+            self.created.append(connection)
+            return connection
+
+        self.pool = ConnectionPool(factory, 2)
+
+    def test_invalid_size(self):
+        self.assertRaises(ValueError, ConnectionPool, object, 0)
+
+    def test_connection_reused(self):
+        with self.pool.connection() as connection_1:
+            pass
+        with self.pool.connection() as connection_2:
+            pass
+        self.assertIs(connection_1, connection_2)
+        self.assertEqual(len(self.created), 1)
+
+    def test_connection_discarded_on_error(self):
+        try:
+            with self.pool.connection():
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        self.assertEqual(self.pool.size, 0)
+        with self.pool.connection():
+            pass
+        self.assertEqual(len(self.created), 2)
+
+    def test_fresh_connection(self):
+        with self.pool.connection():
+            pass
+        with self.pool.connection(fresh=True):
+            pass
+        self.assertEqual(len(self.created), 2)
+        self.assertEqual(self.pool.size, 2)
+
+    def test_fresh_connection_when_full_discards_idle(self):
+        connection_1, _ = self.pool.acquire()
+        connection_2, _ = self.pool.acquire()
+        self.pool.release(connection_1)
+        connection_3, _ = self.pool.acquire(fresh=True)
+        self.assertIsNot(connection_3, connection_1)
+        self.assertEqual(self.pool.get_status(), {"size": 2, "in_use": 2, "idle": 0, "max_size": 2})
+
+    def test_unhealthy_connection_replaced(self):
+        self.pool = ConnectionPool(object, 2, health_check=lambda connection: False)
+        with self.pool.connection() as connection_1:
+            pass
+        with self.pool.connection() as connection_2:
+            pass
+        self.assertIsNot(connection_1, connection_2)
+        self.assertEqual(self.pool.size, 1)
+
+    def test_health_check_does_not_block_pool(self):
+        statuses = []
+
+        def health_check(connection) -> bool:
+            checker = Thread(target=lambda: statuses.append(self.pool.get_status()))
+            checker.start()
+            checker.join(timeout=1)
+            return True
+
+        self.pool.release(self.pool.acquire()[0])
+        self.pool._health_check = health_check
+        with self.pool.connection():
+            pass
+        self.assertEqual(len(statuses), 1)
+        self.assertEqual(statuses[0]["in_use"], 1)
+
+    def test_idle_connection_evicted(self):
+        self.pool.idle_timeout = timedelta(0)
+        with self.pool.connection() as connection_1:
+            pass
+        with self.pool.connection() as connection_2:
+            pass
+        self.assertIsNot(connection_1, connection_2)
+
+    def test_waits_when_exhausted(self):
+        connection_1, _ = self.pool.acquire()
+        self.pool.acquire()
+        self.assertEqual(self.pool.get_status()["in_use"], 2)
+
+        acquired = []
+        waiter = Thread(target=lambda: acquired.append(self.pool.acquire()))
+        waiter.start()
+        waiter.join(timeout=0.1)
+        self.assertEqual(len(acquired), 0)
+
+        self.pool.release(connection_1)
+        waiter.join(timeout=1)
+        self.assertIs(acquired[0][0], connection_1)
+        self.assertEqual(len(self.created), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import re
+import tempfile
+import unittest
+
+from hgicookiemonster.shared.references import ReferenceClassifier
+
+_SPECIES_EXTRACTION_PATTERN = re.compile(".*/references/(.*?)/.*", re.IGNORECASE)
+
+
+class TestReferenceClassifier(unittest.TestCase):
+    """
+    Tests for `ReferenceClassifier`.
+    """
+    def setUp(self):
+        _, self.location = tempfile.mkstemp()
+        self._write("Mus_musculus\nDanio_rerio")
+        self.classifier = ReferenceClassifier(self.location, _SPECIES_EXTRACTION_PATTERN)
+        self.classifier._classification.check_interval = 0
+
+    def tearDown(self):
+        os.remove(self.location)
+
+    def _write(self, contents: str):
+        with open(self.location, "w") as file:
+            file.write(contents)
+
+    def test_listed_species(self):
+        self.assertTrue(self.classifier.is_listed_species("/somewhere/references/Mus_musculus/reference.fa"))
+
+    def test_unlisted_species(self):
+        self.assertFalse(self.classifier.is_listed_species("/somewhere/references/Homo_sapiens/reference.fa"))
+
+    def test_unexpected_format(self):
+        self.assertFalse(self.classifier.is_listed_species("/somewhere/Mus_musculus.fa"))
+
+    def test_verdict_memoized(self):
+        reference = "/somewhere/references/Mus_musculus/reference.fa"
+        self.classifier.is_listed_species(reference)
+        self.classifier.is_listed_species(reference)
+        self.assertEqual(self.classifier._classification.get().verdicts.hits, 1)
+
+    def test_list_changes_take_effect(self):
+        reference = "/somewhere/references/Homo_sapiens/reference.fa"
+        self.assertFalse(self.classifier.is_listed_species(reference))
+        self._write("Homo_sapiens")
+        self.assertTrue(self.classifier.is_listed_species(reference))
+
+
+if __name__ == "__main__":
+    unittest.main()
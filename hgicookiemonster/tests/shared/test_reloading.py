@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from hgicookiemonster.shared.reloading import ReloadingFileContents
+
+
+class TestReloadingFileContents(unittest.TestCase):
+    """
+    Tests for `ReloadingFileContents`.
+    """
+    def setUp(self):
+        _, self.location = tempfile.mkstemp()
+        self._write("a\nb")
+        self.parses = 0
+
+        def parser(contents: str) -> frozenset:
+            self.parses += 1
+            return frozenset(contents.splitlines())
+
+        self.contents = ReloadingFileContents(self.location, parser, check_interval=0)
+
+    def tearDown(self):
+        if os.path.exists(self.location):
+            os.remove(self.location)
+
+    def _write(self, contents: str):
+        with open(self.location, "w") as file:
+            file.write(contents)
+
+    def test_get(self):
+        self.assertEqual(self.contents.get(), {"a", "b"})
+
+    def test_not_reloaded_when_unchanged(self):
+        self.contents.get()
+        self.contents.get()
+        self.assertEqual(self.parses, 1)
+
+    def test_reloaded_when_changed(self):
+        self.contents.get()
+        self._write("c")
+        self.assertEqual(self.contents.get(), {"c"})
+        self.assertEqual(self.parses, 2)
+
+    def test_not_checked_within_check_interval(self):
+        self.contents.check_interval = 60
+        self.contents.get()
+        self._write("c")
+        self.assertEqual(self.contents.get(), {"a", "b"})
+
+    def test_last_contents_kept_when_file_removed(self):
+        self.contents.get()
+        os.remove(self.location)
+        self.assertEqual(self.contents.get(), {"a", "b"})
+
+    def test_get_when_file_does_not_exist(self):
+        os.remove(self.location)
+        self.assertRaises(FileNotFoundError, self.contents.get)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from hgicookiemonster.shared.reported import ReportedIndex
+
+_RULE_ID = "rule"
+_IDENTIFIER = "/path"
+
+
+class TestReportedIndex(unittest.TestCase):
+    """
+    Tests for `ReportedIndex`.
+    """
+    def setUp(self):
+        _, self.location = tempfile.mkstemp()
+        self.reported = ReportedIndex(self.location)
+
+    def tearDown(self):
+        self.reported.close()
+        os.remove(self.location)
+
+    def test_was_reported_when_not_reported(self):
+        self.assertFalse(self.reported.was_reported(_RULE_ID, _IDENTIFIER))
+
+    def test_mark_reported(self):
+        self.assertTrue(self.reported.mark_reported(_RULE_ID, _IDENTIFIER))
+        self.assertTrue(self.reported.was_reported(_RULE_ID, _IDENTIFIER))
+        self.assertFalse(self.reported.was_reported("other", _IDENTIFIER))
+        self.assertFalse(self.reported.mark_reported(_RULE_ID, _IDENTIFIER))
+
+    def test_mark_all_reported(self):
+        self.reported.mark_reported(_RULE_ID, _IDENTIFIER)
+        newly_reported = self.reported.mark_all_reported(_RULE_ID, [_IDENTIFIER, "/other", "/other"])
+        self.assertEqual(newly_reported, {"/other"})
+        self.assertEqual(len(self.reported), 2)
+
+    def test_persisted(self):
+        self.reported.mark_reported(_RULE_ID, _IDENTIFIER)
+        self.reported.mark_reported(_RULE_ID, "/with\ttab")
+        self.reported.close()
+        self.reported = ReportedIndex(self.location)
+        self.assertEqual(len(self.reported), 2)
+        self.assertTrue(self.reported.was_reported(_RULE_ID, "/with\ttab"))
+
+    def test_persisted_after_incomplete_line(self):
+        self.reported.mark_reported(_RULE_ID, _IDENTIFIER)
+        self.reported.close()
+        with open(self.location, "a") as file:
+            file.write("[\"%s\", \"/incompl" % _RULE_ID)
+        self.reported = ReportedIndex(self.location)
+        self.reported.mark_reported(_RULE_ID, "/other")
+        self.reported.close()
+        self.reported = ReportedIndex(self.location)
+        self.assertEqual(len(self.reported), 2)
+        self.assertTrue(self.reported.was_reported(_RULE_ID, "/other"))
+
+    def test_in_memory(self):
+        reported = ReportedIndex()
+        self.assertTrue(reported.mark_reported(_RULE_ID, _IDENTIFIER))
+        self.assertTrue(reported.was_reported(_RULE_ID, _IDENTIFIER))
+        reported.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
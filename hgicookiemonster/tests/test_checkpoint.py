@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from hgicookiemonster.checkpoint import EnrichmentCheckpoint
+
+_TIMESTAMPS = [datetime(2016, 1, 1) + timedelta(seconds=i) for i in range(5)]
+
+
+class TestEnrichmentCheckpoint(unittest.TestCase):
+    """
+    Tests for `EnrichmentCheckpoint`.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, "since")
+        self.checkpoint = EnrichmentCheckpoint(self.location, timedelta(seconds=1))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_watermark_when_nothing_retrieved(self):
+        self.assertIsNone(self.checkpoint.get_watermark())
+
+    def test_get_watermark_when_all_completed(self):
+        self.checkpoint.retrieved(_TIMESTAMPS, _TIMESTAMPS[:2])
+        self.checkpoint.completed(_TIMESTAMPS[:2])
+        self.assertEqual(self.checkpoint.get_watermark(), _TIMESTAMPS[-1])
+
+    def test_get_watermark_when_some_outstanding(self):
+        self.checkpoint.retrieved(_TIMESTAMPS, _TIMESTAMPS)
+        self.checkpoint.completed(_TIMESTAMPS[:1] + _TIMESTAMPS[3:])
+        self.assertLess(self.checkpoint.get_watermark(), _TIMESTAMPS[1])
+        self.assertGreater(self.checkpoint.get_watermark(), _TIMESTAMPS[0])
+
+    def test_get_watermark_with_duplicate_timestamps(self):
+        self.checkpoint.retrieved(_TIMESTAMPS[:1] * 2, _TIMESTAMPS[:1] * 2)
+        self.checkpoint.completed(_TIMESTAMPS[:1])
+        self.assertLess(self.checkpoint.get_watermark(), _TIMESTAMPS[0])
+        self.checkpoint.completed(_TIMESTAMPS[:1])
+        self.assertEqual(self.checkpoint.get_watermark(), _TIMESTAMPS[0])
+
+    def test_abandoned_releases_watermark(self):
+        self.checkpoint.retrieved(_TIMESTAMPS, _TIMESTAMPS)
+        self.checkpoint.completed(_TIMESTAMPS[:1] + _TIMESTAMPS[2:])
+        self.checkpoint.abandoned("/my/target", _TIMESTAMPS[1:2])
+        self.assertEqual(self.checkpoint.get_watermark(), _TIMESTAMPS[-1])
+        with open(self.checkpoint.dead_letter_location, "r") as file:
+            self.assertEqual(file.read(), "%r\t/my/target\n" % _TIMESTAMPS[1].timestamp())
+
+    def test_get_status(self):
+        self.checkpoint.retrieved(_TIMESTAMPS, _TIMESTAMPS)
+        self.checkpoint.completed(_TIMESTAMPS[1:3])
+        self.checkpoint.abandoned("/my/target", _TIMESTAMPS[3:])
+        status = self.checkpoint.get_status()
+        self.assertEqual(status["outstanding"], 1)
+        self.assertEqual(status["abandoned"], 2)
+        self.assertGreater(status["watermark_age"], (datetime.now() - _TIMESTAMPS[0]).total_seconds() - 1)
+
+    def test_read_when_not_written(self):
+        self.assertIsNone(self.checkpoint.read())
+
+    def test_read_when_written_in_whole_seconds(self):
+        with open(self.location, "w") as file:
+            file.write(str(int(_TIMESTAMPS[1].timestamp())))
+        self.assertEqual(self.checkpoint.read(), _TIMESTAMPS[1])
+
+    def test_write_then_read(self):
+        timestamp = _TIMESTAMPS[1] + timedelta(microseconds=500)
+        self.checkpoint.retrieved([timestamp], [])
+        self.checkpoint.write()
+        self.assertEqual(EnrichmentCheckpoint(self.location, timedelta(seconds=1)).read(), timestamp)
+        self.assertEqual(os.listdir(self.directory), ["since"])
+
+    def test_write_when_nothing_retrieved(self):
+        self.checkpoint.write()
+        self.assertFalse(os.path.exists(self.location))
+
+    def test_write_waits_for_persistence_delay(self):
+        checkpoint = EnrichmentCheckpoint(self.location, timedelta(seconds=1), persistence_delay=timedelta(hours=1))
+        checkpoint.retrieved(_TIMESTAMPS, [])
+        checkpoint.write()
+        self.assertIsNone(checkpoint.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from datetime import datetime
+from typing import List
+
+from baton.collections import IrodsMetadata
+from cookiemonster.common.models import Enrichment
+from cookiemonster.processor.json_convert import RuleApplicationLogJSONEncoder
+from cookiemonster.processor.models import RuleApplicationLog
+from cookiemonster.processor.processing import RULE_APPLICATION
+from hgicommon.collections import Metadata
+
+from hgicookiemonster.compaction import compact_enrichments
+from hgicookiemonster.shared.common import project_irods_knowledge
+from hgicookiemonster.shared.constants.enrichments import IRODS_UPDATE_ENRICHMENT, IRODS_SNAPSHOT_ENRICHMENT, \
+    IRODS_ENRICHMENT
+from hgicookiemonster.tests._common import create_creation_enrichment, create_data_object_modification_as_metadata, \
+    create_data_object_as_metadata
+
+_METADATA_KEY = "key"
+_OTHER_METADATA_KEY = "other_key"
+
+
+def _create_update_enrichment(day: int, key: str=_METADATA_KEY, value: str=None) -> Enrichment:
+    metadata = create_data_object_modification_as_metadata(IrodsMetadata({key: {value or str(day)}}))
+    return Enrichment(IRODS_UPDATE_ENRICHMENT, datetime(2016, 1, day), metadata)
+
+
+def _create_rule_application_enrichment(day: int, rule_id: str) -> Enrichment:
+    metadata = Metadata(RuleApplicationLogJSONEncoder().default(RuleApplicationLog(rule_id, False)))
+    return Enrichment(RULE_APPLICATION, datetime(2016, 1, day), metadata)
+
+
+def _create_enrichments() -> List[Enrichment]:
+    return [
+        create_creation_enrichment(datetime(2016, 1, 1)),
+        _create_update_enrichment(2),
+        _create_rule_application_enrichment(3, "rule"),
+        Enrichment(IRODS_ENRICHMENT, datetime(2016, 1, 4), create_data_object_as_metadata(
+            metadata=IrodsMetadata({_METADATA_KEY: {"irods"}, _OTHER_METADATA_KEY: {"irods"}}))),
+        _create_update_enrichment(5, _OTHER_METADATA_KEY),
+        _create_rule_application_enrichment(6, "rule"),
+        _create_update_enrichment(7),
+        _create_rule_application_enrichment(8, "other_rule"),
+        _create_update_enrichment(9)
+    ]
+
+
+class TestCompactEnrichments(unittest.TestCase):
+    """
+    Tests for `compact_enrichments`.
+    """
+    def setUp(self):
+        self.enrichments = _create_enrichments()
+
+    def assertSameKnowledge(self, enrichments: List[Enrichment], other_enrichments: List[Enrichment]):
+        knowledge = project_irods_knowledge(enrichments)
+        other_knowledge = project_irods_knowledge(other_enrichments)
+        self.assertEqual(knowledge.latest_metadata, other_knowledge.latest_metadata)
+        self.assertEqual(knowledge.creation_observed, other_knowledge.creation_observed)
+
+    def test_invalid_keep_recent_updates(self):
+        self.assertRaises(ValueError, compact_enrichments, self.enrichments, 0)
+
+    def test_nothing_to_compact(self):
+        self.assertIsNone(compact_enrichments(self.enrichments[:2], 1))
+
+    def test_updates_folded_into_snapshot(self):
+        compacted = compact_enrichments(self.enrichments, 2)
+        self.assertEqual([enrichment.source for enrichment in compacted], [
+            IRODS_ENRICHMENT, IRODS_SNAPSHOT_ENRICHMENT, RULE_APPLICATION, IRODS_UPDATE_ENRICHMENT, RULE_APPLICATION,
+            IRODS_UPDATE_ENRICHMENT])
+        self.assertEqual(compacted[1].timestamp, self.enrichments[4].timestamp)
+        self.assertEqual(compacted[2:], self.enrichments[5:])
+        self.assertSameKnowledge(compacted[:2], self.enrichments[:5])
+        self.assertSameKnowledge(compacted, self.enrichments)
+
+    def test_snapshot_folded_when_compacted_again(self):
+        compacted = compact_enrichments(self.enrichments, 2)
+        compacted.extend(_create_update_enrichment(day) for day in range(10, 13))
+        compacted_again = compact_enrichments(compacted, 2)
+        self.assertEqual([enrichment.source for enrichment in compacted_again].count(IRODS_SNAPSHOT_ENRICHMENT), 1)
+        self.assertSameKnowledge(compacted_again, compacted)
+
+    def test_only_latest_rule_application_of_each_rule_kept(self):
+        compacted = compact_enrichments(self.enrichments, 10)
+        self.assertEqual([enrichment for enrichment in compacted if enrichment.source == RULE_APPLICATION],
+                         [self.enrichments[5], self.enrichments[7]])
+        self.assertSameKnowledge(compacted, self.enrichments)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Event, Lock, Thread
+from unittest.mock import MagicMock, ANY
+
+import requests
+
+from hgicookiemonster import concurrency
+from hgicookiemonster.concurrency import AIMDLimit, Bulkhead, ConcurrencyController, add_http_bulkhead, \
+    MEASUREMENT_CONCURRENCY_OUTCOME
+
+_WINDOW_SIZE = 10
+_RESPONSE_TIME = 0.01
+_THROTTLED_TIME = 0.05
+
+
+class _SlowRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(_RESPONSE_TIME)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAIMDLimit(unittest.TestCase):
+    """
+    Tests for `AIMDLimit`.
+    """
+    def setUp(self):
+        self.limit = AIMDLimit(4, 8, min_limit=2, window_size=_WINDOW_SIZE)
+
+    def _complete_window(self, latency: float=0.1, errors: int=0, in_flight: int=4):
+        for i in range(_WINDOW_SIZE):
+            self.limit.update(latency, i < errors, in_flight)
+
+    def test_invalid_limits(self):
+        self.assertRaises(ValueError, AIMDLimit, 1, 0)
+        self.assertRaises(ValueError, AIMDLimit, 1, 4, min_limit=5)
+
+    def test_increase_when_saturated(self):
+        self._complete_window()
+        self.assertEqual(self.limit.limit, 5)
+
+    def test_no_increase_when_not_saturated(self):
+        self._complete_window(in_flight=1)
+        self.assertEqual(self.limit.limit, 4)
+
+    def test_no_change_within_window(self):
+        self.limit.update(0.1, True, 4)
+        self.assertEqual(self.limit.limit, 4)
+
+    def test_increase_up_to_max_limit(self):
+        for _ in range(10):
+            self._complete_window(in_flight=8)
+        self.assertEqual(self.limit.limit, 8)
+
+    def test_decrease_when_errors(self):
+        self._complete_window(errors=_WINDOW_SIZE // 2)
+        self.assertEqual(self.limit.limit, 3)
+
+    def test_decrease_when_latency_increases(self):
+        self._complete_window(latency=0.1)
+        self._complete_window(latency=1.0)
+        self.assertEqual(self.limit.limit, 3)
+        self.assertLess(self.limit.baseline_latency, 1.0)
+
+    def test_decrease_down_to_min_limit(self):
+        for _ in range(10):
+            self._complete_window(errors=_WINDOW_SIZE)
+        self.assertEqual(self.limit.limit, 2)
+
+
+class TestBulkhead(unittest.TestCase):
+    """
+    Tests for `Bulkhead`.
+    """
+    def setUp(self):
+        self.bulkhead = Bulkhead("backend", AIMDLimit(2, 2, window_size=_WINDOW_SIZE))
+
+    def test_limits_concurrency(self):
+        lock = Lock()
+        in_flight = []
+        max_in_flight = []
+        release = Event()
+
+        def request():
+            with self.bulkhead.slot():
+                with lock:
+                    in_flight.append(None)
+                    max_in_flight.append(len(in_flight))
+                release.wait()
+                with lock:
+                    in_flight.pop()
+
+        threads = [Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while self.bulkhead.get_status()["waiting"] < 3:
+            release.wait(0.001)
+        self.assertEqual(self.bulkhead.in_flight, 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(max_in_flight), 2)
+        self.assertEqual(self.bulkhead.in_flight, 0)
+
+    def test_slot_when_request_fails(self):
+        bulkhead = Bulkhead("backend", AIMDLimit(2, 4, window_size=1))
+        with self.assertRaises(ValueError):
+            with bulkhead.slot():
+                raise ValueError()
+        self.assertEqual(bulkhead.in_flight, 0)
+        self.assertEqual(bulkhead.limit.limit, 1)
+
+    def test_nested_slot_does_not_take_another(self):
+        bulkhead = Bulkhead("backend", AIMDLimit(1, 1))
+        with bulkhead.slot():
+            with bulkhead.slot():
+                self.assertEqual(bulkhead.in_flight, 1)
+        self.assertEqual(bulkhead.in_flight, 0)
+
+    def test_metrics(self):
+        metrics = MagicMock()
+        bulkhead = Bulkhead("backend", AIMDLimit(2, 2), metrics)
+        with bulkhead.slot():
+            pass
+        metrics.counter.assert_any_call(MEASUREMENT_CONCURRENCY_OUTCOME, {"backend": "backend", "outcome": "succeeded"})
+        metrics.register_sampler.assert_called_once_with(ANY, bulkhead.get_status, {"backend": "backend"})
+        self.assertEqual(bulkhead.get_status()["limit"], 2)
+
+
+class TestConcurrencyController(unittest.TestCase):
+    """
+    Tests for `ConcurrencyController`.
+    """
+    def setUp(self):
+        self.controller = ConcurrencyController()
+
+    def test_bulkhead(self):
+        bulkhead = self.controller.bulkhead("backend", 10)
+        self.assertEqual(bulkhead.limit.limit, 5)
+        self.assertEqual(bulkhead.limit.max_limit, 10)
+        self.assertIs(self.controller.bulkhead("backend", 10), bulkhead)
+        self.assertIsNot(self.controller.bulkhead("other", 10), bulkhead)
+
+    def test_get_status(self):
+        self.controller.bulkhead("backend", 10, initial_limit=3)
+        self.assertEqual(self.controller.get_status()["backend"]["limit"], 3)
+
+
+class TestAddHttpBulkhead(unittest.TestCase):
+    """
+    Tests for `add_http_bulkhead`.
+    """
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _SlowRequestHandler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.session = requests.Session()
+        self.bulkhead = Bulkhead("cookie_jar", AIMDLimit(4, 4, window_size=5))
+        self.addCleanup(concurrency._http_bulkheads.clear)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, path: str):
+        self.session.get("%s%s" % (self.url, path)).raise_for_status()
+
+    def test_requests_within_bulkhead(self):
+        add_http_bulkhead("%s/database" % self.url, self.bulkhead)
+        self.bulkhead.slot = MagicMock(wraps=self.bulkhead.slot)
+        self._get("/database/document")
+        self._get("/other_database/document")
+        self.assertEqual(self.bulkhead.slot.call_count, 1)
+        self.assertEqual(self.bulkhead.in_flight, 0)
+
+    def test_limit_stable_when_throttled(self):
+        add_http_bulkhead(self.url, self.bulkhead)
+
+        def throttled_get(throttled: bool):
+            # As a rate limited cookie jar does before making a request to the database
+            if throttled:
+                time.sleep(_THROTTLED_TIME)
+            self._get("/database/document")
+
+        for i in range(20):
+            throttled_get(i >= self.bulkhead.limit.window_size)
+        self.assertEqual(self.bulkhead.limit.limit, 4)
+        self.assertLess(self.bulkhead.limit.baseline_latency, _THROTTLED_TIME)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,10 +9,9 @@ from cookiemonster.processor.models import Rule
 from cookiemonster.retriever.source.irods.json_convert import DataObjectModificationJSONEncoder
 from cookiemonster.retriever.source.irods.models import DataObjectModification
 from hgicommon.collections import Metadata
-from hgicookiemonster.enrichment_loaders._irods import IRODS_ENRICHMENT
 from hgicookiemonster.rules.creation_observed_and_incorrect_human_reference_rule import _rule, \
     KNOWN_UNINTERESTING_REFERENCES_PATH
-from hgicookiemonster.run import IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT, IRODS_UPDATE_ENRICHMENT
 from hgicookiemonster.shared.constants.irods import IRODS_REFERENCE_KEY
 from hgicookiemonster.tests._common import UNINTERESTING_DATA_OBJECT_MODIFICATION_AS_METADATA, \
     create_creation_enrichment
@@ -9,9 +9,8 @@ from cookiemonster.processor.models import Rule
 from cookiemonster.retriever.source.irods.json_convert import DataObjectModificationJSONEncoder
 from cookiemonster.retriever.source.irods.models import DataObjectModification
 from hgicommon.collections import Metadata
-from hgicookiemonster.enrichment_loaders._irods import IRODS_ENRICHMENT
 from hgicookiemonster.rules.creation_observed_and_incorrect_manual_qc_rule import _rule, INCORRECT_MANUAL_QC_VALUE
-from hgicookiemonster.run import IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT, IRODS_UPDATE_ENRICHMENT
 from hgicookiemonster.shared.constants.irods import IRODS_MANUAL_QC_KEY
 from hgicookiemonster.tests._common import UNINTERESTING_DATA_OBJECT_MODIFICATION_AS_METADATA, \
     create_creation_enrichment
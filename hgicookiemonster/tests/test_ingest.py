@@ -0,0 +1,55 @@
+import unittest
+from datetime import datetime
+
+from cookiemonster.common.models import Update
+from hgicommon.collections import Metadata
+from hgicookiemonster.ingest import PathPatternUpdateFilter, group_updates_by_target
+
+
+class TestPathPatternUpdateFilter(unittest.TestCase):
+    """
+    Tests for `PathPatternUpdateFilter`.
+    """
+    def setUp(self):
+        self.update_filter = PathPatternUpdateFilter(["*.cram", "/special/*"])
+
+    def _update(self, target: str) -> Update:
+        return Update(target, datetime(1, 1, 1), Metadata())
+
+    def test_no_patterns(self):
+        self.assertRaises(ValueError, PathPatternUpdateFilter, [])
+
+    def test_admitted_when_matches_pattern(self):
+        self.assertTrue(self.update_filter(self._update("/test/test.cram")))
+
+    def test_admitted_when_matches_pattern_in_different_case(self):
+        self.assertTrue(self.update_filter(self._update("/test/test.CRAM")))
+
+    def test_admitted_when_matches_other_pattern(self):
+        self.assertTrue(self.update_filter(self._update("/special/test.json")))
+
+    def test_dropped_when_matches_no_pattern(self):
+        self.assertFalse(self.update_filter(self._update("/test/test.cram.json")))
+
+
+class TestGroupUpdatesByTarget(unittest.TestCase):
+    """
+    Tests for `group_updates_by_target`.
+    """
+    def test_no_updates(self):
+        self.assertEqual(len(group_updates_by_target([])), 0)
+
+    def test_grouped_by_target_in_timestamp_order(self):
+        updates = [
+            Update("/a", datetime(2, 2, 2), Metadata()),
+            Update("/b", datetime(1, 1, 1), Metadata()),
+            Update("/a", datetime(1, 1, 1), Metadata()),
+        ]
+        grouped = group_updates_by_target(updates)
+        self.assertEqual(list(grouped.keys()), ["/a", "/b"])
+        self.assertEqual(grouped["/a"], [updates[2], updates[0]])
+        self.assertEqual(grouped["/b"], [updates[1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from cookiemonster.common.models import Cookie, Enrichment
+from cookiemonster.processor._rules import RuleSource
+from cookiemonster.processor.models import Rule, EnrichmentLoader
+from hgicommon.collections import Metadata
+
+from hgicookiemonster.instrumentation import instrument_rule, instrument_enrichment_loader, InstrumentedRuleSource, \
+    MEASUREMENT_RULE_TIME, MEASUREMENT_RULE_MATCHES, MEASUREMENT_ENRICHMENT_LOADER_TIME, \
+    MEASUREMENT_ENRICHMENT_LOADER_CAN_ENRICH
+from hgicookiemonster.metrics import MetricsRegistry
+
+_RULE_TAGS = {"rule_id": "my_rule", "priority": "3"}
+_ENRICHMENT_LOADER_TAGS = {"enrichment_loader": "my_loader", "priority": "2"}
+
+
+class TestInstrumentRule(unittest.TestCase):
+    """
+    Tests for `instrument_rule`.
+    """
+    def setUp(self):
+        self.metrics = MetricsRegistry(MagicMock())
+        self.cookie = Cookie("/my/cookie")
+        self.context = MagicMock()
+
+    def test_keeps_id_and_priority(self):
+        rule = instrument_rule(Rule(lambda cookie, context: True, lambda cookie, context: False, "my_rule", 3),
+                               self.metrics)
+        self.assertEqual(rule.id, "my_rule")
+        self.assertEqual(rule.priority, 3)
+
+    def test_matches(self):
+        rule = instrument_rule(Rule(lambda cookie, context: cookie.identifier == "/my/cookie",
+                                    lambda cookie, context: False, "my_rule", 3), self.metrics)
+        self.assertTrue(rule.matches(self.cookie, self.context))
+        self.assertTrue(rule.matches(self.cookie, self.context))
+        self.assertFalse(rule.matches(Cookie("/other"), self.context))
+
+        self.assertEqual(self.metrics.counter(MEASUREMENT_RULE_MATCHES, dict(_RULE_TAGS, outcome="matched"))
+                         .collect(), 2)
+        self.assertEqual(self.metrics.counter(MEASUREMENT_RULE_MATCHES, dict(_RULE_TAGS, outcome="not_matched"))
+                         .collect(), 1)
+        self.assertEqual(self.metrics.histogram(MEASUREMENT_RULE_TIME, dict(_RULE_TAGS, operation="matches"))
+                         .collect()["count"], 3)
+
+    def test_execute_action(self):
+        action = MagicMock(return_value=True)
+        rule = instrument_rule(Rule(lambda cookie, context: True, action, "my_rule", 3), self.metrics)
+        self.assertTrue(rule.execute_action(self.cookie, self.context))
+        action.assert_called_once_with(self.cookie, self.context)
+        self.assertEqual(self.metrics.histogram(MEASUREMENT_RULE_TIME, dict(_RULE_TAGS, operation="action"))
+                         .collect()["count"], 1)
+
+    def test_execute_action_that_raises(self):
+        rule = instrument_rule(Rule(lambda cookie, context: True, MagicMock(side_effect=ValueError()), "my_rule", 3),
+                               self.metrics)
+        self.assertRaises(ValueError, rule.execute_action, self.cookie, self.context)
+        self.assertEqual(self.metrics.histogram(MEASUREMENT_RULE_TIME, dict(_RULE_TAGS, operation="action"))
+                         .collect()["count"], 1)
+
+
+class TestInstrumentEnrichmentLoader(unittest.TestCase):
+    """
+    Tests for `instrument_enrichment_loader`.
+    """
+    def setUp(self):
+        self.metrics = MetricsRegistry(MagicMock())
+        self.cookie = Cookie("/my/cookie")
+        self.context = MagicMock()
+
+    def test_can_enrich_and_load(self):
+        enrichment = Enrichment("my_loader", None, Metadata())
+        enrichment_loader = instrument_enrichment_loader(EnrichmentLoader(
+            lambda cookie, context: True, lambda cookie, context: enrichment, "my_loader", 2), self.metrics)
+        self.assertEqual(enrichment_loader.name, "my_loader")
+        self.assertEqual(enrichment_loader.priority, 2)
+
+        self.assertTrue(enrichment_loader.can_enrich(self.cookie, self.context))
+        self.assertEqual(enrichment_loader.load_enrichment(self.cookie, self.context), enrichment)
+
+        self.assertEqual(self.metrics.counter(MEASUREMENT_ENRICHMENT_LOADER_CAN_ENRICH,
+                                              dict(_ENRICHMENT_LOADER_TAGS, outcome="can_enrich")).collect(), 1)
+        for operation in ("can_enrich", "load"):
+            self.assertEqual(self.metrics.histogram(MEASUREMENT_ENRICHMENT_LOADER_TIME,
+                                                    dict(_ENRICHMENT_LOADER_TAGS, operation=operation))
+                             .collect()["count"], 1)
+
+
+class TestInstrumentedRuleSource(unittest.TestCase):
+    """
+    Tests for `InstrumentedRuleSource`.
+    """
+    def setUp(self):
+        context = MagicMock()
+        context.metrics = MetricsRegistry(MagicMock())
+        self.rule_source = InstrumentedRuleSource("/rules", context)
+        self.rules = [Rule(lambda cookie, context: True, lambda cookie, context: False, "rule_%d" % i, i)
+                      for i in range(2)]
+
+    def test_get_all_instruments_each_rule_once(self):
+        with patch.object(RuleSource, "get_all", return_value=self.rules):
+            first = self.rule_source.get_all()
+            second = self.rule_source.get_all()
+        self.assertEqual([rule.id for rule in first], ["rule_0", "rule_1"])
+        self.assertNotIn(first[0], self.rules)
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[1], second[1])
+
+    def test_get_all_when_rule_changed(self):
+        with patch.object(RuleSource, "get_all", return_value=self.rules):
+            first = self.rule_source.get_all()
+        changed = Rule(lambda cookie, context: False, lambda cookie, context: False, "rule_1", 1)
+        with patch.object(RuleSource, "get_all", return_value=[self.rules[0], changed]):
+            second = self.rule_source.get_all()
+        self.assertIs(first[0], second[0])
+        self.assertIsNot(first[1], second[1])
+        self.assertFalse(second[1].matches(Cookie("/my/cookie"), MagicMock()))
+
+
+if __name__ == "__main__":
+    unittest.main()
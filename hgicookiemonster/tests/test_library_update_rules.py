@@ -1,18 +1,24 @@
+import os
+import tempfile
 import unittest
 from abc import ABCMeta
 from datetime import datetime
+from typing import Callable, List
+from unittest.mock import MagicMock
 
 from baton.collections import IrodsMetadata
 from cookiemonster.common.models import Cookie, Enrichment
 from cookiemonster.processor.models import Rule
-from hgicookiemonster.enrichment_loaders._irods import IRODS_ENRICHMENT
-from hgicookiemonster.rules.study_interval_rule import INTERVAL_STUDY_ID
-from hgicookiemonster.rules.study_page_rule import PAGE_STUDY_ID
-from hgicookiemonster.run import IRODS_UPDATE_ENRICHMENT
+from hgicookiemonster.rules.study_library_rule import _rule, _action, STUDY_LIBRARY_RULE_ID
+from hgicookiemonster.shared.constants.enrichments import IRODS_ENRICHMENT, IRODS_UPDATE_ENRICHMENT
 from hgicookiemonster.shared.constants.irods import IRODS_STUDY_ID_KEY, IRODS_TARGET_KEY, IRODS_TARGET_LIBRARY_VALUE
+from hgicookiemonster.shared.reported import ReportedIndex
 from hgicookiemonster.tests._common import UNINTERESTING_DATA_OBJECT_AS_METADATA, \
     create_data_object_modification_as_metadata, create_data_object_as_metadata
 
+INTERVAL_STUDY_ID = "3765"
+PAGE_STUDY_ID = "3543"
+
 
 class _TestLibraryUpdateRule(unittest.TestCase, metaclass=ABCMeta):
     """
@@ -82,24 +88,88 @@ class _TestLibraryUpdateRule(unittest.TestCase, metaclass=ABCMeta):
         self.assertTrue(self.rule.matches(self.cookie))
 
 
-class TestStudyIntervalRule(_TestLibraryUpdateRule):
+class TestStudyLibraryRuleWithIntervalStudy(_TestLibraryUpdateRule):
     """
-    Tests for `study_interval` rule.
+    Tests for `study_library` rule with the INTERVAL study.
     """
     def __init__(self, *args, **kwargs):
-        from hgicookiemonster.rules.study_interval_rule import _rule
         super().__init__(INTERVAL_STUDY_ID, _rule, *args, **kwargs)
 
 
-class TestStudyPageRule(_TestLibraryUpdateRule):
+class TestStudyLibraryRuleWithPageStudy(_TestLibraryUpdateRule):
     """
-    Tests for `study_page` rule.
+    Tests for `study_library` rule with the PAGE study.
     """
     def __init__(self, *args, **kwargs):
-        from hgicookiemonster.rules.study_page_rule import _rule
         super().__init__(PAGE_STUDY_ID, _rule, *args, **kwargs)
 
 
+class TestStudyLibraryRuleAction(unittest.TestCase):
+    """
+    Tests for the action of the `study_library` rule.
+    """
+    def setUp(self):
+        self.cookie = Cookie("test")
+        self.context = MagicMock()
+        self.context.reported = ReportedIndex()
+        self.context.rule_writer.side_effect = self._write
+        self.unwritten = []     # type: List[Callable[[], None]]
+
+    def _write(self, message: str, on_written: Callable[[], None]) -> bool:
+        on_written()
+        return True
+
+    def _add_library_in_studies(self, year: int, *study_ids: str):
+        metadata = create_data_object_modification_as_metadata(IrodsMetadata({
+            IRODS_STUDY_ID_KEY: set(study_ids),
+            IRODS_TARGET_KEY: {IRODS_TARGET_LIBRARY_VALUE},
+        }))
+        self.cookie.enrichments.add(Enrichment(IRODS_UPDATE_ENRICHMENT, datetime(year, 1, 1), metadata))
+
+    def test_writes_line_per_matched_study(self):
+        self._add_library_in_studies(1, INTERVAL_STUDY_ID, PAGE_STUDY_ID, "other_value")
+        self.assertFalse(_action(self.cookie, self.context))
+        self.assertEqual(self.context.rule_writer.call_count, 2)
+        written = [call[0][0] for call in self.context.rule_writer.call_args_list]
+        self.assertIn("study %s (PAGE)" % PAGE_STUDY_ID, written[0])
+        self.assertIn("study %s (INTERVAL)" % INTERVAL_STUDY_ID, written[1])
+
+    def test_writes_line_once_per_study(self):
+        _, reported_location = tempfile.mkstemp()
+        self.context.reported = ReportedIndex(reported_location)
+        try:
+            self._add_library_in_studies(1, PAGE_STUDY_ID)
+            _action(self.cookie, self.context)
+            self._add_library_in_studies(2, PAGE_STUDY_ID, INTERVAL_STUDY_ID)
+            _action(self.cookie, self.context)
+        finally:
+            self.context.reported.close()
+            os.remove(reported_location)
+        self.assertEqual(self.context.rule_writer.call_count, 2)
+
+    def test_rewrites_line_when_dropped(self):
+        self._add_library_in_studies(1, PAGE_STUDY_ID)
+        self.context.rule_writer.side_effect = lambda message, on_written: False
+        self.assertRaises(IOError, _action, self.cookie, self.context)
+        self.context.slack.post.assert_not_called()
+        self.context.rule_writer.side_effect = self._write
+        _action(self.cookie, self.context)
+        self.assertEqual(self.context.rule_writer.call_count, 2)
+        self.context.slack.post.assert_called_once()
+
+    def test_not_recorded_as_reported_until_written(self):
+        self._add_library_in_studies(1, PAGE_STUDY_ID)
+        self.context.rule_writer.side_effect = lambda message, on_written: self.unwritten.append(on_written)
+        _action(self.cookie, self.context)
+        self.assertFalse(self.context.reported.was_reported("%s:%s" % (STUDY_LIBRARY_RULE_ID, PAGE_STUDY_ID),
+                                                            self.cookie.identifier))
+        self.context.slack.post.assert_not_called()
+        self.unwritten[0]()
+        _action(self.cookie, self.context)
+        self.assertEqual(self.context.rule_writer.call_count, 1)
+        self.context.slack.post.assert_called_once()
+
+
 # Trick to stop the abstract base test class from been ran
 del _TestLibraryUpdateRule
 
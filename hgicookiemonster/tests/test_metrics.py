@@ -0,0 +1,111 @@
+import unittest
+from threading import Thread
+from unittest.mock import MagicMock
+
+from hgicookiemonster.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+class TestCounter(unittest.TestCase):
+    """
+    Tests for `Counter`.
+    """
+    def test_collect_from_many_threads(self):
+        counter = Counter()
+        threads = [Thread(target=lambda: [counter.increment() for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.collect(), 4000)
+
+    def test_threads_spread_across_stripes(self):
+        counter = Counter(number_of_stripes=4)
+        threads = [Thread(target=counter.increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreater(len([stripe for stripe in counter._stripes if stripe > 0]), 1)
+
+    def test_reset_when_collected(self):
+        counter = Counter()
+        counter.increment(2)
+        counter.collect()
+        self.assertEqual(counter.collect(), 0)
+
+
+class TestGauge(unittest.TestCase):
+    """
+    Tests for `Gauge`.
+    """
+    def test_increment_and_decrement(self):
+        gauge = Gauge()
+        gauge.increment(5)
+        gauge.decrement(2)
+        self.assertEqual(gauge.collect(), 3)
+        self.assertEqual(gauge.collect(), 3)
+
+    def test_set(self):
+        gauge = Gauge()
+        gauge.increment(5)
+        gauge.set(1)
+        self.assertEqual(gauge.value, 1)
+
+
+class TestHistogram(unittest.TestCase):
+    """
+    Tests for `Histogram`.
+    """
+    def test_no_observations(self):
+        self.assertIsNone(Histogram().collect())
+
+    def test_summary(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.observe(value)
+        summary = histogram.collect()
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["mean"], 50.5)
+        self.assertEqual(summary["max"], 100)
+        self.assertEqual(summary["p50"], 50)
+        self.assertEqual(summary["p95"], 95)
+        self.assertEqual(summary["p99"], 99)
+        self.assertIsNone(histogram.collect())
+
+    def test_samples_bounded(self):
+        histogram = Histogram(number_of_stripes=1, max_samples=10)
+        for value in range(1000):
+            histogram.observe(value)
+        summary = histogram.collect()
+        self.assertEqual(summary["count"], 1000)
+        self.assertEqual(summary["max"], 999)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """
+    Tests for `MetricsRegistry`.
+    """
+    def setUp(self):
+        self.logger = MagicMock()
+        self.registry = MetricsRegistry(self.logger)
+
+    def test_same_metric_returned(self):
+        self.assertIs(self.registry.counter("name"), self.registry.counter("name"))
+        self.assertIsNot(self.registry.counter("name"), self.registry.counter("name", {"tag": "value"}))
+
+    def test_different_type_of_metric_with_same_name(self):
+        self.registry.counter("name")
+        self.assertRaises(TypeError, self.registry.gauge, "name")
+
+    def test_flush(self):
+        self.registry.counter("counter", {"tag": "value"}).increment()
+        self.registry.histogram("histogram")
+        self.registry.register_sampler("sampler", lambda: {"field": 1})
+        self.registry.flush()
+        self.logger.record.assert_any_call("counter", 1, {"tag": "value"})
+        self.logger.record.assert_any_call("sampler", {"field": 1}, None)
+        self.assertEqual(self.logger.record.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
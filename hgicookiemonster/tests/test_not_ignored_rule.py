@@ -1,7 +1,13 @@
+import json
 import os
 import tempfile
 import unittest
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlparse
 
 import hgicookiemonster
 from cookiemonster.common.models import Cookie, Enrichment
@@ -9,10 +15,20 @@ from cookiemonster.processor.json_convert import RuleApplicationLogJSONEncoder
 from cookiemonster.processor.models import Rule, RuleApplicationLog
 from cookiemonster.processor.processing import RULE_APPLICATION
 from hgicommon.collections import Metadata
-from hgicookiemonster.rules.not_ignored_rule import _rule, NOT_IGNORED_RULE_ID
+from hgicookiemonster.context import HgiContext
+from hgicookiemonster.rules.not_ignored_rule import _rule, NOT_IGNORED_RULE_ID, read_not_ignored, \
+    iterate_not_ignored
+from hgicookiemonster.shared.reported import ReportedIndex
 from hgicookiemonster.tests._common import create_creation_enrichment
 
 
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server that handles each request in a new thread.
+    """
+    daemon_threads = True
+
+
 class TestNotIgnoredRule(unittest.TestCase):
     """
     Test for `not_ignored` rule.
@@ -20,24 +36,35 @@ class TestNotIgnoredRule(unittest.TestCase):
     def setUp(self):
         self.rule = _rule  # type: Rule
         self.cookie = Cookie("/path")
+        _, self.reported_location = tempfile.mkstemp()
+        self.context = MagicMock()
+        self.context.reported = ReportedIndex(self.reported_location)
+
+    def tearDown(self):
+        self.context.reported.close()
+        os.remove(self.reported_location)
 
     def test_match_when_no_enrichments(self):
-        self.assertTrue(self.rule.matches(self.cookie))
+        self.assertTrue(self.rule.matches(self.cookie, self.context))
 
     def test_match_when_irrelevant_enrichments(self):
         rule_application_log = RuleApplicationLog("other", False)
         rule_application_log_as_metadata = Metadata(RuleApplicationLogJSONEncoder().default(rule_application_log))
         self.cookie.enrichments.add(create_creation_enrichment(datetime(1, 1, 1)))
         self.cookie.enrichments.add(Enrichment(RULE_APPLICATION, datetime(2, 2, 2), rule_application_log_as_metadata))
-        self.assertTrue(self.rule.matches(self.cookie))
+        self.assertTrue(self.rule.matches(self.cookie, self.context))
 
-    def test_match_when_rule_already_executed(self):
-        rule_application_log = RuleApplicationLog(NOT_IGNORED_RULE_ID, False)
-        rule_application_log_as_metadata = Metadata(RuleApplicationLogJSONEncoder().default(rule_application_log))
-        self.cookie.enrichments.add(create_creation_enrichment(datetime(1, 1, 1)))
-        self.cookie.enrichments.add(create_creation_enrichment(datetime(3, 3, 3)))
-        self.cookie.enrichments.add(Enrichment(RULE_APPLICATION, datetime(2, 2, 2), rule_application_log_as_metadata))
-        self.assertFalse(self.rule.matches(self.cookie))
+    def test_match_when_other_identifier_reported(self):
+        self.context.reported.mark_reported(NOT_IGNORED_RULE_ID, "/other/path")
+        self.assertTrue(self.rule.matches(self.cookie, self.context))
+
+    def test_match_when_rule_already_reported(self):
+        self.context.reported.mark_reported(NOT_IGNORED_RULE_ID, self.cookie.identifier)
+        self.assertFalse(self.rule.matches(self.cookie, self.context))
+
+    def test_match_when_context_has_no_reported_index(self):
+        context = HgiContext(None, None, MagicMock(), None, None)
+        self.assertTrue(self.rule.matches(self.cookie, context))
 
     def test_action(self):
         _, path = tempfile.mkstemp()
@@ -48,8 +75,9 @@ class TestNotIgnoredRule(unittest.TestCase):
         cookie_2 = Cookie("/other/path")
 
         try:
-            self.rule.execute_action(cookie_1)
-            self.rule.execute_action(cookie_2)
+            self.rule.execute_action(cookie_1, self.context)
+            self.rule.execute_action(cookie_2, self.context)
+            self.rule.execute_action(cookie_1, self.context)
             with open(path, "r") as file:
                 written = file.readlines()
         finally:
@@ -58,6 +86,75 @@ class TestNotIgnoredRule(unittest.TestCase):
         self.assertEqual(len(written), 2)
         self.assertEqual(cookie_1.identifier, written[0].strip())
         self.assertEqual(cookie_2.identifier, written[1].strip())
+        self.assertFalse(self.rule.matches(cookie_1, self.context))
+
+    def test_action_when_list_cannot_be_written(self):
+        directory = tempfile.mkdtemp()
+        os.rmdir(directory)
+        # Be very bad and rebind a constant...
+        hgicookiemonster.rules.not_ignored_rule.NOT_IGNORED_LIST_LOCATION = os.path.join(directory, "not_ignored.txt")
+        self.assertRaises(IOError, self.rule.execute_action, self.cookie, self.context)
+        self.assertTrue(self.rule.matches(self.cookie, self.context))
+
+
+class TestReadNotIgnored(unittest.TestCase):
+    """
+    Tests for `read_not_ignored` and `iterate_not_ignored`.
+    """
+    class _CookieJarRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            identifier = parse_qs(urlparse(self.path).query)["identifier"][0]
+            self.server.requested.append(identifier)
+            body = json.dumps({"identifier": identifier, "enrichments": []}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            # Closes the connection without telling the client, as a server does when a keep-alive connection times out
+            self.close_connection = self.server.close_connections
+
+        def log_message(self, *args):
+            pass
+
+    def setUp(self):
+        self.server = _ThreadingHTTPServer(("localhost", 0), TestReadNotIgnored._CookieJarRequestHandler)
+        self.server.requested = []
+        self.server.close_connections = False
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_location = "http://localhost:%d/cookiejar" % self.server.server_port
+
+        self.identifiers = ["/path/%d" % i for i in range(20)]
+        _, self.not_ignored_list_location = tempfile.mkstemp()
+        with open(self.not_ignored_list_location, "w") as file:
+            file.write("\n".join(self.identifiers + [self.identifiers[0], ""]))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.not_ignored_list_location)
+
+    def test_read_not_ignored(self):
+        not_ignored = read_not_ignored(self.api_location, self.not_ignored_list_location)
+        self.assertEqual(list(not_ignored.keys()), self.identifiers)
+        self.assertEqual(not_ignored[self.identifiers[1]].identifier, self.identifiers[1])
+        self.assertEqual(not_ignored[self.identifiers[1]].identifier, self.identifiers[1])
+        self.assertEqual(self.server.requested, [self.identifiers[1]])
+        self.assertRaises(KeyError, not_ignored.__getitem__, "/other")
+
+    def test_read_not_ignored_when_connection_closed(self):
+        self.server.close_connections = True
+        not_ignored = read_not_ignored(self.api_location, self.not_ignored_list_location)
+        self.assertEqual(not_ignored[self.identifiers[1]].identifier, self.identifiers[1])
+        self.assertEqual(not_ignored[self.identifiers[2]].identifier, self.identifiers[2])
+        self.assertEqual(self.server.requested, self.identifiers[1:3])
+
+    def test_iterate_not_ignored(self):
+        loaded = list(iterate_not_ignored(self.api_location, self.not_ignored_list_location, max_connections=4))
+        self.assertEqual([identifier for identifier, _ in loaded], self.identifiers + [self.identifiers[0]])
+        self.assertEqual([cookie.identifier for _, cookie in loaded], self.identifiers + [self.identifiers[0]])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from typing import Callable
+from unittest.mock import MagicMock
+
+from cookiemonster.common.models import Update
+from hgicommon.collections import Metadata
+
+from hgicookiemonster.checkpoint import EnrichmentCheckpoint
+from hgicookiemonster.run import _connect_retrieval_manager_to_cookie_jar
+
+_TARGET = "/my/target"
+_TIMESTAMPS = [datetime(2016, 1, 1) + timedelta(seconds=i) for i in range(2)]
+
+
+class TestConnectRetrievalManagerToCookieJar(unittest.TestCase):
+    """
+    Tests for `_connect_retrieval_manager_to_cookie_jar`.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = EnrichmentCheckpoint(os.path.join(self.directory, "since"), timedelta(seconds=1))
+        self.retrieval_manager = MagicMock()
+        self.cookie_jar = MagicMock()
+        _connect_retrieval_manager_to_cookie_jar(self.retrieval_manager, self.cookie_jar, 1, MagicMock(),
+                                                 checkpoint=self.checkpoint, max_enrichment_retries=2,
+                                                 enrichment_retry_backoff=timedelta(0))
+        self.put_updates_in_cookie_jar = self.retrieval_manager.add_listener.call_args[0][0]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _put_updates_in_cookie_jar(self, until: Callable[[], bool]):
+        self.put_updates_in_cookie_jar([Update(_TARGET, timestamp, Metadata()) for timestamp in _TIMESTAMPS])
+        started_at = time.monotonic()
+        while not until() and time.monotonic() - started_at < 5:
+            time.sleep(0.01)
+
+    def test_enrichment_retried(self):
+        self.cookie_jar.enrich_cookie.side_effect = [None, IOError(), None]
+        self._put_updates_in_cookie_jar(lambda: self.checkpoint.get_watermark() == _TIMESTAMPS[-1])
+        self.assertEqual(self.cookie_jar.enrich_cookie.call_count, 3)
+        self.assertEqual(self.checkpoint.get_watermark(), _TIMESTAMPS[-1])
+        self.assertFalse(os.path.exists(self.checkpoint.dead_letter_location))
+
+    def test_enrichment_abandoned_after_retries(self):
+        self.cookie_jar.enrich_cookie.side_effect = [None] + [IOError()] * 3
+        self._put_updates_in_cookie_jar(lambda: self.cookie_jar.mark_for_processing.called)
+        self.assertEqual(self.cookie_jar.enrich_cookie.call_count, 4)
+        self.assertEqual(self.checkpoint.get_watermark(), _TIMESTAMPS[-1])
+        self.assertEqual(self.checkpoint.get_status()["abandoned"], 1)
+        self.cookie_jar.mark_for_processing.assert_called_once_with(_TARGET)
+
+
+if __name__ == "__main__":
+    unittest.main()